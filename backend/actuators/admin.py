@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import ActuatorStatus
+from .models import ActuatorLatest, ActuatorStatus
 
 
 @admin.register(ActuatorStatus)
@@ -9,3 +9,11 @@ class ActuatorStatusAdmin(admin.ModelAdmin):
     search_fields = ['actuator_id']
     readonly_fields = ['created_at']
     ordering = ['-created_at']
+
+
+@admin.register(ActuatorLatest)
+class ActuatorLatestAdmin(admin.ModelAdmin):
+    list_display = ['actuator_id', 'status_at']
+    search_fields = ['actuator_id']
+    raw_id_fields = ['status']
+    ordering = ['actuator_id']
@@ -0,0 +1,47 @@
+"""
+Mantenimiento del estado más reciente por actuador (ActuatorLatest).
+
+Igual que sensors.latest: un lote se reduce en memoria al estado más reciente
+de cada actuador y se aplica con un UPDATE condicional (solo si es más nuevo
+que el guardado), creando la fila si no existe.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import BigIntegerField, Case, DateTimeField, F, Q, Value, When
+
+
+def _update_expressions(status):
+    # También si la referencia se quedó a NULL (estado borrado)
+    newer = Q(status__isnull=True) | Q(status_at__isnull=True) | Q(status_at__lte=status.created_at)
+    return {
+        'status': Case(
+            When(newer, then=Value(status.pk)),
+            default=F('status'),
+            output_field=BigIntegerField()
+        ),
+        'status_at': Case(
+            When(newer, then=Value(status.created_at, output_field=DateTimeField())),
+            default=F('status_at')
+        ),
+    }
+
+
+def record_latest_statuses(statuses):
+    """Actualiza ActuatorLatest con un lote de estados recién creados"""
+    from .models import ActuatorLatest
+
+    newest = {}
+    for status in statuses:
+        current = newest.get(status.actuator_id)
+        if current is None or status.created_at >= current.created_at:
+            newest[status.actuator_id] = status
+
+    for actuator_id, status in newest.items():
+        lookup = ActuatorLatest.objects.filter(actuator_id=actuator_id)
+        if lookup.update(**_update_expressions(status)):
+            continue
+        try:
+            with transaction.atomic():
+                ActuatorLatest.objects.create(actuator_id=actuator_id, status=status, status_at=status.created_at)
+        except IntegrityError:
+            # Otro proceso creó la fila entre el UPDATE y el INSERT
+            lookup.update(**_update_expressions(status))
@@ -0,0 +1,42 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_latest(apps, schema_editor):
+    """Último estado de cada actuador existente"""
+    ActuatorStatus = apps.get_model('actuators', 'ActuatorStatus')
+    ActuatorLatest = apps.get_model('actuators', 'ActuatorLatest')
+
+    actuator_ids = ActuatorStatus.objects.values_list('actuator_id', flat=True).distinct()
+    for actuator_id in actuator_ids:
+        status = ActuatorStatus.objects.filter(actuator_id=actuator_id).order_by('-created_at').first()
+        ActuatorLatest.objects.create(
+            actuator_id=actuator_id,
+            status=status,
+            status_at=status.created_at if status else None,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('actuators', '0004_actuatorstatus_created_at_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActuatorLatest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('actuator_id', models.CharField(help_text='ID del actuador', max_length=50, unique=True)),
+                ('status_at', models.DateTimeField(blank=True, help_text='Momento del último estado', null=True)),
+                ('status', models.ForeignKey(blank=True, help_text='Último estado', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='actuators.actuatorstatus')),
+            ],
+            options={
+                'verbose_name': 'Último Estado de Actuador',
+                'verbose_name_plural': 'Últimos Estados de Actuadores',
+                'ordering': ['actuator_id'],
+            },
+        ),
+        migrations.RunPython(backfill_latest, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 
 
@@ -39,3 +39,39 @@ class ActuatorStatus(models.Model):
     def __str__(self):
         status = "Encendido" if self.is_heating else "Apagado"
         return f"{self.actuator_id} - {status} - {self.created_at}"
+    
+    def save(self, *args, **kwargs):
+        """
+        Sobrescribir save para mantener ActuatorLatest al crear un estado. La
+        transacción incluye también la contabilidad de uso (post_save).
+        """
+        is_new = self._state.adding
+        
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            
+            if is_new:
+                from .latest import record_latest_statuses
+                record_latest_statuses([self])
+
+
+class ActuatorLatest(models.Model):
+    """
+    Último estado de cada actuador (una fila por actuator_id), para consultar
+    el estado actual sin recorrer el historial. Se actualiza con cada estado
+    ingerido (ver actuators.latest).
+    """
+    actuator_id = models.CharField(max_length=50, unique=True, help_text="ID del actuador")
+    status = models.ForeignKey(
+        ActuatorStatus, null=True, blank=True, on_delete=models.SET_NULL, related_name='+',
+        help_text="Último estado"
+    )
+    status_at = models.DateTimeField(null=True, blank=True, help_text="Momento del último estado")
+    
+    class Meta:
+        verbose_name = "Último Estado de Actuador"
+        verbose_name_plural = "Últimos Estados de Actuadores"
+        ordering = ['actuator_id']
+    
+    def __str__(self):
+        return f"{self.actuator_id} - {self.status_at}"
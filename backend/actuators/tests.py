@@ -1,3 +1,40 @@
-from django.test import TestCase
+from datetime import date
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+
+from heating.models import HeatingDailyUsage
+from home_control.ingestion import ingest_actuator_statuses
+
+from .models import ActuatorLatest, ActuatorStatus
+
+
+@override_settings(TIME_ZONE='Europe/Madrid')
+class IngestActuatorStatusesTests(TestCase):
+
+    def test_inserts_batch_and_accounts_usage_once(self):
+        created, errors = ingest_actuator_statuses([
+            {'actuator_id': 'boiler', 'is_heating': 'true', 'created_at': '2025-01-10T08:00:00+01:00'},
+            {'actuator_id': 'boiler', 'is_heating': 0, 'created_at': '2025-01-10T09:30:00+01:00'},
+            {'actuator_id': 'boiler', 'is_heating': 'quizá'},
+        ])
+
+        self.assertEqual(len(created), 2)
+        self.assertEqual(errors, [{'index': 2, 'errors': {'is_heating': 'Se esperaba un booleano.'}}])
+        self.assertEqual(ActuatorStatus.objects.count(), 2)
+        self.assertAlmostEqual(HeatingDailyUsage.objects.get(date=date(2025, 1, 10)).total_hours, 1.5)
+
+        latest = ActuatorLatest.objects.get(actuator_id='boiler')
+        self.assertEqual(latest.status_id, created[1].pk)
+        self.assertFalse(latest.status.is_heating)
+
+    def test_batch_without_valid_rows_inserts_nothing(self):
+        created, errors = ingest_actuator_statuses([{'is_heating': True}])
+        self.assertEqual(created, [])
+        self.assertEqual(errors, [{'index': 0, 'errors': {'actuator_id': 'Este campo es obligatorio.'}}])
+        self.assertFalse(ActuatorStatus.objects.exists())
+
+    @override_settings(INGEST_MAX_BATCH=1)
+    def test_rejects_batches_over_the_limit(self):
+        with self.assertRaises(ValueError):
+            ingest_actuator_statuses([{'actuator_id': 'boiler'}] * 2)
+        self.assertFalse(ActuatorStatus.objects.exists())
@@ -1,11 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ActuatorStatusViewSet
+from .views import ActuatorStatusViewSet, current_status_api
 
 router = DefaultRouter()
 router.register(r'status', ActuatorStatusViewSet)
 
 app_name = 'actuators'
 urlpatterns = [
+    # Vista async; va antes del router para no caer en /api/status/<pk>/
+    path('api/status/current/', current_status_api, name='status-current'),
     path('api/', include(router.urls)),
-]
\ No newline at end of file
+]
@@ -1,35 +1,52 @@
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny
-from .models import ActuatorStatus
+from rest_framework.parsers import JSONParser
+from home_control.ingestion import ingest_actuator_statuses
+from home_control.export import ExportMixin
+from home_control.pagination import KeysetListMixin
+from home_control.parsers import NDJSONParser
+from .models import ActuatorLatest, ActuatorStatus
 from .serializers import ActuatorStatusSerializer
 
 
-class ActuatorStatusViewSet(viewsets.ModelViewSet):
+class ActuatorStatusViewSet(ExportMixin, KeysetListMixin, viewsets.ModelViewSet):
     """
     ViewSet para estado de actuadores.
     Endpoints:
-    - GET /actuators/api/status/ - Listar todos los estados
+    - GET /actuators/api/status/ - Listar estados (paginado por cursor; ?stream=1 para todos)
     - POST /actuators/api/status/ - Crear nuevo estado (usado por mqtt_bridge)
+    - POST /actuators/api/status/bulk/ - Crear varios en un lote (array JSON o NDJSON)
+    - GET /actuators/api/status/export/ - Exportar historial (NDJSON, CSV, Parquet o Arrow)
+    - GET /actuators/api/status/current/ - Estado actual por actuador (vista async, ver current_status_api)
     - GET /actuators/api/status/{id}/ - Detalle de un estado
     """
     queryset = ActuatorStatus.objects.all()
     serializer_class = ActuatorStatusSerializer
     permission_classes = [AllowAny]  # Permite acceso desde mqtt_bridge
+    export_device_field = 'actuator_id'
     
     def create(self, request, *args, **kwargs):
         """
         Crear nuevo estado de actuador.
-        Acepta JSON crudo desde mqtt_bridge.
+        Acepta JSON crudo desde mqtt_bridge. Se valida con el serializer
+        (``created_at`` lo asigna el servidor, los errores salen en el formato
+        de DRF) y se inserta con el mismo módulo de ingesta que /bulk/. Solo
+        /bulk/ acepta ``created_at`` (reenvíos del spool del bridge).
         Los HeatingLog se crean solo desde sensor readings, no desde actuator updates.
         """
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        # Crear solo el estado del actuador
-        actuator_status = serializer.save()
+        # validated_data no incluye created_at (campo de solo lectura)
+        created, errors = ingest_actuator_statuses([dict(serializer.validated_data)])
+        if errors:
+            return Response(errors[0]['errors'], status=status.HTTP_400_BAD_REQUEST)
         
+        serializer = self.get_serializer(created[0])
         headers = self.get_success_headers(serializer.data)
         return Response(
             serializer.data, 
@@ -37,25 +54,32 @@ class ActuatorStatusViewSet(viewsets.ModelViewSet):
             headers=headers
         )
     
-
-    
-    @action(detail=False, methods=['get'])
-    def current(self, request):
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
         """
-        Obtener el estado actual de todos los actuadores.
-        GET /actuators/api/status/current/
+        Crear varios registros en un solo lote.
+        POST /actuators/api/status/bulk/
+        Acepta un array JSON o NDJSON (Content-Type: application/x-ndjson).
+        Las filas válidas se insertan; las inválidas se devuelven en 'errors'.
         """
-        current_status = {}
-        actuators = ActuatorStatus.objects.values_list('actuator_id', flat=True).distinct()
+        rows = request.data
+        if isinstance(rows, dict):
+            rows = [rows]
+        if not isinstance(rows, list):
+            return Response(
+                {'error': 'Se esperaba un array JSON o NDJSON'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        for actuator_id in actuators:
-            latest = ActuatorStatus.objects.filter(
-                actuator_id=actuator_id
-            ).first()
-            if latest:
-                current_status[actuator_id] = ActuatorStatusSerializer(latest).data
+        try:
+            created, errors = ingest_actuator_statuses(rows)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        return Response(current_status)
+        return Response(
+            {'created': len(created), 'errors': errors},
+            status=status.HTTP_201_CREATED if created or not errors else status.HTTP_400_BAD_REQUEST
+        )
     
     @action(detail=False, methods=['get'])
     def by_actuator(self, request):
@@ -71,5 +95,21 @@ class ActuatorStatusViewSet(viewsets.ModelViewSet):
             )
         
         statuses = ActuatorStatus.objects.filter(actuator_id=actuator_id)
-        serializer = self.get_serializer(statuses, many=True)
-        return Response(serializer.data)
+        return self.list_response(statuses)
+
+
+@require_GET
+async def current_status_api(request):
+    """
+    Obtener el estado actual de todos los actuadores.
+    GET /actuators/api/status/current/
+    Una sola consulta sobre ActuatorLatest (una fila por actuador).
+    Vista async (ORM async): bajo ASGI no ocupa un hilo mientras espera a la DB.
+    """
+    current_status = {}
+    rows = ActuatorLatest.objects.filter(status__isnull=False).select_related('status')
+    
+    async for latest in rows:
+        current_status[latest.actuator_id] = ActuatorStatusSerializer(latest.status).data
+    
+    return JsonResponse(current_status)
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import HeatingSettings, HeatingSchedule, HeatingLog, HeatingDailyUsage, HeatingMonthlyUsage
+from .models import (
+    HeatingSettings, HeatingSchedule, HeatingLog, HeatingHourlyUsage, HeatingDailyUsage, HeatingMonthlyUsage,
+    HeatingControllerState, HeatingUsageState, HeatingUsageCheckpoint,
+)
 
 
 @admin.register(HeatingSettings)
@@ -87,8 +90,34 @@ class HeatingDailyUsageAdmin(admin.ModelAdmin):
     date_hierarchy = 'date'
 
 
+@admin.register(HeatingHourlyUsage)
+class HeatingHourlyUsageAdmin(admin.ModelAdmin):
+    list_display = ['date', 'hour', 'total_hours', 'last_updated']
+    ordering = ['-date', '-hour']
+    readonly_fields = ['last_updated']
+    date_hierarchy = 'date'
+
+
 @admin.register(HeatingMonthlyUsage)
 class HeatingMonthlyUsageAdmin(admin.ModelAdmin):
     list_display = ['year', 'month', 'total_hours', 'last_updated']
     ordering = ['-year', '-month']
     readonly_fields = ['last_updated']
+
+
+@admin.register(HeatingUsageState)
+class HeatingUsageStateAdmin(admin.ModelAdmin):
+    list_display = ['actuator_id', 'last_is_heating', 'last_status_at', 'updated_at']
+    readonly_fields = ['updated_at']
+
+
+@admin.register(HeatingUsageCheckpoint)
+class HeatingUsageCheckpointAdmin(admin.ModelAdmin):
+    list_display = ['name', 'last_status_id', 'updated_at']
+    readonly_fields = ['updated_at']
+
+
+@admin.register(HeatingControllerState)
+class HeatingControllerStateAdmin(admin.ModelAdmin):
+    list_display = ['actuator_id', 'is_heating', 'last_command_at', 'last_temperature', 'updated_at']
+    readonly_fields = ['updated_at']
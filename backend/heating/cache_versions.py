@@ -0,0 +1,61 @@
+"""
+Versiones compartidas entre procesos para invalidar cachés locales.
+
+Cada worker de gunicorn guarda en memoria datos que cambian poco (configuración,
+horarios compilados...) junto con la versión con la que los construyó. Al
+modificar esos datos se publica una versión nueva en la caché de Django
+(compartida entre procesos); los demás workers la ven distinta y reconstruyen.
+
+Las versiones son tokens aleatorios en lugar de contadores para que una versión
+perdida nunca haga que una antigua vuelva a parecer vigente. Viven en el alias
+de caché 'versions', separado de las respuestas cacheadas (ver CACHES en
+settings). Si aun así una versión falta (primer arranque, caché borrada),
+get_version() publica una nueva en lugar de devolver None: todos los procesos
+ven un cambio y reconstruyen. Solo si la caché no responde se devuelve None,
+que los llamadores tratan como "desconocida": recargan y no guardan nada
+asociado a ella.
+"""
+import uuid
+
+from django.core.cache import caches
+from django.db import transaction
+
+KEY_PREFIX = 'heating:version:'
+CACHE_ALIAS = 'versions'
+
+# Datos de telemetría (lecturas, estados de actuadores, logs y usos):
+# versiona las respuestas cacheadas de las gráficas
+TELEMETRY = 'telemetry'
+
+
+def get_version(name):
+    """Versión actual de ``name``; publica una si no hay ninguna (None si la caché falla)"""
+    cache = caches[CACHE_ALIAS]
+    key = KEY_PREFIX + name
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_version(name):
+    """Versión de ``get_version`` para vistas async"""
+    cache = caches[CACHE_ALIAS]
+    key = KEY_PREFIX + name
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, uuid.uuid4().hex, timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+def bump_version(name):
+    """
+    Publica una versión nueva de ``name`` cuando la transacción actual
+    confirme, para que ningún proceso reconstruya con datos sin confirmar.
+    Devuelve el token publicado.
+    """
+    token = uuid.uuid4().hex
+    transaction.on_commit(lambda: caches[CACHE_ALIAS].set(KEY_PREFIX + name, token, timeout=None))
+    return token
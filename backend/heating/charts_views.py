@@ -1,14 +1,179 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
 from django.shortcuts import render
 from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
-from datetime import datetime, timedelta
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import http_date, quote_etag
+from django.db.models import Max, Min, Sum
+from django.db.models.functions import ExtractIsoWeekDay
+from datetime import datetime, timedelta, timezone as dt_timezone
+import bisect
 import calendar
+import hashlib
+import logging
+import math
 import time
 
-from sensors.models import SensorReading
+from sensors import rollups
+from sensors.models import SensorLatest, SensorReading
 from actuators.models import ActuatorStatus
-from .models import HeatingLog, HeatingDailyUsage, HeatingMonthlyUsage
+from .models import HeatingLog, HeatingDailyUsage, HeatingHourlyUsage, HeatingMonthlyUsage
+from . import resampling
+from .cache_versions import TELEMETRY, aget_version
+from .usage import heating_hours
+
+logger = logging.getLogger(__name__)
+
+# Período -> (duración, intervalo entre puntos, formato de etiqueta)
+CHART_PERIODS = {
+    '12h': (timedelta(hours=12), timedelta(minutes=5), '%H:%M'),
+    '24h': (timedelta(hours=24), timedelta(minutes=10), '%H:%M'),
+    '7d': (timedelta(days=7), timedelta(hours=1), '%d/%m %H:%M'),
+    '30d': (timedelta(days=30), timedelta(hours=4), '%d/%m %H:%M'),
+    '90d': (timedelta(days=90), timedelta(hours=12), '%d/%m %H:%M'),
+    '1y': (timedelta(days=365), timedelta(days=1), '%d/%m/%Y'),
+}
+
+# bucket: un valor agregado por punto (ver ?agg=)
+# lttb: Largest-Triangle-Three-Buckets sobre una resolución más fina
+# minmax: además de la serie agregada, el mínimo y el máximo de cada punto
+DOWNSAMPLING_MODES = ('bucket', 'lttb', 'minmax')
+
+# Máximo de puntos que se puede pedir con ?points=
+MAX_POINTS = 2000
+
+# Prefijo de las respuestas cacheadas (la clave termina en el ETag)
+CHART_CACHE_PREFIX = 'heating:charts:'
+
+# Días del mapa de calor si no se pide rango (cuatro semanas completas)
+HEATMAP_DEFAULT_DAYS = 28
+
+WEEKDAY_LABELS = ['Lun', 'Mar', 'Mié', 'Jue', 'Vie', 'Sáb', 'Dom']
+
+# Filas leídas por punto como máximo para LTTB
+LTTB_OVERSAMPLING = 8
+
+
+def _parse_range(start_param, end_param, now):
+    """
+    Rango personalizado a partir de ?start= y ?end= (fecha u hora ISO 8601,
+    en hora local si no llevan zona). Sin ?end= se usa ahora.
+
+    Returns:
+        tuple: (inicio, fin) o None si no se pidió rango.
+    """
+    if not start_param and not end_param:
+        return None
+    if not start_param:
+        raise ValueError('Falta el parámetro start')
+
+    def parse(value, name):
+        parsed = parse_datetime(value)
+        if parsed is None:
+            parsed_date = parse_date(value)
+            if parsed_date is None:
+                raise ValueError(f'{name} no es una fecha ISO 8601 válida')
+            parsed = datetime.combine(parsed_date, datetime.min.time())
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
+    start = parse(start_param, 'start')
+    end = parse(end_param, 'end') if end_param else now
+    if start >= end:
+        raise ValueError('start debe ser anterior a end')
+    return start, end
+
+
+def _label_format(step, span):
+    """Formato de etiqueta según el paso y la duración del rango"""
+    if step >= timedelta(days=1):
+        return '%d/%m/%Y'
+    if span <= timedelta(days=1):
+        return '%H:%M'
+    return '%d/%m %H:%M'
+
+
+def _sensor_series(metric, resolution, start_time, time_points, step, agg, downsample):
+    """
+    Serie remuestreada de una métrica de sensores.
+
+    Returns:
+        tuple: (diccionario de series, filas leídas)
+    """
+    fill = resampling.DEFAULT_FILL_TOLERANCE
+    if resolution:
+        partials = rollups.rollup_partials(resolution, start_time, time_points[-1], metric)
+        if downsample == 'lttb':
+            samples = resampling.partials_to_samples(partials)
+            series = {metric: resampling.lttb(samples, time_points, step, fill_tolerance=fill)}
+        else:
+            series = {metric: resampling.resample_partials(partials, time_points, step, agg=agg, fill_tolerance=fill)}
+            if downsample == 'minmax':
+                for bound in ('min', 'max'):
+                    series[f'{metric}_{bound}'] = resampling.resample_partials(
+                        partials, time_points, step, agg=bound, fill_tolerance=fill
+                    )
+        return series, len(partials)
+
+    # Lecturas crudas ordenadas por tiempo (una sola consulta)
+    samples = list(
+        SensorReading.objects.filter(
+            created_at__gt=start_time,
+            created_at__lte=time_points[-1],
+            **{f'{metric}__isnull': False}
+        ).order_by('created_at').values_list('created_at', metric)
+    )
+    if downsample == 'lttb':
+        series = {metric: resampling.lttb(samples, time_points, step, fill_tolerance=fill)}
+    else:
+        series = {metric: resampling.resample(samples, time_points, step, agg=agg, fill_tolerance=fill)}
+        if downsample == 'minmax':
+            for bound in ('min', 'max'):
+                series[f'{metric}_{bound}'] = resampling.resample(
+                    samples, time_points, step, agg=bound, fill_tolerance=fill
+                )
+    return series, len(samples)
+
+
+def _state_changes(rows):
+    """Solo los cambios de estado de una serie ordenada de (fecha, estado)"""
+    previous = object()
+    for moment, state in rows:
+        if state != previous:
+            yield moment, state
+            previous = state
+
+
+def _heating_states(start_time, time_points):
+    """
+    Estado de la calefacción (ActuatorStatus) vigente en cada punto.
+
+    Una sola consulta sobre la ventana, leída con ``.iterator()`` y reducida
+    a los cambios de estado antes del step_join: la memoria depende de los
+    cambios, no de las filas, y el número de consultas no depende de los
+    puntos.
+    """
+    # Estado vigente al inicio de la ventana (último estado anterior)
+    initial_heating = (
+        ActuatorStatus.objects
+        .filter(created_at__lte=start_time)
+        .order_by('-created_at')
+        .values_list('is_heating', flat=True)
+        .first()
+    )
+    rows = (
+        ActuatorStatus.objects
+        .filter(created_at__gt=start_time, created_at__lte=time_points[-1])
+        .order_by('created_at')
+        .values_list('created_at', 'is_heating')
+        .iterator(chunk_size=5_000)
+    )
+    return resampling.step_join(list(_state_changes(rows)), time_points, initial=initial_heating)
 
 
 @login_required
@@ -17,25 +182,243 @@ def charts_dashboard_view(request):
     return render(request, 'heating/charts_dashboard.html')
 
 
+def _chart_etag(*parts):
+    """ETag (y clave de caché) a partir de todo lo que determina la respuesta"""
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def _chart_response(request, payload, etag, generated_at):
+    """
+    Respuesta JSON con ETag y Last-Modified, o 304 Not Modified si el
+    cliente ya tiene esa versión (If-None-Match / If-Modified-Since).
+    """
+    last_modified = int(generated_at.timestamp())
+    response = get_conditional_response(request, etag=quote_etag(etag), last_modified=last_modified)
+    if response is None:
+        response = JsonResponse(payload)
+    response['Last-Modified'] = http_date(last_modified)
+    return _revalidate(response, etag)
+
+
+def _revalidate(response, etag):
+    """ETag y Cache-Control: el navegador puede guardarla pero debe revalidarla siempre"""
+    response['ETag'] = quote_etag(etag)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _chart_series(time_points, step, resolution, agg, downsample):
+    """
+    Series de la gráfica de temperatura/humedad (sin etiquetas) para los
+    intervalos dados.
+
+    Returns:
+        tuple: (diccionario de series, lecturas/agregados leídos)
+    """
+    start_time = time_points[0] - step
+    sensor_data = {}
+    sensor_count = 0
+    for metric in ('temperature', 'humidity'):
+        series, rows_read = _sensor_series(metric, resolution, start_time, time_points, step, agg, downsample)
+        sensor_data.update(series)
+        if metric == 'temperature':
+            sensor_count = rows_read
+
+    heating_states = _heating_states(start_time, time_points)
+    sensor_data['heating_background'] = [30 if heating else 0 for heating in heating_states]
+    return sensor_data, sensor_count
+
+
+def _usage_series(now_local):
+    """Uso diario (30 días) y mensual (12 meses) desde las tablas pre-calculadas"""
+    # Uso diario — una sola consulta a la tabla pre-calculada
+    daily_data = {
+        'labels': [],
+        'hours': []
+    }
+
+    thirty_days_ago = now_local.date() - timedelta(days=29)
+
+    daily_usage_map = {
+        u.date: u.total_hours
+        for u in HeatingDailyUsage.objects.filter(date__gte=thirty_days_ago)
+    }
+
+    for i in range(29, -1, -1):
+        day_date = now_local.date() - timedelta(days=i)
+        daily_data['labels'].append(day_date.strftime('%d/%m'))
+        daily_data['hours'].append(round(daily_usage_map.get(day_date, 0.0), 1))
+
+    # Uso mensual — una sola consulta a la tabla pre-calculada
+    monthly_data = {
+        'labels': [],
+        'hours': []
+    }
+
+    # Calcular los 12 pares (año, mes) en orden ascendente
+    y, m = now_local.year, now_local.month
+    months_needed = []
+    for _ in range(12):
+        months_needed.append((y, m))
+        m -= 1
+        if m == 0:
+            m = 12
+            y -= 1
+    months_needed.reverse()  # de más antiguo a más reciente
+
+    years_needed = list({yr for yr, _ in months_needed})
+    monthly_usage_map = {
+        (u.year, u.month): u.total_hours
+        for u in HeatingMonthlyUsage.objects.filter(year__in=years_needed)
+    }
+
+    for yr, mo in months_needed:
+        month_name = calendar.month_name[mo][:3]
+        monthly_data['labels'].append(f"{month_name} {yr}")
+        monthly_data['hours'].append(round(monthly_usage_map.get((yr, mo), 0.0), 1))
+
+    return daily_data, monthly_data
+
+
+def _current_stats():
+    """Estadísticas actuales (última lectura y último log de calefacción)"""
+    current_sensor = SensorLatest.current_temperature_reading()
+    
+    current_heating = HeatingLog.objects.order_by('-timestamp').first()
+    
+    return {
+        'temperature': current_sensor.temperature if current_sensor else None,
+        'humidity': current_sensor.humidity if current_sensor else None,
+        'is_heating': current_heating.is_heating if current_heating else False,
+        'target_temperature': current_heating.target_temperature if current_heating else None,
+    }
+
+
+def _ingest_watermarks():
+    """Último id de SensorReading y de ActuatorStatus (0 si no hay filas)"""
+    sensor_id = SensorReading.objects.aggregate(last=Max('id'))['last'] or 0
+    actuator_id = ActuatorStatus.objects.aggregate(last=Max('id'))['last'] or 0
+    return sensor_id, actuator_id
+
+
+def _make_cursor(signature, last_point, watermarks, local_date):
+    """
+    Cursor opaco para ?since=: firma de la consulta, fin del último
+    intervalo enviado, últimos ids ingeridos y día local.
+    """
+    sensor_id, actuator_id = watermarks
+    return f"{signature}.{int(last_point.timestamp())}.{sensor_id}.{actuator_id}.{local_date.isoformat()}"
+
+
+def _parse_cursor(cursor):
+    """Inversa de _make_cursor(); None si el cursor no es válido"""
+    try:
+        signature, last_point, sensor_id, actuator_id, local_date = cursor.split('.')
+        return {
+            'signature': signature,
+            'last_point': datetime.fromtimestamp(int(last_point), tz=dt_timezone.utc),
+            'sensor_id': int(sensor_id),
+            'actuator_id': int(actuator_id),
+            'local_date': local_date,
+        }
+    except (AttributeError, ValueError):
+        return None
+
+
+def _dirty_since(model, last_id):
+    """Instante más antiguo de las filas ingeridas después de last_id, o None"""
+    return model.objects.filter(id__gt=last_id).aggregate(oldest=Min('created_at'))['oldest']
+
+
+def _chart_delta(cursor, signature, time_points, step, label_format, resolution, agg, downsample, now_local):
+    """
+    Respuesta incremental para ?since=<cursor>: solo los intervalos nuevos o
+    modificados desde el cursor (más el bloque de estadísticas actuales).
+
+    El cliente descarta ``shift`` intervalos del principio de cada serie,
+    la recorta a ``start_index`` elementos y añade los valores recibidos.
+
+    Returns:
+        dict con el delta, o None si el cursor no sirve (otra consulta,
+        ventana ya desplazada por completo...) y hay que enviar todo.
+    """
+    previous = _parse_cursor(cursor)
+    if previous is None or previous['signature'] != signature:
+        return None
+
+    point_count = len(time_points)
+    shift_steps = (time_points[-1] - previous['last_point']) / step
+    shift = round(shift_steps)
+    if shift < 0 or abs(shift_steps - shift) > 1e-6 or shift >= point_count:
+        return None
+
+    watermarks = _ingest_watermarks()
+    # Primer intervalo que hay que reenviar: el primero nuevo, o el más
+    # antiguo afectado por filas ingeridas después del cursor
+    start_index = point_count - shift
+    dirty = [
+        moment for moment in (
+            _dirty_since(SensorReading, previous['sensor_id']),
+            _dirty_since(ActuatorStatus, previous['actuator_id']),
+        ) if moment is not None
+    ]
+    if dirty:
+        oldest = min(dirty)
+        first_dirty = bisect.bisect_left(time_points, oldest)
+        start_index = max(0, min(start_index, first_dirty))
+
+    delta = {
+        'delta': True,
+        'shift': shift,
+        'start_index': start_index,
+        'cursor': _make_cursor(signature, time_points[-1], watermarks, now_local.date()),
+        'current_stats': _current_stats(),
+    }
+
+    if start_index < point_count:
+        # Unos intervalos de margen para que el relleno (y LTTB) tengan el
+        # contexto anterior; se descartan antes de responder
+        margin = min(start_index, max(1, math.ceil(resampling.DEFAULT_FILL_TOLERANCE / step)))
+        points = time_points[start_index - margin:]
+        series, _ = _chart_series(points, step, resolution, agg, downsample)
+        sensor_data = {name: values[margin:] for name, values in series.items()}
+        sensor_data['labels'] = [timezone.localtime(point).strftime(label_format) for point in points[margin:]]
+    else:
+        sensor_data = {'labels': []}
+    delta['sensor_data'] = sensor_data
+
+    # El uso diario/mensual solo cambia con nuevos estados del actuador o al cambiar de día
+    if previous['actuator_id'] != watermarks[1] or previous['local_date'] != now_local.date().isoformat():
+        delta['daily_usage'], delta['monthly_usage'] = _usage_series(now_local)
+
+    return delta
+
+
 @login_required
-def charts_data_api(request):
-    """API endpoint para obtener datos de gráficas - OPTIMIZADO"""
+async def charts_data_api(request):
+    """
+    API endpoint para obtener datos de gráficas - OPTIMIZADO
+
+    Con ?since=<cursor> (el ``cursor`` de la respuesta anterior) devuelve
+    solo los intervalos nuevos o modificados; ver _chart_delta().
+
+    Vista async: la validación, la caché y los 304 no ocupan un hilo; el
+    cálculo de las series (ORM + remuestreo en CPU) se ejecuta en un hilo
+    con sync_to_async para no bloquear el bucle de eventos.
+    """
     start_time_debug = time.time()
     try:
         period = request.GET.get('period', '24h')
-        print(f"[DEBUG] Iniciando charts_data_api para período: {period}")
-        
-        # Calcular rango de fechas
-        now = timezone.now()
-        if period == '12h':
-            start_time = now - timedelta(hours=12)
-        elif period == '24h':
-            start_time = now - timedelta(hours=24)
-        elif period == '7d':
-            start_time = now - timedelta(days=7)
-        else:
-            start_time = now - timedelta(hours=24)
+        logger.debug(f"Iniciando charts_data_api para período: {period}")
         
+        agg = request.GET.get('agg', 'last')
+        if agg not in resampling.AGGREGATIONS:
+            return JsonResponse({'error': f'Agregación no válida: {agg}'}, status=400)
+
+        downsample = request.GET.get('downsample', 'bucket')
+        if downsample not in DOWNSAMPLING_MODES:
+            return JsonResponse({'error': f'Reducción no válida: {downsample}'}, status=400)
+
         # Determinar intervalo de muestreo según el período para optimizar rendimiento
         # Reducir puntos en móviles para mejor legibilidad
         is_mobile = request.META.get('HTTP_USER_AGENT', '').lower()
@@ -47,229 +430,247 @@ def charts_data_api(request):
         elif period == '24h':
             # Últimas 24h  
             max_points = 144 if mobile_detected else 288
-        elif period == '7d':
-            # Últimos 7 días
+        elif period in ('7d', '30d', '90d', '1y'):
+            # Última semana o más
             max_points = 168 if mobile_detected else 336
         else:
             max_points = 144 if mobile_detected else 288
-            
-        # Obtener datos de sensores con muestreo optimizado
-        # En lugar de obtener todos los registros, obtenemos muestras representativas
-        sensor_readings = SensorReading.objects.filter(
-            created_at__gte=start_time,
-            temperature__isnull=False
-        ).order_by('created_at')
-        
-        # Obtener datos de calefacción desde ActuatorStatus (datos reales del actuador por MQTT)
-        heating_logs = ActuatorStatus.objects.filter(
-            created_at__gte=start_time
-        ).order_by('created_at')
-        
-        # Procesar datos de sensores con muestreo inteligente
-        sensor_data = {
-            'labels': [],
-            'temperature': [],
-            'humidity': [],
-            'heating_background': []
-        }
-        
-        # Convertir a lista para procesamiento más eficiente
-        sensor_list = list(sensor_readings.values('created_at', 'temperature', 'humidity'))
-        # Usar 'created_at' para ActuatorStatus en lugar de 'timestamp'
-        heating_list = list(heating_logs.values('created_at', 'is_heating'))
-        
-        # Debug: añadir información sobre los datos encontrados
-        sensor_count = len(sensor_list)
-        
-        # Crear un diccionario de estado de calefacción por tiempo para búsqueda rápida
-        heating_status_by_time = {}
-        for log in heating_list:
-            heating_status_by_time[log['created_at']] = log['is_heating']
-        
-        # Generar timeline fijo para mostrar siempre las últimas 24h/12h completas
-        now_local = timezone.localtime(now)
-        
-        # Crear diccionarios para búsqueda rápida de datos por timestamp
-        sensors_by_time = {}
-        for reading in sensor_list:
-            sensors_by_time[reading['created_at']] = reading
-            
-        # Generar puntos temporales fijos desde ahora hacia atrás
-        time_points = []
-        if period == '12h':
-            # Generar un punto cada 5 minutos para las últimas 12 horas
-            for i in range(144):  # 12 * 60 / 5 = 144 puntos
-                point_time = now - timedelta(minutes=i * 5)
-                time_points.append(point_time)
-        elif period == '24h':
-            # Generar un punto cada 10 minutos para las últimas 24 horas  
-            for i in range(144):  # 24 * 60 / 10 = 144 puntos
-                point_time = now - timedelta(minutes=i * 10)
-                time_points.append(point_time)
-        elif period == '7d':
-            # Generar un punto cada 60 minutos para la última semana
-            for i in range(168):  # 7 * 24 = 168 puntos
-                point_time = now - timedelta(hours=i)
-                time_points.append(point_time)
+
+        # Presupuesto de puntos: limita el coste de la respuesta sea cual sea
+        # la cantidad de historial almacenado
+        try:
+            budget = int(request.GET.get('points', max_points))
+        except ValueError:
+            return JsonResponse({'error': 'points debe ser un entero'}, status=400)
+        budget = max(2, min(budget, MAX_POINTS))
+
+        # Calcular rango de fechas e intervalos fijos (alineados)
+        now = timezone.now()
+        try:
+            custom_range = _parse_range(request.GET.get('start'), request.GET.get('end'), now)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        if custom_range:
+            range_start, range_end = custom_range
+            span = range_end - range_start
+            point_count = budget
+            label_format = _label_format(span / point_count, span)
+            period = 'custom'
         else:
-            # Default: 24h con puntos cada 10 minutos
-            for i in range(144):
-                point_time = now - timedelta(minutes=i * 10)
-                time_points.append(point_time)
-        
-        # Invertir para que vaya de más antiguo a más reciente
-        time_points.reverse()
-        
-        # Debug: información sobre timeline
-        print(f"Generando timeline fijo de {len(time_points)} puntos para período {period}")
-        
-        # Procesar cada punto temporal fijo
-        for point_time in time_points:
-            point_time_local = timezone.localtime(point_time)
-            
-            # Formatear etiqueta según el período
-            if period == '12h' or period == '24h':
-                label = point_time_local.strftime('%H:%M')
-            elif period == '7d':
-                label = point_time_local.strftime('%d/%m %H:%M')
-            else:
-                label = point_time_local.strftime('%H:%M')
-                
-            sensor_data['labels'].append(label)
-            
-            # Buscar el dato de sensor más cercano a este punto temporal
-            closest_sensor = None
-            min_diff = float('inf')
-            
-            for sensor_time, sensor_reading in sensors_by_time.items():
-                diff = abs((point_time - sensor_time).total_seconds())
-                if diff < min_diff and diff < 3600:  # Máximo 1 hora de tolerancia
-                    min_diff = diff
-                    closest_sensor = sensor_reading
-            
-            # Agregar datos de sensor (usar null para JSON válido)
-            if closest_sensor:
-                sensor_data['temperature'].append(closest_sensor['temperature'])
-                sensor_data['humidity'].append(closest_sensor['humidity'] or 0)
+            span, default_step, label_format = CHART_PERIODS.get(period, CHART_PERIODS['24h'])
+            range_end = now
+            point_count = min(int(span / default_step), budget)
+        step = span / point_count
+        time_points = resampling.bucket_ends(resampling.aligned_end(range_end, step), step, point_count)
+
+        # Agregados pre-calculados: la resolución más gruesa que cabe en el
+        # paso, o una más fina (acotada por el presupuesto) para LTTB. Si no
+        # hay ninguna (o están desactivados) se leen las lecturas.
+        resolution = None
+        if getattr(settings, 'CHARTS_USE_ROLLUPS', True):
+            if downsample == 'lttb':
+                resolution = rollups.pick_fine_resolution(step, span, point_count * LTTB_OVERSAMPLING)
             else:
-                # Usar null para JSON válido (Chart.js maneja null correctamente)
-                sensor_data['temperature'].append(None)
-                sensor_data['humidity'].append(None)
-            
-            # Buscar estado de calefacción más cercano
-            closest_heating = None
-            if heating_status_by_time:
-                closest_time = min(heating_status_by_time.keys(), 
-                                 key=lambda x: abs((point_time - x).total_seconds()),
-                                 default=None)
-                
-                if closest_time:
-                    diff = abs((point_time - closest_time).total_seconds())
-                    if diff < 3600:  # 1 hora de tolerancia
-                        closest_heating = heating_status_by_time[closest_time]
-            
-            # Agregar valor para fondo de calefacción
-            sensor_data['heating_background'].append(30 if closest_heating else 0)
-
-        # Debug: verificar datos generados
-        non_null_temps = [t for t in sensor_data['temperature'] if t is not None]
-        print(f"[DEBUG] Generados {len(sensor_data['labels'])} puntos temporales, {len(non_null_temps)} con datos de temperatura")
-        
-        # Si no hay datos reales, generar algunos datos de ejemplo para mostrar la gráfica
-        if len(non_null_temps) == 0:
-            print("[DEBUG] No hay datos reales, generando datos de ejemplo")
-            # Reemplazar algunos valores None con datos de ejemplo
-            for i in range(0, len(sensor_data['temperature']), max(1, len(sensor_data['temperature']) // 10)):
-                sensor_data['temperature'][i] = 20.0 + (i % 5) * 0.5
-                sensor_data['humidity'][i] = 50.0 + (i % 3) * 5
-        
-        # Uso diario — una sola consulta a la tabla pre-calculada
-        daily_data = {
-            'labels': [],
-            'hours': []
-        }
+                resolution = rollups.pick_resolution(step)
 
+        # Firma de todo lo que define la forma de la serie (para los cursores)
+        signature = _chart_etag(
+            period, agg, downsample, point_count, step.total_seconds(), mobile_detected, resolution
+        )[:12]
         now_local = timezone.localtime(now)
-        thirty_days_ago = now_local.date() - timedelta(days=29)
 
-        daily_usage_map = {
-            u.date: u.total_hours
-            for u in HeatingDailyUsage.objects.filter(date__gte=thirty_days_ago)
-        }
+        since = request.GET.get('since')
+        if since:
+            delta = await sync_to_async(_chart_delta)(
+                since, signature, time_points, step, label_format, resolution, agg, downsample, now_local
+            )
+            if delta is not None:
+                return JsonResponse(delta)
+            # Cursor no válido o ventana desplazada por completo: respuesta completa
 
-        for i in range(29, -1, -1):
-            day_date = now_local.date() - timedelta(days=i)
-            daily_data['labels'].append(day_date.strftime('%d/%m'))
-            daily_data['hours'].append(round(daily_usage_map.get(day_date, 0.0), 1))
+        # Respuesta cacheada compartida entre workers. El ETag incluye todo lo
+        # que determina el resultado: la consulta, la clase de dispositivo, el
+        # último intervalo, el día local (uso diario/mensual) y la versión de
+        # la telemetría, que cambia con cada ingesta.
+        version = await aget_version(TELEMETRY)
+        if version is None:
+            # Versión desconocida: ni ETag ni caché
+            payload = await sync_to_async(_build_chart_payload)(
+                period, agg, budget, resolution, signature, time_points, step, label_format,
+                downsample, point_count, now_local, start_time_debug
+            )
+            return JsonResponse(payload)
 
-        # Uso mensual — una sola consulta a la tabla pre-calculada
-        monthly_data = {
-            'labels': [],
-            'hours': []
-        }
+        etag = _chart_etag(signature, time_points[-1].isoformat(), now_local.date().isoformat(), version)
+        # Si el cliente ya tiene esta versión, 304 sin leer la caché ni calcular
+        if request.META.get('HTTP_IF_NONE_MATCH'):
+            response = get_conditional_response(request, etag=quote_etag(etag))
+            if response is not None:
+                return _revalidate(response, etag)
 
-        # Calcular los 12 pares (año, mes) en orden ascendente
-        y, m = now_local.year, now_local.month
-        months_needed = []
-        for _ in range(12):
-            months_needed.append((y, m))
-            m -= 1
-            if m == 0:
-                m = 12
-                y -= 1
-        months_needed.reverse()  # de más antiguo a más reciente
-
-        years_needed = list({yr for yr, _ in months_needed})
-        monthly_usage_map = {
-            (u.year, u.month): u.total_hours
-            for u in HeatingMonthlyUsage.objects.filter(year__in=years_needed)
-        }
+        # Una sola entrada por consulta (firma), sobrescrita en cada versión: el
+        # número de claves no crece con las ingestas
+        cache_key = CHART_CACHE_PREFIX + signature
+        cached = await cache.aget(cache_key)
+        if cached is not None and cached[0] == etag:
+            _, payload, generated_at = cached
+            return _chart_response(request, payload, etag, generated_at)
 
-        for yr, mo in months_needed:
-            month_name = calendar.month_name[mo][:3]
-            monthly_data['labels'].append(f"{month_name} {yr}")
-            monthly_data['hours'].append(round(monthly_usage_map.get((yr, mo), 0.0), 1))
-        
-        # Obtener estadísticas actuales (optimizado)
-        current_sensor = SensorReading.objects.filter(
-            temperature__isnull=False
-        ).order_by('-created_at').first()
-        
-        current_heating = HeatingLog.objects.order_by('-timestamp').first()
-        
-        current_stats = {
-            'temperature': current_sensor.temperature if current_sensor else None,
-            'humidity': current_sensor.humidity if current_sensor else None,
-            'is_heating': current_heating.is_heating if current_heating else False,
-            'target_temperature': current_heating.target_temperature if current_heating else None,
-        }
-        
-        end_time_debug = time.time()
-        processing_time = round(end_time_debug - start_time_debug, 2)
-        print(f"[DEBUG] charts_data_api completado en {processing_time}s para período {period}")
-        
-        return JsonResponse({
-            'sensor_data': sensor_data,
-            'daily_usage': daily_data,
-            'monthly_usage': monthly_data,
-            'current_stats': current_stats,
-            'period': period,
-            'debug_info': {
-                'processing_time': processing_time,
-                'total_sensor_records': sensor_count,
-                'generated_timeline_points': len(sensor_data['labels']),
-                'non_null_temperatures': len([t for t in sensor_data['temperature'] if t is not None]),
-                'non_null_humidity': len([h for h in sensor_data['humidity'] if h is not None]),
-                'heating_logs_count': len(heating_list),
-                'period_requested': period
-            }
-        })
+        payload = await sync_to_async(_build_chart_payload)(
+            period, agg, budget, resolution, signature, time_points, step, label_format,
+            downsample, point_count, now_local, start_time_debug
+        )
+        await cache.aset(cache_key, (etag, payload, now), getattr(settings, 'CHARTS_CACHE_TIMEOUT', 600))
+        return _chart_response(request, payload, etag, now)
         
     except Exception as e:
-        print(f"[ERROR] charts_data_api falló: {str(e)}")
+        logger.exception(f"charts_data_api falló: {e}")
         return JsonResponse({'error': str(e)}, status=500)
 
 
+def _build_chart_payload(period, agg, budget, resolution, signature, time_points, step, label_format,
+                         downsample, point_count, now_local, start_time_debug):
+    """Calcula la respuesta completa de charts_data_api (síncrono, con ORM)"""
+    # Los ids se leen antes de calcular: lo que llegue durante el cálculo
+    # se reenviará en el siguiente delta
+    watermarks = _ingest_watermarks()
+
+    series, sensor_count = _chart_series(time_points, step, resolution, agg, downsample)
+    sensor_data = {
+        'labels': [timezone.localtime(point).strftime(label_format) for point in time_points],
+    }
+    sensor_data.update(series)
+
+    # Debug: verificar datos generados
+    non_null_temps = [t for t in sensor_data['temperature'] if t is not None]
+    logger.debug(f"Generados {len(sensor_data['labels'])} puntos temporales, {len(non_null_temps)} con datos de temperatura")
+    
+    # Si no hay datos reales, generar algunos datos de ejemplo para mostrar la gráfica
+    if len(non_null_temps) == 0:
+        logger.debug("No hay datos reales, generando datos de ejemplo")
+        # Reemplazar algunos valores None con datos de ejemplo
+        for i in range(0, len(sensor_data['temperature']), max(1, len(sensor_data['temperature']) // 10)):
+            sensor_data['temperature'][i] = 20.0 + (i % 5) * 0.5
+            sensor_data['humidity'][i] = 50.0 + (i % 3) * 5
+    
+    daily_data, monthly_data = _usage_series(now_local)
+    current_stats = _current_stats()
+    
+    end_time_debug = time.time()
+    processing_time = round(end_time_debug - start_time_debug, 2)
+    logger.debug(f"charts_data_api completado en {processing_time}s para período {period}")
+    
+    payload = {
+        'sensor_data': sensor_data,
+        'daily_usage': daily_data,
+        'monthly_usage': monthly_data,
+        'current_stats': current_stats,
+        'period': period,
+        'cursor': _make_cursor(signature, time_points[-1], watermarks, now_local.date()),
+        'debug_info': {
+            'processing_time': processing_time,
+            'total_sensor_records': sensor_count,
+            'generated_timeline_points': len(sensor_data['labels']),
+            'non_null_temperatures': len([t for t in sensor_data['temperature'] if t is not None]),
+            'non_null_humidity': len([h for h in sensor_data['humidity'] if h is not None]),
+            'points_budget': budget,
+            'period_requested': period,
+            'aggregation': agg,
+            'resolution': resolution or 'raw'
+        }
+    }
+    return payload
+
+
+def _weekday_counts(start_date, end_date):
+    """Número de lunes, martes... (0 = lunes) entre dos fechas inclusive"""
+    weeks, extra = divmod((end_date - start_date).days + 1, 7)
+    return [weeks + (1 if (weekday - start_date.weekday()) % 7 < extra else 0) for weekday in range(7)]
+
+
+def _usage_heatmap(start_date, end_date):
+    """
+    Mapa de calor día de la semana × hora desde HeatingHourlyUsage: una sola
+    consulta agrupada (7 × 24 filas como máximo) sea cual sea el rango.
+    """
+    rows = (
+        HeatingHourlyUsage.objects
+        .filter(date__range=(start_date, end_date))
+        .annotate(weekday=ExtractIsoWeekDay('date'))
+        .order_by()
+        .values('weekday', 'hour')
+        .annotate(hours=Sum('total_hours'))
+    )
+    totals = [[0.0] * 24 for _ in range(7)]
+    for row in rows:
+        totals[row['weekday'] - 1][row['hour']] += row['hours']
+
+    days = (end_date - start_date).days + 1
+    counts = _weekday_counts(start_date, end_date)
+    # Media de horas encendida por hora = fracción de la hora encendida
+    heatmap = [
+        [round(hours / counts[weekday], 3) if counts[weekday] else 0.0 for hours in totals[weekday]]
+        for weekday in range(7)
+    ]
+    total_hours = sum(map(sum, totals))
+    peak_weekday, peak_hour = max(
+        ((weekday, hour) for weekday in range(7) for hour in range(24)),
+        key=lambda cell: heatmap[cell[0]][cell[1]]
+    )
+
+    return {
+        'start': start_date.isoformat(),
+        'end': end_date.isoformat(),
+        'days': days,
+        'weekdays': WEEKDAY_LABELS,
+        'hours': list(range(24)),
+        'heatmap': heatmap,
+        'stats': {
+            'total_hours': round(total_hours, 2),
+            'avg_hours_per_day': round(total_hours / days, 2),
+            'duty_cycle': round(total_hours / (days * 24), 4),
+            'by_weekday': [
+                round(sum(totals[weekday]) / counts[weekday], 2) if counts[weekday] else 0.0
+                for weekday in range(7)
+            ],
+            'by_hour': [round(sum(totals[weekday][hour] for weekday in range(7)) / days, 4) for hour in range(24)],
+            'peak': {
+                'weekday': WEEKDAY_LABELS[peak_weekday],
+                'hour': peak_hour,
+                'duty_cycle': heatmap[peak_weekday][peak_hour],
+            },
+        },
+    }
+
+
+@login_required
+def usage_heatmap_api(request):
+    """
+    Mapa de calor del uso de calefacción (día de la semana × hora) y ciclo
+    de trabajo en un rango de días locales.
+    GET /heating/charts/api/heatmap/?start=2025-11-01&end=2025-11-30
+
+    Cada celda es la media de horas encendida en esa hora de ese día de la
+    semana (0-1, el ciclo de trabajo). Sin rango: las últimas cuatro semanas.
+    """
+    today = timezone.localdate()
+    try:
+        end_date = parse_date(request.GET['end']) if request.GET.get('end') else today
+        start_date = (
+            parse_date(request.GET['start']) if request.GET.get('start')
+            else end_date - timedelta(days=HEATMAP_DEFAULT_DAYS - 1)
+        )
+    except ValueError:
+        start_date = end_date = None
+    if start_date is None or end_date is None:
+        return JsonResponse({'error': 'start y end deben ser fechas YYYY-MM-DD'}, status=400)
+    if start_date > end_date:
+        return JsonResponse({'error': 'start debe ser anterior o igual a end'}, status=400)
+
+    return JsonResponse(_usage_heatmap(start_date, end_date))
+
+
 def calculate_heating_time_from_dict_list(logs_dict_list):
     """
     Versión optimizada que calcula tiempo directamente desde lista de diccionarios
@@ -278,31 +679,9 @@ def calculate_heating_time_from_dict_list(logs_dict_list):
     if not logs_dict_list:
         return 0.0
     
-    total_seconds = 0.0
-    heating_start = None
-    
-    for log in logs_dict_list:
-        # Usar 'created_at' si existe, sino 'timestamp' para retrocompatibilidad
-        log_time = log.get('created_at') or log.get('timestamp')
-        
-        if log['is_heating'] and heating_start is None:
-            # Comienza un período de calefacción
-            heating_start = log_time
-        elif not log['is_heating'] and heating_start is not None:
-            # Termina un período de calefacción
-            heating_end = log_time
-            period_seconds = (heating_end - heating_start).total_seconds()
-            total_seconds += period_seconds
-            heating_start = None
-    
-    # Si la calefacción seguía encendida al final del período
-    if heating_start is not None and logs_dict_list:
-        # Asumir que sigue encendida hasta el último log
-        last_log_time = logs_dict_list[-1].get('created_at') or logs_dict_list[-1].get('timestamp')
-        period_seconds = (last_log_time - heating_start).total_seconds()
-        total_seconds += period_seconds
-    
-    return total_seconds / 3600.0  # Convertir a horas
+    # Usar 'created_at' si existe, sino 'timestamp' para retrocompatibilidad
+    times = [log.get('created_at') or log.get('timestamp') for log in logs_dict_list]
+    return heating_hours(times, [log['is_heating'] for log in logs_dict_list])
 
 def calculate_real_heating_time(logs_queryset):
     """
@@ -314,32 +693,10 @@ def calculate_real_heating_time(logs_queryset):
     model_name = logs_queryset.model.__name__ if hasattr(logs_queryset, 'model') else None
     time_field = 'created_at' if model_name == 'ActuatorStatus' else 'timestamp'
     
-    logs = list(logs_queryset.values(time_field, 'is_heating').order_by(time_field))
+    logs = list(logs_queryset.values_list(time_field, 'is_heating').order_by(time_field))
     
     if not logs:
         return 0.0
     
-    total_seconds = 0.0
-    heating_start = None
-    
-    for log in logs:
-        log_time = log[time_field]
-        
-        if log['is_heating'] and heating_start is None:
-            # Comienza un período de calefacción
-            heating_start = log_time
-        elif not log['is_heating'] and heating_start is not None:
-            # Termina un período de calefacción
-            heating_end = log_time
-            period_seconds = (heating_end - heating_start).total_seconds()
-            total_seconds += period_seconds
-            heating_start = None
-    
-    # Si la calefacción seguía encendida al final del período
-    if heating_start is not None and logs:
-        # Asumir que sigue encendida hasta el último log
-        last_log_time = logs[-1][time_field]
-        period_seconds = (last_log_time - heating_start).total_seconds()
-        total_seconds += period_seconds
-    
-    return total_seconds / 3600.0  # Convertir a horas
\ No newline at end of file
+    # Cada estado encendido cuenta hasta el siguiente (vectorizado con NumPy)
+    return heating_hours([log[0] for log in logs], [log[1] for log in logs])
@@ -0,0 +1,126 @@
+"""
+Worker de control en segundo plano.
+
+Las lecturas de sensor se encolan desde ``SensorReading.save`` y un hilo por
+proceso ejecuta ``HeatingController.process_sensor_reading`` fuera de la
+petición HTTP. Las ráfagas de un mismo sensor se agrupan: si llegan varias
+lecturas antes de procesarlas, solo se procesa la más reciente.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class ControlWorker:
+    """
+    Cola acotada de lecturas pendientes + hilo consumidor.
+
+    La cola contiene ids de sensor; el último valor de cada sensor se guarda
+    aparte, de modo que un sensor ocupa como mucho una posición en la cola.
+    Si la cola está llena, ``submit`` espera hasta ``deadline`` segundos y, si
+    sigue sin hueco, procesa la lectura en el propio hilo llamante
+    (contrapresión en lugar de perder la decisión).
+    """
+    _instance = None
+    _instance_pid = None
+    _lock = threading.Lock()
+
+    def __init__(self, max_size=None, deadline=None):
+        self.max_size = max_size or getattr(settings, 'HEATING_CONTROL_QUEUE_SIZE', 32)
+        self.deadline = deadline or getattr(settings, 'HEATING_CONTROL_DEADLINE', 5.0)
+        self._queue = queue.Queue(maxsize=self.max_size)
+        # sensor_id -> (temperatura, encolado_en)
+        self._latest = {}
+        self._latest_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='heating-control', daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def get_instance(cls):
+        """Worker del proceso actual (se recrea tras un fork)"""
+        pid = os.getpid()
+        if cls._instance is None or cls._instance_pid != pid:
+            with cls._lock:
+                if cls._instance is None or cls._instance_pid != pid:
+                    cls._instance = cls()
+                    cls._instance_pid = pid
+        return cls._instance
+
+    def submit(self, sensor_id, temperature):
+        """Encolar una lectura para decisión de control"""
+        with self._latest_lock:
+            already_queued = sensor_id in self._latest
+            enqueued_at = self._latest[sensor_id][1] if already_queued else time.monotonic()
+            self._latest[sensor_id] = (temperature, enqueued_at)
+
+        if already_queued:
+            # Se agrupa con la lectura que ya está en la cola
+            return
+
+        try:
+            self._queue.put(sensor_id, timeout=self.deadline)
+        except queue.Full:
+            logger.warning(f"Cola de control llena, procesando lectura de {sensor_id} en línea")
+            self._process(sensor_id)
+
+    def _pop_latest(self, sensor_id):
+        with self._latest_lock:
+            return self._latest.pop(sensor_id, None)
+
+    def _process(self, sensor_id):
+        latest = self._pop_latest(sensor_id)
+        if latest is None:
+            return
+
+        temperature, enqueued_at = latest
+        lag = time.monotonic() - enqueued_at
+        if lag > self.deadline:
+            logger.warning(f"Decisión de control para {sensor_id} con {lag:.1f}s de retraso")
+
+        from .models import HeatingController
+
+        try:
+            result = HeatingController.process_sensor_reading(
+                sensor_id=sensor_id,
+                temperature=temperature
+            )
+            logger.info(f"Sensor {sensor_id}: {temperature}°C -> Acción: {result.get('action', 'none')}")
+        except Exception as e:
+            logger.error(f"Error procesando control automático: {e}")
+
+    def _run(self):
+        while True:
+            sensor_id = self._queue.get()
+            try:
+                self._process(sensor_id)
+            finally:
+                # El hilo tiene su propia conexión a la DB
+                close_old_connections()
+                self._queue.task_done()
+
+
+def submit_sensor_reading(sensor_id, temperature):
+    """
+    Punto de entrada para el control automático a partir de una lectura.
+    Con HEATING_CONTROL_ASYNC=False se procesa en línea (útil en tests y
+    comandos de gestión).
+    """
+    if not getattr(settings, 'HEATING_CONTROL_ASYNC', True):
+        from .models import HeatingController
+
+        # Un fallo de control no debe hacer fallar la ingesta de la lectura
+        try:
+            return HeatingController.process_sensor_reading(sensor_id=sensor_id, temperature=temperature)
+        except Exception as e:
+            logger.error(f"Error procesando control automático: {e}")
+            return None
+
+    ControlWorker.get_instance().submit(sensor_id, temperature)
+    return None
@@ -0,0 +1,143 @@
+"""
+Estado del controlador de calefacción por actuador.
+
+Guarda en memoria la última decisión, el momento del último comando y la
+última temperatura de cada actuador, de modo que la histéresis y la decisión
+de publicar no necesitan leer HeatingLog. El estado se persiste en
+HeatingControllerState (una fila por actuador) solo cuando se publica un
+comando, y se carga de la base de datos la primera vez que se necesita.
+
+Al persistir se publica una versión nueva (ver cache_versions) para que los
+demás workers recarguen su copia en memoria. La versión compartida se
+consulta como mucho una vez cada HEATING_STATE_VERSION_TTL segundos, no en
+cada lectura de sensor.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from .cache_versions import bump_version, get_version
+
+VERSION_NAME = 'controller_state'
+
+
+class ControllerStateStore:
+    """Estado en memoria por actuador, respaldado por HeatingControllerState"""
+
+    def __init__(self):
+        self._states = {}
+        self._version = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def _sync_version(self):
+        ttl = getattr(settings, 'HEATING_STATE_VERSION_TTL', 5.0)
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < ttl:
+            return
+        self._checked_at = now
+
+        version = get_version(VERSION_NAME)
+        if version is None or version != self._version:
+            # Desconocida (None): se recarga y se vuelve a comprobar en la siguiente llamada
+            self._states = {}
+            self._version = version
+            if version is None:
+                self._checked_at = None
+
+    def _load(self, actuator_id):
+        from .models import HeatingControllerState, HeatingLog
+
+        row = HeatingControllerState.objects.filter(actuator_id=actuator_id).first()
+        if row is not None:
+            return {
+                'is_heating': row.is_heating,
+                'last_command_at': row.last_command_at,
+                'last_temperature': row.last_temperature,
+                'heartbeats': 0,
+            }
+
+        # Primera ejecución: partir del último log, como hacía el controlador
+        last_log = HeatingLog.objects.first()  # Ya ordenado por -timestamp
+        return {
+            'is_heating': last_log.is_heating if last_log else False,
+            'last_command_at': None,
+            'last_temperature': last_log.current_temperature if last_log else None,
+            'heartbeats': 0,
+        }
+
+    def get(self, actuator_id):
+        """Copia del estado actual de un actuador"""
+        with self._lock:
+            self._sync_version()
+            state = self._states.get(actuator_id)
+            if state is None:
+                state = self._states[actuator_id] = self._load(actuator_id)
+            return dict(state)
+
+    def last_heating_state(self, actuator_id):
+        """Última decisión (encender/apagar) tomada para el actuador"""
+        return self.get(actuator_id)['is_heating']
+
+    def record_decision(self, actuator_id, is_heating, temperature):
+        """
+        Registra una decisión y determina si hay que publicar el comando.
+
+        Se publica en cada transición y, si no cambia, cuando han pasado
+        HEATING_COMMAND_HEARTBEAT segundos desde el último comando (latido).
+        De los latidos solo uno de cada HEATING_LOG_HEARTBEAT_EVERY se
+        registra en HeatingLog.
+
+        Returns:
+            tuple: (publicar, registrar_en_log, es_transición)
+        """
+        heartbeat = getattr(settings, 'HEATING_COMMAND_HEARTBEAT', 300)
+        log_every = max(1, getattr(settings, 'HEATING_LOG_HEARTBEAT_EVERY', 6))
+        now = timezone.now()
+
+        with self._lock:
+            self._sync_version()
+            state = self._states.get(actuator_id)
+            if state is None:
+                state = self._states[actuator_id] = self._load(actuator_id)
+
+            state['last_temperature'] = temperature
+            last_command_at = state['last_command_at']
+
+            if last_command_at is None or state['is_heating'] != is_heating:
+                state.update(is_heating=is_heating, last_command_at=now, heartbeats=0)
+                publish, log, transition = True, True, True
+            elif (now - last_command_at).total_seconds() >= heartbeat:
+                state['last_command_at'] = now
+                state['heartbeats'] += 1
+                publish, log, transition = True, state['heartbeats'] % log_every == 0, False
+            else:
+                return False, False, False
+
+            snapshot = dict(state)
+
+        self._persist(actuator_id, snapshot)
+        return publish, log, transition
+
+    def _persist(self, actuator_id, state):
+        from .models import HeatingControllerState
+
+        HeatingControllerState.objects.update_or_create(
+            actuator_id=actuator_id,
+            defaults={
+                'is_heating': state['is_heating'],
+                'last_command_at': state['last_command_at'],
+                'last_temperature': state['last_temperature'],
+            }
+        )
+        # Este proceso ya tiene el estado correcto: adopta la versión nueva
+        # sin recargar; los demás workers recargarán desde la fila escrita.
+        token = bump_version(VERSION_NAME)
+        with self._lock:
+            self._version = token
+            self._checked_at = time.monotonic()
+
+
+store = ControllerStateStore()
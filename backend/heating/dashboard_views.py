@@ -1,10 +1,10 @@
 from django.shortcuts import render
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.contrib.auth.decorators import login_required
-from django.utils import timezone
+from django.core.handlers.asgi import ASGIRequest
 
 from .models import HeatingSettings, HeatingSchedule
-from .serializers import CurrentStatusSerializer
+from .events import abuild_status, aevent_stream, event_stream
 
 @login_required
 def test_dashboard_data(request):
@@ -135,20 +135,14 @@ def dashboard_view(request):
     return render(request, 'heating/dashboard.html')
 
 
-
-
-
-
-
-
-def status_api(request):
-    """API para obtener estado actual (para actualización en tiempo real)"""
+async def status_api(request):
+    """
+    API para obtener estado actual (para actualización en tiempo real).
+    Vista async: bajo ASGI no ocupa un hilo mientras espera a la DB.
+    """
     try:
-        serializer = CurrentStatusSerializer(None)
-        data = serializer.to_representation(None)
-        
-        # Agregar información adicional
-        data['system_time'] = timezone.localtime().strftime('%Y-%m-%d %H:%M:%S')
+        # Estado + hora del sistema (igual que el evento SSE 'status')
+        data = await abuild_status()
         
         return JsonResponse(data)
     except Exception as e:
@@ -156,4 +150,18 @@ def status_api(request):
         return JsonResponse({
             'error': str(e),
             'debug': 'Error en status_api'
-        })
\ No newline at end of file
+        })
+
+@login_required
+def events_api(request):
+    """
+    Stream Server-Sent Events con lecturas, cambios de calefacción y de
+    horario en cuanto se ingieren (sustituye al sondeo de los dashboards).
+    """
+    # Bajo ASGI el stream es async y no retiene un hilo por conexión
+    stream = aevent_stream() if isinstance(request, ASGIRequest) else event_stream()
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Evitar que un proxy (nginx) acumule el stream en buffer
+    response['X-Accel-Buffering'] = 'no'
+    return response
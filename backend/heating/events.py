@@ -0,0 +1,319 @@
+"""
+Publicador de eventos en vivo para los dashboards (Server-Sent Events).
+
+Un único hilo publicador por proceso vigila las versiones compartidas (ver
+cache_versions): telemetría, horarios y configuración. Cuando alguna cambia
+calcula el evento una sola vez y lo reparte, ya serializado, a la cola de cada
+conexión SSE abierta en el proceso. Así el coste en base de datos depende de
+la frecuencia de los cambios y no del número de dashboards abiertos.
+
+Como las versiones viven en la caché compartida, los cambios hechos en otro
+worker (o por el bridge en modo ``--direct``) también se detectan.
+
+Eventos:
+    status   -- mismo contenido que /heating/api/status/
+    reading  -- última lectura de sensor
+    heating  -- cambio de estado de la calefacción
+    schedule -- cambio del horario activo o de la configuración
+"""
+import asyncio
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .cache_versions import TELEMETRY, get_version
+
+logger = logging.getLogger(__name__)
+
+WATCHED_VERSIONS = (TELEMETRY, 'schedules', 'settings')
+
+
+def format_event(name, data, event_id=None):
+    """Trama SSE (``event:``/``data:``) de un evento"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {name}')
+    lines.append(f'data: {json.dumps(data, cls=DjangoJSONEncoder)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def build_status():
+    """Estado actual, igual que la respuesta de status_api"""
+    from .serializers import CurrentStatusSerializer
+
+    data = CurrentStatusSerializer(None).to_representation(None)
+    data['system_time'] = timezone.localtime().strftime('%Y-%m-%d %H:%M:%S')
+    return data
+
+
+async def abuild_status():
+    """Versión de build_status para vistas async (ORM async)"""
+    from .serializers import CurrentStatusSerializer
+
+    data = await CurrentStatusSerializer(None).ato_representation(None)
+    data['system_time'] = timezone.localtime().strftime('%Y-%m-%d %H:%M:%S')
+    return data
+
+
+def _put_dropping_oldest(target, frame, full_error, empty_error):
+    """Encola ``frame``; si la cola está llena se pierde la trama más antigua"""
+    try:
+        target.put_nowait(frame)
+    except full_error:
+        try:
+            target.get_nowait()
+        except empty_error:
+            pass
+        try:
+            target.put_nowait(frame)
+        except full_error:
+            pass
+
+
+class _Subscriber:
+    """Conexión servida por un generador síncrono (WSGI)"""
+
+    def __init__(self, maxsize):
+        self.queue = queue.Queue(maxsize=maxsize)
+
+    def deliver(self, frame):
+        _put_dropping_oldest(self.queue, frame, queue.Full, queue.Empty)
+
+
+class _AsyncSubscriber:
+    """Conexión servida por un generador async (ASGI) en el bucle ``loop``"""
+
+    def __init__(self, maxsize, loop):
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.loop = loop
+
+    def deliver(self, frame):
+        # Se llama desde el hilo publicador: la cola solo se toca en su bucle
+        try:
+            self.loop.call_soon_threadsafe(
+                _put_dropping_oldest, self.queue, frame, asyncio.QueueFull, asyncio.QueueEmpty
+            )
+        except RuntimeError:
+            # Bucle ya cerrado: la conexión se está dando de baja
+            pass
+
+
+def _latest_reading():
+    from sensors.models import SensorLatest
+
+    reading = SensorLatest.current_temperature_reading()
+    if reading is None:
+        return None
+    return {
+        'id': reading.id,
+        'sensor_id': reading.sensor_id,
+        'temperature': reading.temperature,
+        'humidity': reading.humidity,
+        'created_at': reading.created_at,
+    }
+
+
+class EventBroker:
+    """
+    Reparto de eventos a las conexiones SSE del proceso.
+
+    Cada conexión tiene una cola acotada de tramas ya serializadas (de
+    ``queue`` o de ``asyncio`` según se sirva por WSGI o ASGI); si un
+    cliente lento la llena se descarta su trama más antigua. El hilo
+    publicador arranca con el primer suscriptor y termina cuando no queda
+    ninguno.
+    """
+    _instance = None
+    _instance_pid = None
+    _lock = threading.Lock()
+
+    def __init__(self):
+        self.poll_interval = getattr(settings, 'EVENTS_POLL_INTERVAL', 1.0)
+        self.status_refresh = getattr(settings, 'EVENTS_STATUS_REFRESH', 60)
+        self.queue_size = getattr(settings, 'EVENTS_QUEUE_SIZE', 100)
+        self._subscribers = set()
+        self._subscribers_lock = threading.Lock()
+        self._thread = None
+        self._ids = itertools.count(1)
+        self._versions = None
+        self._last_status = None
+        self._last_reading_id = None
+
+    @classmethod
+    def get_instance(cls):
+        """Publicador del proceso actual (se recrea tras un fork)"""
+        pid = os.getpid()
+        if cls._instance is None or cls._instance_pid != pid:
+            with cls._lock:
+                if cls._instance is None or cls._instance_pid != pid:
+                    cls._instance = cls()
+                    cls._instance_pid = pid
+        return cls._instance
+
+    def subscribe(self, loop=None):
+        """
+        Suscriptor para una conexión nueva; con ``loop`` sus tramas se
+        entregan en ese bucle de asyncio
+        """
+        if loop is None:
+            subscriber = _Subscriber(self.queue_size)
+        else:
+            subscriber = _AsyncSubscriber(self.queue_size, loop)
+        with self._subscribers_lock:
+            self._subscribers.add(subscriber)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='heating-events', daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._subscribers_lock:
+            self._subscribers.discard(subscriber)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, name, data):
+        """Serializa el evento una vez y lo entrega a todas las conexiones"""
+        frame = format_event(name, data, next(self._ids))
+        with self._subscribers_lock:
+            subscribers = list(self._subscribers)
+
+        for subscriber in subscribers:
+            subscriber.deliver(frame)
+
+    def _current_versions(self):
+        return {name: get_version(name) for name in WATCHED_VERSIONS}
+
+    def _check(self, refresh_status):
+        """Compara versiones y publica los eventos que correspondan"""
+        versions = self._current_versions()
+        if self._versions is None:
+            # Primera pasada: solo tomar la referencia
+            self._versions = versions
+            self._last_status = build_status()
+            reading = _latest_reading()
+            self._last_reading_id = reading['id'] if reading else None
+            return
+
+        changed = {name for name in WATCHED_VERSIONS if versions[name] != self._versions[name]}
+        self._versions = versions
+        if not changed and not refresh_status:
+            return
+
+        if TELEMETRY in changed:
+            reading = _latest_reading()
+            if reading and reading['id'] != self._last_reading_id:
+                self._last_reading_id = reading['id']
+                self.publish('reading', reading)
+
+        status = build_status()
+        previous = self._last_status or {}
+        self._last_status = status
+
+        if status.get('is_heating') != previous.get('is_heating'):
+            self.publish('heating', {
+                'is_heating': status.get('is_heating'),
+                'current_temperature': status.get('current_temperature'),
+                'target_temperature': status.get('target_temperature'),
+            })
+
+        schedule_changed = (
+            changed & {'schedules', 'settings'}
+            or status.get('active_schedule') != previous.get('active_schedule')
+            or status.get('target_temperature') != previous.get('target_temperature')
+        )
+        if schedule_changed:
+            self.publish('schedule', {
+                'active_schedule': status.get('active_schedule'),
+                'target_temperature': status.get('target_temperature'),
+                'default_temperature': status.get('default_temperature'),
+                'system_active': status.get('system_active'),
+            })
+
+        comparable = lambda data: {k: v for k, v in data.items() if k != 'system_time'}
+        if changed or comparable(status) != comparable(previous):
+            self.publish('status', status)
+
+    def _run(self):
+        last_refresh = time.monotonic()
+        while True:
+            with self._subscribers_lock:
+                if not self._subscribers:
+                    self._thread = None
+                    self._versions = None
+                    return
+
+            now = time.monotonic()
+            # Refresco periódico: los horarios cambian con la hora aunque
+            # nadie modifique datos
+            refresh_status = now - last_refresh >= self.status_refresh
+            if refresh_status:
+                last_refresh = now
+
+            try:
+                self._check(refresh_status)
+            except Exception as e:
+                logger.error(f"Error publicando eventos: {e}")
+            finally:
+                # El hilo tiene su propia conexión a la DB
+                close_old_connections()
+
+            time.sleep(self.poll_interval)
+
+
+def event_stream(broker=None):
+    """
+    Generador de la respuesta SSE de una conexión: estado inicial, eventos
+    según llegan y comentarios de keepalive. Termina tras
+    EVENTS_MAX_DURATION segundos; EventSource reconecta solo.
+    """
+    broker = broker or EventBroker.get_instance()
+    keepalive = getattr(settings, 'EVENTS_KEEPALIVE', 15)
+    max_duration = getattr(settings, 'EVENTS_MAX_DURATION', 600)
+    subscriber = broker.subscribe()
+    deadline = time.monotonic() + max_duration
+    try:
+        yield 'retry: 5000\n\n'
+        yield format_event('status', build_status())
+        close_old_connections()
+
+        while time.monotonic() < deadline:
+            try:
+                yield subscriber.queue.get(timeout=keepalive)
+            except queue.Empty:
+                yield ': keepalive\n\n'
+    finally:
+        broker.unsubscribe(subscriber)
+
+
+async def aevent_stream(broker=None):
+    """Versión de event_stream para ASGI: no ocupa un hilo por conexión"""
+    broker = broker or EventBroker.get_instance()
+    keepalive = getattr(settings, 'EVENTS_KEEPALIVE', 15)
+    max_duration = getattr(settings, 'EVENTS_MAX_DURATION', 600)
+    loop = asyncio.get_running_loop()
+    subscriber = broker.subscribe(loop=loop)
+    deadline = loop.time() + max_duration
+    try:
+        yield 'retry: 5000\n\n'
+        yield format_event('status', await abuild_status())
+
+        while loop.time() < deadline:
+            try:
+                yield await asyncio.wait_for(subscriber.queue.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+    finally:
+        broker.unsubscribe(subscriber)
@@ -0,0 +1,164 @@
+"""
+Benchmark de un servidor en marcha: latencia (p50/p95/p99) de los endpoints de
+lectura más consultados y memoria residente de los procesos de gunicorn.
+
+Sirve para comparar los perfiles de gunicorn.conf.py (GUNICORN_MODE=sync,
+wsgi o asgi) sobre la misma máquina y la misma base de datos:
+
+    GUNICORN_MODE=wsgi ./start_backend.sh --force
+    python manage.py benchmark_server --label wsgi --username admin --password ...
+    GUNICORN_MODE=sync ./start_backend.sh --force
+    python manage.py benchmark_server --label sync --username admin --password ...
+    GUNICORN_MODE=asgi ./start_backend.sh --force
+    python manage.py benchmark_server --label asgi --username admin --password ...
+"""
+import math
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_ENDPOINTS = [
+    '/heating/api/status/',
+    '/heating/charts/api/data/?period=24h',
+    '/heating/charts/api/data/?period=7d',
+    '/sensors/api/readings/latest/',
+    '/actuators/api/status/current/',
+]
+
+
+def percentile(sorted_values, pct):
+    """Percentil por el método del rango más cercano"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def process_rss_kb(pattern):
+    """
+    Memoria residente total (KB) de los procesos cuya línea de comandos
+    contiene ``pattern`` (lee /proc, solo Linux). Devuelve (total, procesos).
+    """
+    total = 0
+    count = 0
+    own_pid = os.getpid()
+    for pid in os.listdir('/proc'):
+        if not pid.isdigit() or int(pid) == own_pid:
+            continue
+        try:
+            with open(f'/proc/{pid}/cmdline', 'rb') as f:
+                cmdline = f.read().replace(b'\0', b' ').decode(errors='ignore')
+            if pattern not in cmdline:
+                continue
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+                        count += 1
+                        break
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            continue
+    return total, count
+
+
+class Command(BaseCommand):
+    help = 'Medir latencia (p50/p95/p99) y memoria de un servidor en marcha'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='URL base del servidor')
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            help='Ruta a medir (repetible); por defecto status, gráficas, latest y current')
+        parser.add_argument('--requests', type=int, default=200, help='Peticiones por endpoint')
+        parser.add_argument('--concurrency', type=int, default=10, help='Peticiones simultáneas')
+        parser.add_argument('--username', help='Usuario para las vistas con login (gráficas)')
+        parser.add_argument('--password', help='Contraseña del usuario')
+        parser.add_argument('--process-pattern', default='gunicorn',
+                            help='Texto de la línea de comandos de los procesos a medir')
+        parser.add_argument('--label', default='', help='Etiqueta del perfil medido (sync, wsgi, asgi...)')
+
+    def handle(self, *args, **options):
+        base_url = options['url'].rstrip('/')
+        endpoints = options['endpoints'] or DEFAULT_ENDPOINTS
+        total_requests = options['requests']
+        concurrency = options['concurrency']
+        if total_requests < 1 or concurrency < 1:
+            raise CommandError('--requests y --concurrency deben ser positivos')
+
+        cookies = self._login(base_url, options['username'], options['password'])
+
+        rss_before, process_count = process_rss_kb(options['process_pattern'])
+        label = f" [{options['label']}]" if options['label'] else ''
+        self.stdout.write(f"=== Benchmark{label}: {base_url} ===")
+        self.stdout.write(
+            f"Procesos '{options['process_pattern']}': {process_count}, "
+            f"RSS total {rss_before / 1024:.1f} MB (antes)\n"
+        )
+        self.stdout.write(f"{'endpoint':45} {'ok':>5} {'err':>4} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>7}")
+
+        for endpoint in endpoints:
+            latencies, errors, elapsed = self._run(base_url + endpoint, cookies, total_requests, concurrency)
+            latencies.sort()
+            to_ms = lambda value: f"{value * 1000:.1f}" if value is not None else '-'
+            self.stdout.write(
+                f"{endpoint[:45]:45} {len(latencies):>5} {errors:>4} "
+                f"{to_ms(percentile(latencies, 50)):>8} {to_ms(percentile(latencies, 95)):>8} "
+                f"{to_ms(percentile(latencies, 99)):>8} {len(latencies) / elapsed:>7.1f}"
+            )
+            if latencies:
+                self.stdout.write(f"{'':45} media {statistics.mean(latencies) * 1000:.1f} ms")
+
+        rss_after, process_count = process_rss_kb(options['process_pattern'])
+        self.stdout.write(
+            f"\nProcesos '{options['process_pattern']}': {process_count}, "
+            f"RSS total {rss_after / 1024:.1f} MB (después)"
+        )
+        self.stdout.write("Latencias en ms (peticiones correctas)")
+
+    def _login(self, base_url, username, password):
+        """Cookies de sesión iniciando sesión por el formulario del admin"""
+        if not username:
+            return None
+        session = requests.Session()
+        login_url = f'{base_url}/admin/login/'
+        session.get(login_url, timeout=10)
+        response = session.post(login_url, data={
+            'username': username,
+            'password': password or '',
+            'csrfmiddlewaretoken': session.cookies.get('csrftoken', ''),
+            'next': '/admin/',
+        }, headers={'Referer': login_url}, timeout=10)
+        if 'sessionid' not in session.cookies:
+            raise CommandError(f'No se pudo iniciar sesión como {username} (HTTP {response.status_code})')
+        return session.cookies.get_dict()
+
+    def _run(self, url, cookies, total_requests, concurrency):
+        """Lanza ``total_requests`` GET con ``concurrency`` hilos"""
+        local = threading.local()
+
+        def fetch(_):
+            # Una sesión (conexión keep-alive) por hilo
+            session = getattr(local, 'session', None)
+            if session is None:
+                session = local.session = requests.Session()
+                if cookies:
+                    session.cookies.update(cookies)
+            started = time.perf_counter()
+            try:
+                response = session.get(url, timeout=30, allow_redirects=False)
+                ok = response.status_code == 200
+            except requests.RequestException:
+                ok = False
+            return ok, time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(fetch, range(total_requests)))
+        elapsed = time.perf_counter() - started
+
+        latencies = [latency for ok, latency in results if ok]
+        return latencies, len(results) - len(latencies), elapsed
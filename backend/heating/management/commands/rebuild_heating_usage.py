@@ -1,53 +1,42 @@
-import datetime
 import time
-from collections import defaultdict
 
-from django.core.management.base import BaseCommand
-from django.db import transaction
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 
 from actuators.models import ActuatorStatus
-from heating.models import HeatingDailyUsage, HeatingMonthlyUsage
+from heating.models import HeatingUsageCheckpoint
+from heating.usage import rebuild_usage
 
-REPORT_EVERY = 10_000  # Mostrar progreso cada N pares
-
-
-def _accumulate_period(daily_totals, monthly_totals, start_local, end_local):
-    """
-    Acumula un período de calefacción en los diccionarios en memoria.
-    Recibe datetimes YA convertidos a hora local — no hace ninguna query ni
-    conversión de timezone.
-    """
-    if end_local <= start_local:
-        return
-
-    # Avanzar día a día hasta el último día del período (exclusive)
-    current = start_local
-    while current.date() < end_local.date():
-        midnight = current.replace(hour=0, minute=0, second=0, microsecond=0) + datetime.timedelta(days=1)
-        hours = (midnight - current).total_seconds() / 3600.0
-        if hours > 0:
-            day = current.date()
-            daily_totals[day] += hours
-            monthly_totals[(day.year, day.month)] += hours
-        current = midnight
-
-    # Fracción del último día (o único día si start y end son el mismo día)
-    hours = (end_local - current).total_seconds() / 3600.0
-    if hours > 0:
-        day = current.date()
-        daily_totals[day] += hours
-        monthly_totals[(day.year, day.month)] += hours
+CHECKPOINT = 'rebuild'
 
 
 class Command(BaseCommand):
     help = (
-        'Reconstruye HeatingDailyUsage y HeatingMonthlyUsage a partir del '
-        'historial completo de ActuatorStatus. Borra los datos existentes antes '
-        'de recalcular.'
+        'Reconstruye HeatingHourlyUsage, HeatingDailyUsage y HeatingMonthlyUsage '
+        'a partir del historial de ActuatorStatus: todo el historial, un rango de días '
+        '(--since/--until) o solo lo llegado desde la última ejecución '
+        '(--incremental). Sustituye los datos del rango recalculado.'
     )
 
     def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help='Primer día a recalcular (YYYY-MM-DD, hora local).',
+        )
+        parser.add_argument(
+            '--until',
+            help='Último día a recalcular, inclusive (YYYY-MM-DD, hora local).',
+        )
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help=(
+                'Recalcula solo desde el día del estado más antiguo llegado '
+                'tras el último punto de control (id de ActuatorStatus).'
+            ),
+        )
         parser.add_argument(
             '--no-input',
             action='store_true',
@@ -56,97 +45,72 @@ class Command(BaseCommand):
         )
 
     def handle(self, *args, **options):
-        if not options['no_input']:
+        since = self._parse_day(options['since'], '--since')
+        until = self._parse_day(options['until'], '--until')
+        if since and until and since > until:
+            raise CommandError('--since no puede ser posterior a --until')
+        if options['incremental'] and (since or until):
+            raise CommandError('--incremental no admite --since/--until')
+
+        checkpoint, _ = HeatingUsageCheckpoint.objects.get_or_create(name=CHECKPOINT)
+        # Tope fijado antes de leer: lo que llegue durante la reconstrucción
+        # se recoge en la siguiente ejecución incremental
+        max_id = ActuatorStatus.objects.aggregate(max_id=Max('id'))['max_id']
+        if max_id is None:
+            self.stdout.write(self.style.WARNING('No hay registros de ActuatorStatus.'))
+            return
+
+        if options['incremental']:
+            pending = ActuatorStatus.objects.filter(id__gt=checkpoint.last_status_id, id__lte=max_id)
+            oldest = pending.aggregate(oldest=Min('created_at'))['oldest']
+            if oldest is None:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Nada que recalcular: sin estados nuevos desde el id {checkpoint.last_status_id}.'
+                ))
+                return
+            since = timezone.localdate(oldest)
+            self.stdout.write(
+                f'{pending.count():,} estados nuevos desde el id {checkpoint.last_status_id}; '
+                f'recalculando desde {since}.'
+            )
+        elif not options['no_input']:
+            scope = self._describe_range(since, until)
             confirm = input(
-                'Esto borrará todos los registros de HeatingDailyUsage y '
-                'HeatingMonthlyUsage y los recalculará desde cero.\n'
+                f'Esto borrará los registros de uso horario, diario y mensual '
+                f'de {scope} y los recalculará.\n'
                 '¿Continuar? [s/N] '
             )
             if confirm.strip().lower() not in ('s', 'si', 'sí', 'y', 'yes'):
                 self.stdout.write(self.style.WARNING('Operación cancelada.'))
                 return
 
-        total = ActuatorStatus.objects.count()
-        if total == 0:
-            self.stdout.write(self.style.WARNING('No hay registros de ActuatorStatus.'))
-            return
-
-        # --- Carga con conversión de timezone de una sola vez ---
-        self.stdout.write(f'Cargando {total:,} registros y convirtiendo a hora local...')
-        local_tz = timezone.get_current_timezone()
-        t0_load = time.time()
-
-        statuses = []
-        for s in (
-            ActuatorStatus.objects
-            .order_by('created_at')
-            .values('created_at', 'is_heating')
-            .iterator(chunk_size=5_000)
-        ):
-            statuses.append((s['created_at'].astimezone(local_tz), s['is_heating']))
-            n = len(statuses)
-            if n % 50_000 == 0:
-                self.stdout.write(f'  {n:,}/{total:,} registros cargados...')
-                self.stdout.flush()
-
-        load_secs = time.time() - t0_load
-        self.stdout.write(f'  {len(statuses):,} registros cargados en {load_secs:.1f}s')
+        self.stdout.write(f'Recalculando {self._describe_range(since, until)}...')
         self.stdout.flush()
+        started = time.time()
+        days, months, hours = rebuild_usage(since, until)
+        elapsed = time.time() - started
 
-        # --- Bucle de cálculo con progreso ---
-        self.stdout.write(f'Calculando períodos ({total - 1:,} pares)...')
-        self.stdout.flush()
-        daily_totals = defaultdict(float)
-        monthly_totals = defaultdict(float)
-
-        t0_calc = time.time()
-        pairs_total = len(statuses) - 1
-
-        for i in range(1, len(statuses)):
-            prev_local, prev_heating = statuses[i - 1]
-            curr_local, _           = statuses[i]
-
-            if prev_heating:
-                _accumulate_period(daily_totals, monthly_totals, prev_local, curr_local)
-
-            if i % REPORT_EVERY == 0:
-                elapsed = time.time() - t0_calc
-                rate = i / elapsed if elapsed > 0 else 0
-                eta = (pairs_total - i) / rate if rate > 0 else 0
-                pct = i / pairs_total * 100
-                self.stdout.write(
-                    f'  {i:>{len(str(pairs_total))}}/{pairs_total:,}  '
-                    f'({pct:.1f}%)  '
-                    f'{elapsed:.0f}s transcurridos  '
-                    f'ETA: {eta:.0f}s'
-                )
-                self.stdout.flush()
-
-        calc_secs = time.time() - t0_calc
-        self.stdout.write(
-            f'Cálculo completado en {calc_secs:.1f}s: '
-            f'{len(daily_totals)} días, {len(monthly_totals)} meses con calefacción activa.'
-        )
-
-        # --- Escritura en DB: borrar + bulk_create en una transacción ---
-        self.stdout.write('Guardando en la base de datos...')
-        with transaction.atomic():
-            HeatingDailyUsage.objects.all().delete()
-            HeatingMonthlyUsage.objects.all().delete()
-
-            HeatingDailyUsage.objects.bulk_create([
-                HeatingDailyUsage(date=day, total_hours=round(hours, 4))
-                for day, hours in sorted(daily_totals.items())
-            ])
-
-            HeatingMonthlyUsage.objects.bulk_create([
-                HeatingMonthlyUsage(year=yr, month=mo, total_hours=round(hours, 4))
-                for (yr, mo), hours in sorted(monthly_totals.items())
-            ])
+        # El punto de control solo avanza si se ha recalculado hasta el final
+        if until is None:
+            checkpoint.last_status_id = max_id
+            checkpoint.save(update_fields=['last_status_id', 'updated_at'])
 
         self.stdout.write(
             self.style.SUCCESS(
-                f'Listo. {HeatingDailyUsage.objects.count()} registros diarios y '
-                f'{HeatingMonthlyUsage.objects.count()} registros mensuales creados.'
+                f'Listo en {elapsed:.1f}s. {hours} registros horarios, {days} diarios y '
+                f'{months} mensuales escritos. Punto de control: id {checkpoint.last_status_id}.'
             )
         )
+
+    def _parse_day(self, value, option):
+        if not value:
+            return None
+        day = parse_date(value)
+        if day is None:
+            raise CommandError(f'{option}: fecha no válida ({value}), se espera YYYY-MM-DD')
+        return day
+
+    def _describe_range(self, since, until):
+        if since is None and until is None:
+            return 'todo el historial'
+        return f"{since or 'el principio'} a {until or 'hoy'}"
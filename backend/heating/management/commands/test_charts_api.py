@@ -2,6 +2,7 @@
 """
 Verificar que la API de gráficas funciona correctamente en todos los períodos
 """
+from asgiref.sync import async_to_sync
 from django.core.management.base import BaseCommand
 from heating.charts_views import charts_data_api
 from django.test import RequestFactory
@@ -24,17 +25,23 @@ class Command(BaseCommand):
                 self.stdout.write("❌ No hay usuarios en la base de datos")
                 return
             
+            # login_required de las vistas async consulta request.auser()
+            async def auser():
+                return user
+            
             # Probar diferentes períodos
-            periods = ['24h', '7d', '30d']
+            periods = ['24h', '7d', '30d', '90d', '1y']
             
             for period in periods:
                 self.stdout.write(f"🔍 Probando período: {period}")
                 
                 request = factory.get(f'/heating/charts/api/data/?period={period}')
                 request.user = user
+                request.auser = auser
                 
                 try:
-                    response = charts_data_api(request)
+                    # La vista es async
+                    response = async_to_sync(charts_data_api)(request)
                     
                     if response.status_code == 200:
                         data = json.loads(response.content)
@@ -97,6 +104,8 @@ class Command(BaseCommand):
             self.stdout.write("   • API 24h: http://localhost:8000/heating/charts/api/data/?period=24h")
             self.stdout.write("   • API 7d: http://localhost:8000/heating/charts/api/data/?period=7d")
             self.stdout.write("   • API 30d: http://localhost:8000/heating/charts/api/data/?period=30d")
+            self.stdout.write("   • API 1y (LTTB): http://localhost:8000/heating/charts/api/data/?period=1y&downsample=lttb")
+            self.stdout.write("   • API rango: http://localhost:8000/heating/charts/api/data/?start=2025-01-01&end=2025-02-01&points=200")
             
             self.stdout.write(self.style.SUCCESS("\n🎉 VERIFICACIÓN COMPLETADA"))
             
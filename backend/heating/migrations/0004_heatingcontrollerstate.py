@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-16 21:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('heating', '0003_heatingdailyusage_heatingmonthlyusage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HeatingControllerState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('actuator_id', models.CharField(help_text='ID del actuador', max_length=50, unique=True)),
+                ('is_heating', models.BooleanField(default=False, help_text='Última decisión del controlador')),
+                ('last_command_at', models.DateTimeField(blank=True, help_text='Momento del último comando publicado', null=True)),
+                ('last_temperature', models.FloatField(blank=True, help_text='Última temperatura procesada (°C)', null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Estado del Controlador',
+                'verbose_name_plural': 'Estados del Controlador',
+            },
+        ),
+    ]
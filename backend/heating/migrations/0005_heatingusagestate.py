@@ -0,0 +1,43 @@
+from django.db import migrations, models
+
+
+def backfill_state(apps, schema_editor):
+    """Último estado de cada actuador como punto de partida de la contabilidad"""
+    ActuatorStatus = apps.get_model('actuators', 'ActuatorStatus')
+    HeatingUsageState = apps.get_model('heating', 'HeatingUsageState')
+
+    actuator_ids = ActuatorStatus.objects.values_list('actuator_id', flat=True).distinct()
+    for actuator_id in actuator_ids:
+        status = ActuatorStatus.objects.filter(actuator_id=actuator_id).order_by('-created_at').first()
+        HeatingUsageState.objects.create(
+            actuator_id=actuator_id,
+            last_status_at=status.created_at if status else None,
+            last_is_heating=status.is_heating if status else False,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('actuators', '0005_actuatorlatest'),
+        ('heating', '0004_heatingcontrollerstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HeatingUsageState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('actuator_id', models.CharField(help_text='ID del actuador', max_length=50, unique=True)),
+                ('last_status_at', models.DateTimeField(blank=True, help_text='Momento del último estado contabilizado', null=True)),
+                ('last_is_heating', models.BooleanField(default=False, help_text='¿Estaba encendida en el último estado?')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Estado de Contabilidad de Uso',
+                'verbose_name_plural': 'Estados de Contabilidad de Uso',
+                'ordering': ['actuator_id'],
+            },
+        ),
+        migrations.RunPython(backfill_state, migrations.RunPython.noop),
+    ]
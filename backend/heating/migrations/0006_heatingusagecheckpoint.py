@@ -0,0 +1,24 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('heating', '0005_heatingusagestate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HeatingUsageCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(default='rebuild', help_text='Nombre del punto de control', max_length=50, unique=True)),
+                ('last_status_id', models.BigIntegerField(default=0, help_text='Id del último ActuatorStatus procesado')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Punto de Control de Uso',
+                'verbose_name_plural': 'Puntos de Control de Uso',
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('heating', '0006_heatingusagecheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HeatingHourlyUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(help_text='Fecha del día (hora local)')),
+                ('hour', models.PositiveSmallIntegerField(help_text='Hora local (0-23)', validators=[django.core.validators.MaxValueValidator(23)])),
+                ('total_hours', models.FloatField(default=0.0, help_text='Horas de calefacción encendida en esa hora')),
+                ('last_updated', models.DateTimeField(auto_now=True, help_text='Última actualización del registro')),
+            ],
+            options={
+                'verbose_name': 'Uso Horario de Calefacción',
+                'verbose_name_plural': 'Usos Horarios de Calefacción',
+                'ordering': ['-date', '-hour'],
+                'unique_together': {('date', 'hour')},
+            },
+        ),
+    ]
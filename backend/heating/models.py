@@ -46,10 +46,49 @@ class HeatingSettings(models.Model):
             HeatingSettings.objects.filter(is_active=True).exclude(id=self.id).update(is_active=False)
         super().save(*args, **kwargs)
     
+    # Caché por proceso: (versión compartida, configuración)
+    _cached = None
+    
     @classmethod
     def get_current_settings(cls):
-        """Obtiene la configuración activa actual"""
-        return cls.objects.filter(is_active=True).first() or cls.objects.first()
+        """
+        Obtiene la configuración activa actual.
+        Se guarda en memoria y solo se vuelve a consultar cuando cambia la
+        versión compartida 'settings' (ver cache_versions). Con la versión
+        desconocida (None) se consulta siempre.
+        """
+        from .cache_versions import get_version
+        
+        version = get_version('settings')
+        cached = cls._cached
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        
+        current = cls.objects.filter(is_active=True).first() or cls.objects.first()
+        if version is not None:
+            cls._cached = (version, current)
+        return current
+    
+    @classmethod
+    async def aget_current_settings(cls):
+        """Versión de get_current_settings para vistas async (ORM async)"""
+        from .cache_versions import aget_version
+        
+        version = await aget_version('settings')
+        cached = cls._cached
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        
+        current = await cls.objects.filter(is_active=True).afirst() or await cls.objects.afirst()
+        if version is not None:
+            cls._cached = (version, current)
+        return current
+    
+    @classmethod
+    def invalidate_cache(cls):
+        """Invalida la configuración cacheada en todos los procesos"""
+        from .cache_versions import bump_version
+        bump_version('settings')
     
     @classmethod
     def set_active_configuration(cls, config_id):
@@ -58,6 +97,8 @@ class HeatingSettings(models.Model):
         cls.objects.update(is_active=False)
         # Activar la seleccionada
         cls.objects.filter(id=config_id).update(is_active=True)
+        # update() no dispara signals
+        cls.invalidate_cache()
         return cls.objects.get(id=config_id)
 
 
@@ -166,23 +207,18 @@ class HeatingSchedule(models.Model):
     
     @classmethod
     def get_current_active_schedule(cls):
-        """Obtiene el horario activo actual"""
-        for schedule in cls.objects.filter(is_active=True):
-            if schedule.is_active_now():
-                return schedule
-        return None
+        """Obtiene el horario activo actual (desde la línea temporal compilada)"""
+        from .schedule_timeline import get_timeline
+        return get_timeline().schedule_at()
     
     @classmethod
     def get_current_target_temperature(cls):
-        """Obtiene la temperatura objetivo actual"""
-        # Buscar horario activo
-        active_schedule = cls.get_current_active_schedule()
-        if active_schedule:
-            return active_schedule.target_temperature
-        
-        # Si no hay horario activo, usar temperatura por defecto
-        settings = HeatingSettings.get_current_settings()
-        return settings.default_temperature if settings else 16.0
+        """
+        Obtiene la temperatura objetivo actual: la del horario activo o, si no
+        hay ninguno, la temperatura por defecto de la configuración
+        """
+        from .schedule_timeline import get_timeline
+        return get_timeline().target_temperature_at()
     
     @classmethod
     def create_workdays_schedule(cls, name, start_time, end_time, temperature):
@@ -361,6 +397,8 @@ class HeatingLog(models.Model):
 
 
 import json
+import os
+import time
 import paho.mqtt.client as mqtt
 import threading
 from django.conf import settings
@@ -368,17 +406,30 @@ from django.conf import settings
 
 class MQTTService:
     """
-    Servicio para enviar comandos MQTT desde Django
+    Publicador MQTT persistente para enviar comandos desde Django.
+
+    Hay una única instancia por proceso (cada worker de gunicorn tiene la suya).
+    La conexión se abre una sola vez y el hilo de red de paho se encarga de
+    reconectar en segundo plano con backoff exponencial. Mientras no hay
+    conexión, paho encola las publicaciones QoS >= 1 y las envía al reconectar;
+    las que paho rechaza (QoS 0, cola de paho llena, cliente sin crear) se
+    guardan aquí, solo la última por topic, y se envían al reconectar. Los
+    acuses de recibo (QoS >= 1) se siguen por ``mid`` en ``on_publish``.
     """
     _instance = None
+    _instance_pid = None
     _lock = threading.Lock()
     
     def __new__(cls):
-        if cls._instance is None:
+        # Tras un fork (gunicorn con preload_app) el hilo de red del padre no
+        # existe en el hijo: se crea una instancia nueva por proceso.
+        pid = os.getpid()
+        if cls._instance is None or cls._instance_pid != pid:
             with cls._lock:
-                if cls._instance is None:
+                if cls._instance is None or cls._instance_pid != pid:
                     cls._instance = super().__new__(cls)
                     cls._instance.initialized = False
+                    cls._instance_pid = pid
         return cls._instance
     
     def __init__(self):
@@ -389,41 +440,117 @@ class MQTTService:
             self.mqtt_port = getattr(settings, 'MQTT_PORT', 1883)
             self.mqtt_username = getattr(settings, 'MQTT_USERNAME', '')
             self.mqtt_password = getattr(settings, 'MQTT_PASSWORD', '')
+            self.qos = getattr(settings, 'MQTT_QOS', 1)
+            self.queue_size = getattr(settings, 'MQTT_QUEUE_SIZE', 100)
+            self.reconnect_min_delay = getattr(settings, 'MQTT_RECONNECT_MIN_DELAY', 1)
+            self.reconnect_max_delay = getattr(settings, 'MQTT_RECONNECT_MAX_DELAY', 60)
+            
+            # Último mensaje pendiente por topic (no aceptado por paho). Un comando
+            # nuevo sustituye al anterior del mismo topic: nunca se reenvía uno
+            # obsoleto después de otro más reciente. Acotada a queue_size topics.
+            self._outbox = {}
+            # Publicaciones enviadas pendientes de acuse: mid -> (topic, enviado_en)
+            self._pending = {}
+            # Protege connected, la cola y _pending: enviar o encolar y vaciar la
+            # cola al conectar no pueden intercalarse
+            self._state_lock = threading.RLock()
+            self.stats = {'published': 0, 'acknowledged': 0, 'queued': 0, 'dropped': 0}
             self.initialized = True
     
     def connect(self):
-        """Conectar al broker MQTT"""
-        try:
-            if self.client is None:
-                self.client = mqtt.Client()
-                self.client.on_connect = self._on_connect
-                self.client.on_disconnect = self._on_disconnect
+        """
+        Arrancar la conexión al broker MQTT (no bloqueante).
+        Solo la primera llamada hace trabajo; las reconexiones las gestiona
+        el hilo de red de paho.
+        """
+        if self.client is not None:
+            return
+        
+        with self._lock:
+            if self.client is not None:
+                return
+            try:
+                client = mqtt.Client()
+                client.on_connect = self._on_connect
+                client.on_disconnect = self._on_disconnect
+                client.on_publish = self._on_publish
                 
                 if self.mqtt_username and self.mqtt_password:
-                    self.client.username_pw_set(self.mqtt_username, self.mqtt_password)
-            
-            if not self.connected:
-                self.client.connect_async(self.mqtt_host, self.mqtt_port, 60)
-                self.client.loop_start()
-
-            # Añadir un retardo de 3 segundos
-            import time
-            time.sleep(3)
+                    client.username_pw_set(self.mqtt_username, self.mqtt_password)
                 
-        except Exception as e:
-            logger.error(f"Error conectando a MQTT: {e}")
+                client.reconnect_delay_set(self.reconnect_min_delay, self.reconnect_max_delay)
+                client.max_queued_messages_set(self.queue_size)
+                client.connect_async(self.mqtt_host, self.mqtt_port, 60)
+                client.loop_start()
+                self.client = client
+                
+            except Exception as e:
+                logger.error(f"Error conectando a MQTT: {e}")
     
     def _on_connect(self, client, userdata, flags, rc):
         if rc == 0:
-            self.connected = True
+            with self._state_lock:
+                self.connected = True
+                self._flush_outbox()
             logger.info("Conectado a MQTT broker")
         else:
             logger.error(f"Error conectando a MQTT: {rc}")
     
     def _on_disconnect(self, client, userdata, rc):
-        self.connected = False
+        with self._state_lock:
+            self.connected = False
         logger.info("Desconectado de MQTT broker")
     
+    def _on_publish(self, client, userdata, mid):
+        with self._state_lock:
+            pending = self._pending.pop(mid, None)
+            if pending is not None:
+                self.stats['acknowledged'] += 1
+        
+        if pending is not None:
+            topic, sent_at = pending
+            logger.debug(f"Acuse MQTT mid={mid} en {topic} ({(time.monotonic() - sent_at) * 1000:.1f} ms)")
+    
+    def _publish(self, topic, message):
+        """
+        Publicar un mensaje y registrar su mid para seguir el acuse. Devuelve
+        True si paho lo ha aceptado: enviado, o encolado por paho (QoS >= 1 sin
+        conexión, rc NO_CONN) para enviarlo al reconectar.
+        """
+        # Se bloquea _state_lock para que on_publish no llegue antes de registrar el mid
+        with self._state_lock:
+            result = self.client.publish(topic, message, qos=self.qos)
+            accepted = result.rc == mqtt.MQTT_ERR_SUCCESS or (
+                result.rc == mqtt.MQTT_ERR_NO_CONN and self.qos > 0
+            )
+            if not accepted:
+                return False
+            self.stats['published'] += 1
+            if self.qos > 0:
+                self._pending[result.mid] = (topic, time.monotonic())
+                # Evitar que crezca sin límite si el broker nunca confirma
+                while len(self._pending) > self.queue_size:
+                    self._pending.pop(next(iter(self._pending)))
+        return True
+    
+    def _flush_outbox(self):
+        """Enviar los mensajes encolados mientras no había conexión (con _state_lock)"""
+        for topic, message in list(self._outbox.items()):
+            if not self.connected or not self._publish(topic, message):
+                break
+            del self._outbox[topic]
+            logger.info(f"Comando encolado enviado a {topic}: {message}")
+    
+    def _enqueue(self, topic, message):
+        """Guardar el mensaje de ``topic`` hasta reconectar (con _state_lock)"""
+        if len(self._outbox) >= self.queue_size:
+            oldest = next(iter(self._outbox))
+            del self._outbox[oldest]
+            self.stats['dropped'] += 1
+            logger.warning(f"Cola MQTT llena, se descarta el comando pendiente para {oldest}")
+        self._outbox[topic] = message
+        self.stats['queued'] += 1
+    
     def send_actuator_command(self, actuator_id, temperature, action):
         """
         Enviar comando al actuador via MQTT
@@ -432,6 +559,11 @@ class MQTTService:
             actuator_id (str): ID del actuador (ej: 'boiler')
             temperature (float): Temperatura actual
             action (str): 'turn_on' o 'turn_off'
+            
+        Returns:
+            bool: True si paho ha aceptado el comando (enviado, o encolado
+            por paho hasta reconectar), False si ha quedado en la cola propia
+            o ha fallado.
         """
         try:
             self.connect()
@@ -446,35 +578,55 @@ class MQTTService:
             
             message = json.dumps(command)
             
-            if self.client and self.connected:
-                result = self.client.publish(topic, message)
-                if result.rc == mqtt.MQTT_ERR_SUCCESS:
-                    logger.info(f"Comando enviado a {topic}: {message}")
+            # Mismo bloqueo que _on_connect: no puede vaciarse la cola entre
+            # comprobar la conexión y encolar
+            with self._state_lock:
+                # Un comando nuevo deja obsoleto el pendiente del mismo topic
+                if self._outbox.pop(topic, None) is not None:
+                    logger.info(f"Comando pendiente para {topic} sustituido por uno más reciente")
+                if self.client and self._publish(topic, message):
+                    if self.connected:
+                        logger.info(f"Comando enviado a {topic}: {message}")
+                    else:
+                        logger.warning(f"Cliente MQTT no conectado, paho enviará el comando a {topic} al reconectar")
                     return True
+                if self.client and self.connected:
+                    logger.error(f"Error enviando comando MQTT a {topic}, se encola")
                 else:
-                    logger.error(f"Error enviando comando MQTT: {result.rc}")
-            else:
-                logger.error("Cliente MQTT no conectado")
+                    logger.warning("Cliente MQTT no conectado, comando encolado")
+                self._enqueue(topic, message)
                 
         except Exception as e:
             logger.error(f"Error enviando comando MQTT: {e}")
         
         return False
+    
+    def pending_acknowledgements(self):
+        """Número de publicaciones QoS>=1 sin acuse del broker"""
+        with self._state_lock:
+            return len(self._pending)
 
 
 class HeatingController:
     """
     Controlador automático de calefacción
+
+    Solo publica un comando cuando la decisión cambia (transición) o cuando
+    vence el latido periódico (HEATING_COMMAND_HEARTBEAT) que mantiene al
+    actuador sincronizado. En HeatingLog se registran las transiciones y uno
+    de cada HEATING_LOG_HEARTBEAT_EVERY latidos. El estado por actuador
+    (última decisión, último comando) vive en controller_state.
     """
     
     @staticmethod
-    def calculate_heating_decision(current_temperature, sensor_id=None):
+    def calculate_heating_decision(current_temperature, sensor_id=None, actuator_id='boiler'):
         """
         Calcula si debe encender/apagar la calefacción basado en temperatura actual
         
         Args:
             current_temperature (float): Temperatura actual del sensor
             sensor_id (str): ID del sensor (opcional, para logs)
+            actuator_id (str): ID del actuador cuyo estado previo se usa para la histéresis
             
         Returns:
             dict: {
@@ -500,9 +652,9 @@ class HeatingController:
             # Obtener temperatura objetivo (horarios o por defecto)
             target_temperature = HeatingSchedule.get_current_target_temperature()
             
-            # Obtener último estado de calefacción
-            last_log = HeatingLog.objects.first()  # Ya ordenado por -timestamp
-            last_heating_state = last_log.is_heating if last_log else False
+            # Obtener último estado de calefacción (en memoria, sin leer HeatingLog)
+            from .controller_state import store
+            last_heating_state = store.last_heating_state(actuator_id)
             
             # Aplicar lógica de histéresis
             hysteresis = settings.hysteresis
@@ -569,7 +721,8 @@ class HeatingController:
     @staticmethod
     def process_sensor_reading(sensor_id, temperature):
         """
-        Procesa una lectura de sensor y envía comando al actuador si es necesario
+        Procesa una lectura de sensor y envía comando al actuador si la
+        decisión ha cambiado o toca latido
         
         Args:
             sensor_id (str): ID del sensor
@@ -579,21 +732,27 @@ class HeatingController:
             dict: Información sobre la decisión tomada
         """
         try:
+            from .controller_state import store
+            
             # Calcular decisión
-            decision = HeatingController.calculate_heating_decision(temperature, sensor_id)
+            decision = HeatingController.calculate_heating_decision(temperature, sensor_id, 'boiler')
+            action = "turn_on" if decision['should_heat'] else "turn_off"
             
-            # Registrar en logs
-            HeatingController.log_heating_decision(decision, 'boiler', 'sensor_reading')
+            publish, log, transition = store.record_decision('boiler', decision['should_heat'], temperature)
             
-            # Enviar comando MQTT al actuador
-            mqtt_service = MQTTService()
-            action = "turn_on" if decision['should_heat'] else "turn_off"
+            # Registrar en logs solo transiciones y latidos muestreados
+            if log:
+                HeatingController.log_heating_decision(decision, 'boiler', 'sensor_reading')
             
-            command_sent = mqtt_service.send_actuator_command(
-                actuator_id='boiler',
-                temperature=temperature,
-                action=action
-            )
+            # Enviar comando MQTT al actuador
+            command_sent = False
+            if publish:
+                mqtt_service = MQTTService()
+                command_sent = mqtt_service.send_actuator_command(
+                    actuator_id='boiler',
+                    temperature=temperature,
+                    action=action
+                )
             
             logger.info(f"Sensor {sensor_id}: {temperature}°C")
             logger.info(f"{action} (target: {decision['target_temperature']}°C)")
@@ -602,6 +761,7 @@ class HeatingController:
             return {
                 'decision': decision,
                 'command_sent': command_sent,
+                'transition': transition,
                 'action': action,
                 'actuator_id': 'boiler'
             }
@@ -616,6 +776,27 @@ class HeatingController:
             }
 
 
+class HeatingControllerState(models.Model):
+    """
+    Estado persistido del controlador por actuador (una fila por actuador).
+    Se escribe solo al publicar un comando y se usa para recuperar el estado
+    en memoria al arrancar (ver controller_state).
+    """
+    actuator_id = models.CharField(max_length=50, unique=True, help_text="ID del actuador")
+    is_heating = models.BooleanField(default=False, help_text="Última decisión del controlador")
+    last_command_at = models.DateTimeField(null=True, blank=True, help_text="Momento del último comando publicado")
+    last_temperature = models.FloatField(null=True, blank=True, help_text="Última temperatura procesada (°C)")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Estado del Controlador"
+        verbose_name_plural = "Estados del Controlador"
+
+    def __str__(self):
+        status = "Encendida" if self.is_heating else "Apagada"
+        return f"{self.actuator_id} - {status}"
+
+
 # ---------------------------------------------------------------------------
 # Pre-calculated usage models
 # ---------------------------------------------------------------------------
@@ -639,6 +820,30 @@ class HeatingDailyUsage(models.Model):
         return f"{self.date} — {self.total_hours:.2f} h"
 
 
+class HeatingHourlyUsage(models.Model):
+    """
+    Uso de calefacción pre-calculado por hora local (fecha + hora 0-23).
+    Se actualiza incrementalmente con cada nuevo ActuatorStatus recibido y
+    sirve el mapa de calor día de la semana × hora sin leer el historial.
+    """
+    date = models.DateField(help_text="Fecha del día (hora local)")
+    hour = models.PositiveSmallIntegerField(
+        validators=[MaxValueValidator(23)],
+        help_text="Hora local (0-23)"
+    )
+    total_hours = models.FloatField(default=0.0, help_text="Horas de calefacción encendida en esa hora")
+    last_updated = models.DateTimeField(auto_now=True, help_text="Última actualización del registro")
+
+    class Meta:
+        verbose_name = "Uso Horario de Calefacción"
+        verbose_name_plural = "Usos Horarios de Calefacción"
+        unique_together = ('date', 'hour')
+        ordering = ['-date', '-hour']
+
+    def __str__(self):
+        return f"{self.date} {self.hour:02d}h — {self.total_hours:.2f} h"
+
+
 class HeatingMonthlyUsage(models.Model):
     """
     Uso mensual de calefacción pre-calculado.
@@ -662,41 +867,69 @@ class HeatingMonthlyUsage(models.Model):
         return f"{self.year}-{self.month:02d} — {self.total_hours:.2f} h"
 
 
+class HeatingUsageState(models.Model):
+    """
+    Estado de la contabilidad de uso por actuador: el último ActuatorStatus
+    contabilizado. Cada estado nuevo cierra el período abierto por este (si
+    era 'encendido') sin consultar el historial (ver heating.usage).
+    """
+    actuator_id = models.CharField(max_length=50, unique=True, help_text="ID del actuador")
+    last_status_at = models.DateTimeField(null=True, blank=True, help_text="Momento del último estado contabilizado")
+    last_is_heating = models.BooleanField(default=False, help_text="¿Estaba encendida en el último estado?")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Estado de Contabilidad de Uso"
+        verbose_name_plural = "Estados de Contabilidad de Uso"
+        ordering = ['actuator_id']
+
+    def __str__(self):
+        status = "Encendida" if self.last_is_heating else "Apagada"
+        return f"{self.actuator_id} - {status} - {self.last_status_at}"
+
+
+class HeatingUsageCheckpoint(models.Model):
+    """
+    Punto de control de rebuild_heating_usage: id del último ActuatorStatus
+    procesado, para que ``--incremental`` solo recalcule lo que llegó después.
+    """
+    name = models.CharField(max_length=50, unique=True, default='rebuild', help_text="Nombre del punto de control")
+    last_status_id = models.BigIntegerField(default=0, help_text="Id del último ActuatorStatus procesado")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Punto de Control de Uso"
+        verbose_name_plural = "Puntos de Control de Uso"
+
+    def __str__(self):
+        return f"{self.name} - {self.last_status_id}"
+
+
 def record_heating_period(start_utc, end_utc):
     """
-    Registra un período de calefacción activa en HeatingDailyUsage y
-    HeatingMonthlyUsage.  Maneja correctamente períodos que cruzan la
-    medianoche distribuyendo el tiempo entre los días afectados.
+    Registra un período de calefacción activa en HeatingHourlyUsage,
+    HeatingDailyUsage y HeatingMonthlyUsage.  Maneja correctamente períodos
+    que cruzan la medianoche distribuyendo el tiempo entre los días afectados
+    (ver heating.usage: un upsert por tabla).
 
     Args:
         start_utc: datetime con timezone en UTC del inicio del período.
         end_utc:   datetime con timezone en UTC del fin del período.
     """
-    if end_utc <= start_utc:
-        return
-
-    start_local = timezone.localtime(start_utc)
-    end_local = timezone.localtime(end_utc)
-
-    current = start_local
-
-    # Avanzar día a día hasta el último día del período (exclusive)
-    while current.date() < end_local.date():
-        midnight = current.replace(hour=0, minute=0, second=0, microsecond=0) + datetime.timedelta(days=1)
-        hours = (midnight - current).total_seconds() / 3600.0
-        if hours > 0:
-            day = current.date()
-            HeatingDailyUsage.objects.get_or_create(date=day, defaults={'total_hours': 0.0})
-            HeatingDailyUsage.objects.filter(date=day).update(total_hours=models.F('total_hours') + hours)
-            HeatingMonthlyUsage.objects.get_or_create(year=day.year, month=day.month, defaults={'total_hours': 0.0})
-            HeatingMonthlyUsage.objects.filter(year=day.year, month=day.month).update(total_hours=models.F('total_hours') + hours)
-        current = midnight
-
-    # Fracción del último día (o único día si start y end son el mismo día)
-    hours = (end_local - current).total_seconds() / 3600.0
-    if hours > 0:
-        day = current.date()
-        HeatingDailyUsage.objects.get_or_create(date=day, defaults={'total_hours': 0.0})
-        HeatingDailyUsage.objects.filter(date=day).update(total_hours=models.F('total_hours') + hours)
-        HeatingMonthlyUsage.objects.get_or_create(year=day.year, month=day.month, defaults={'total_hours': 0.0})
-        HeatingMonthlyUsage.objects.filter(year=day.year, month=day.month).update(total_hours=models.F('total_hours') + hours)
+    from .usage import record_heating_periods
+
+    record_heating_periods([(start_utc, end_utc)])
+
+
+def record_actuator_statuses(statuses):
+    """
+    Acumula el uso de calefacción de ActuatorStatus recién creados, por
+    actuador, a partir de su HeatingUsageState. Lo usan tanto post_save
+    como la ingesta por lotes (donde no se dispara post_save).
+
+    Args:
+        statuses: lista de ActuatorStatus (de uno o varios actuadores).
+    """
+    from .usage import account_statuses
+
+    account_statuses(statuses)
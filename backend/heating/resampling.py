@@ -0,0 +1,261 @@
+"""
+Remuestreo de series temporales a intervalos fijos para las gráficas.
+
+Todas las funciones reciben series ordenadas por tiempo y recorren los datos
+una sola vez junto con los intervalos (merge lineal), de modo que el coste es
+O(puntos + filas) en lugar de O(puntos × filas).
+"""
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+
+def _mean(values):
+    return sum(values) / len(values)
+
+
+AGGREGATIONS = {
+    'last': lambda values: values[-1],
+    'mean': _mean,
+    'min': min,
+    'max': max,
+}
+
+
+def bucket_ends(end, step, count):
+    """
+    Fin de cada intervalo, del más antiguo al más reciente.
+    El intervalo i cubre (fin_i - step, fin_i].
+    """
+    return [end - step * i for i in range(count - 1, -1, -1)]
+
+
+def aligned_end(moment, step):
+    """
+    Primer múltiplo de step (contado desde la época Unix) igual o posterior
+    al instante, para que los intervalos coincidan con los agregados.
+    """
+    seconds = step.total_seconds()
+    epoch = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+    elapsed = (moment - epoch).total_seconds()
+    return epoch + timedelta(seconds=math.ceil(elapsed / seconds) * seconds)
+
+
+def resample(samples, ends, step, agg='last', fill_tolerance=None):
+    """
+    Agrega una serie en intervalos fijos.
+
+    Args:
+        samples: lista de (datetime, valor) ordenada por tiempo. Los valores
+            None se ignoran.
+        ends: fin de cada intervalo (ver bucket_ends), ordenados.
+        step: timedelta con la anchura de cada intervalo.
+        agg: 'last', 'mean', 'min' o 'max'.
+        fill_tolerance: si un intervalo no tiene datos, se repite el último
+            valor conocido siempre que no sea más antiguo que esta tolerancia
+            (timedelta). None para dejar el intervalo vacío.
+
+    Returns:
+        list: un valor (o None) por intervalo.
+    """
+    aggregate = AGGREGATIONS[agg]
+    result = []
+    index = 0
+    total = len(samples)
+    last_known = None
+
+    for end in ends:
+        start = end - step
+        values = []
+        while index < total and samples[index][0] <= end:
+            moment, value = samples[index]
+            index += 1
+            if value is None:
+                continue
+            if moment > start:
+                values.append(value)
+            last_known = (moment, value)
+
+        if values:
+            result.append(aggregate(values))
+        elif fill_tolerance is not None and last_known and end - last_known[0] <= fill_tolerance:
+            result.append(last_known[1])
+        else:
+            result.append(None)
+
+    return result
+
+
+def _combine_partials(partials, agg):
+    if agg == 'last':
+        return max(partials, key=lambda p: p[6])[5]
+    if agg == 'mean':
+        return sum(p[2] for p in partials) / sum(p[1] for p in partials)
+    if agg == 'min':
+        return min(p[3] for p in partials)
+    return max(p[4] for p in partials)
+
+
+def resample_partials(partials, ends, step, agg='last', fill_tolerance=None):
+    """
+    Igual que resample() pero a partir de agregados parciales ya calculados
+    (p. ej. SensorRollup), de modo que se leen cientos de filas en lugar de
+    todas las lecturas.
+
+    Args:
+        partials: lista de (datetime, count, sum, min, max, last, last_at)
+            ordenada por tiempo; el datetime es el final del intervalo del
+            parcial, que debe ser menor o igual que step.
+        ends, step, agg, fill_tolerance: como en resample().
+
+    Returns:
+        list: un valor (o None) por intervalo.
+    """
+    if agg not in AGGREGATIONS:
+        raise KeyError(agg)
+
+    result = []
+    index = 0
+    total = len(partials)
+    last_known = None
+
+    for end in ends:
+        start = end - step
+        bucket = []
+        while index < total and partials[index][0] <= end:
+            partial = partials[index]
+            index += 1
+            if partial[0] > start:
+                bucket.append(partial)
+            if last_known is None or partial[6] >= last_known[0]:
+                last_known = (partial[6], partial[5])
+
+        if bucket:
+            result.append(_combine_partials(bucket, agg))
+        elif fill_tolerance is not None and last_known and end - last_known[0] <= fill_tolerance:
+            result.append(last_known[1])
+        else:
+            result.append(None)
+
+    return result
+
+
+def partials_to_samples(partials):
+    """
+    Convierte parciales en una serie (datetime, media), combinando los de
+    distintos sensores que comparten intervalo.
+    """
+    samples = []
+    for partial in partials:
+        moment, count, total = partial[0], partial[1], partial[2]
+        if samples and samples[-1][0] == moment:
+            _, prev_count, prev_total = samples[-1]
+            samples[-1] = (moment, prev_count + count, prev_total + total)
+        else:
+            samples.append((moment, count, total))
+    return [(moment, total / count) for moment, count, total in samples if count]
+
+
+def lttb(samples, ends, step, fill_tolerance=None):
+    """
+    Reducción Largest-Triangle-Three-Buckets sobre intervalos fijos.
+
+    En cada intervalo se elige la muestra real que forma el triángulo de mayor
+    área con la muestra elegida en el intervalo anterior y con la media del
+    siguiente intervalo con datos. Conserva picos y valles que la media
+    suavizaría, manteniendo un valor por intervalo.
+
+    Args:
+        samples: lista de (datetime, valor) ordenada por tiempo.
+        ends, step, fill_tolerance: como en resample().
+
+    Returns:
+        list: un valor (o None) por intervalo.
+    """
+    groups = []
+    index = 0
+    total = len(samples)
+    before = None
+    for end in ends:
+        start = end - step
+        group = []
+        while index < total and samples[index][0] <= end:
+            moment, value = samples[index]
+            index += 1
+            if value is None:
+                continue
+            if moment > start:
+                group.append((moment.timestamp(), value, moment))
+            elif not groups:
+                before = (moment, value)
+        groups.append(group)
+
+    # Media del siguiente intervalo con datos, calculada de atrás hacia delante
+    next_average = [None] * len(groups)
+    upcoming = None
+    for i in range(len(groups) - 1, -1, -1):
+        next_average[i] = upcoming
+        if groups[i]:
+            group = groups[i]
+            upcoming = (
+                sum(point[0] for point in group) / len(group),
+                sum(point[1] for point in group) / len(group),
+            )
+
+    result = []
+    previous = None
+    last_known = before
+    for i, group in enumerate(groups):
+        if not group:
+            if fill_tolerance is not None and last_known and ends[i] - last_known[0] <= fill_tolerance:
+                result.append(last_known[1])
+            else:
+                result.append(None)
+            continue
+
+        average = next_average[i]
+        if previous is None:
+            chosen = group[0]
+        elif average is None:
+            chosen = group[-1]
+        else:
+            ax, ay = previous
+            cx, cy = average
+            chosen = max(
+                group,
+                key=lambda point: abs((ax - cx) * (point[1] - ay) - (ax - point[0]) * (cy - ay))
+            )
+
+        result.append(chosen[1])
+        previous = (chosen[0], chosen[1])
+        last_known = (group[-1][2], group[-1][1])
+
+    return result
+
+
+def step_join(changes, instants, initial=None):
+    """
+    Estado vigente (último cambio conocido) en cada instante.
+
+    Args:
+        changes: lista de (datetime, estado) ordenada por tiempo.
+        instants: instantes ordenados en los que evaluar el estado.
+        initial: estado antes del primer cambio.
+
+    Returns:
+        list: el estado en cada instante.
+    """
+    result = []
+    index = 0
+    total = len(changes)
+    state = initial
+
+    for instant in instants:
+        while index < total and changes[index][0] <= instant:
+            state = changes[index][1]
+            index += 1
+        result.append(state)
+
+    return result
+
+
+DEFAULT_FILL_TOLERANCE = timedelta(hours=1)
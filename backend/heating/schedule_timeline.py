@@ -0,0 +1,162 @@
+"""
+Línea temporal semanal compilada de los horarios de calefacción.
+
+Todos los horarios activos se convierten en una lista ordenada de intervalos
+en segundos-de-la-semana (0 = lunes 00:00 hora local) con su horario y
+temperatura objetivo. La consulta de la temperatura objetivo actual es una
+búsqueda binaria en memoria, sin consultas a la base de datos.
+
+La línea temporal se reconstruye cuando cambia la versión compartida de
+horarios o de configuración (ver cache_versions), que se publica desde los
+signals post_save/post_delete de HeatingSchedule y HeatingSettings, de modo
+que todos los workers la reconstruyen.
+"""
+import bisect
+import threading
+
+from django.utils import timezone
+
+from .cache_versions import aget_version, bump_version, get_version
+
+SECONDS_PER_DAY = 24 * 60 * 60
+SECONDS_PER_WEEK = 7 * SECONDS_PER_DAY
+DEFAULT_TARGET_TEMPERATURE = 16.0
+
+
+def _seconds_of_day(value):
+    return value.hour * 3600 + value.minute * 60 + value.second
+
+
+def _schedule_intervals(schedule):
+    """
+    Intervalos [inicio, fin) en segundos-de-la-semana de un horario.
+    Reproduce HeatingSchedule.is_active_now(): el fin es inclusivo y un
+    horario que cruza medianoche cubre, en cada día configurado, desde el
+    inicio hasta medianoche y desde medianoche hasta el fin.
+    """
+    start = _seconds_of_day(schedule.start_time)
+    end = _seconds_of_day(schedule.end_time) + 1
+
+    for day in set(schedule.get_weekdays_list()):
+        if not 0 <= day <= 6:
+            continue
+        day_start = day * SECONDS_PER_DAY
+        if schedule.start_time <= schedule.end_time:
+            yield day_start + start, day_start + end
+        else:
+            yield day_start, day_start + end
+            yield day_start + start, day_start + SECONDS_PER_DAY
+
+
+class ScheduleTimeline:
+    """Segmentos ordenados de la semana con el horario que aplica en cada uno"""
+
+    def __init__(self, schedules, default_temperature, version):
+        self.version = version
+        self.default_temperature = default_temperature
+
+        intervals = []
+        for priority, schedule in enumerate(schedules):
+            for start, end in _schedule_intervals(schedule):
+                intervals.append((start, end, priority, schedule))
+
+        boundaries = sorted({0, SECONDS_PER_WEEK}.union(
+            point for start, end, _, _ in intervals for point in (start, end)
+        ))
+
+        # Para cada segmento elemental, el primer horario (por prioridad) que
+        # lo cubre; los segmentos contiguos con el mismo horario se fusionan.
+        self.starts = []
+        self.schedules = []
+        for seg_start, seg_end in zip(boundaries, boundaries[1:]):
+            covering = [
+                (priority, schedule)
+                for start, end, priority, schedule in intervals
+                if start <= seg_start and seg_end <= end
+            ]
+            schedule = min(covering, key=lambda item: item[0])[1] if covering else None
+            if self.schedules and self.schedules[-1] is schedule:
+                continue
+            self.starts.append(seg_start)
+            self.schedules.append(schedule)
+
+    def schedule_at(self, when=None):
+        """Horario activo en un instante (por defecto ahora) o None"""
+        local = timezone.localtime(when)
+        second = local.weekday() * SECONDS_PER_DAY + _seconds_of_day(local)
+        index = bisect.bisect_right(self.starts, second) - 1
+        return self.schedules[index]
+
+    def target_temperature_at(self, when=None):
+        """Temperatura objetivo en un instante (por defecto ahora)"""
+        schedule = self.schedule_at(when)
+        if schedule is not None:
+            return schedule.target_temperature
+        return self.default_temperature
+
+
+_lock = threading.Lock()
+_timeline = None
+
+
+def invalidate():
+    """Marca la línea temporal como obsoleta en todos los procesos"""
+    bump_version('schedules')
+
+
+def current_version():
+    return (get_version('schedules'), get_version('settings'))
+
+
+async def acurrent_version():
+    return (await aget_version('schedules'), await aget_version('settings'))
+
+
+def get_timeline():
+    """Línea temporal vigente, reconstruyéndola si la versión ha cambiado"""
+    global _timeline
+    timeline = _timeline
+    version = current_version()
+    if timeline is not None and timeline.version == version:
+        return timeline
+
+    from .models import HeatingSchedule, HeatingSettings
+
+    schedules = list(HeatingSchedule.objects.filter(is_active=True).order_by('start_time', 'id'))
+    settings = HeatingSettings.get_current_settings()
+    default_temperature = settings.default_temperature if settings else DEFAULT_TARGET_TEMPERATURE
+
+    timeline = ScheduleTimeline(schedules, default_temperature, version)
+    if None in version:
+        # Versión desconocida (caché sin responder): no se guarda
+        return timeline
+    with _lock:
+        # Si se invalidó mientras se construía, se guarda igualmente pero con
+        # la versión antigua, de modo que la siguiente consulta reconstruye.
+        _timeline = timeline
+    return timeline
+
+
+async def aget_timeline():
+    """Versión de ``get_timeline`` para vistas async (ORM async)"""
+    global _timeline
+    timeline = _timeline
+    version = await acurrent_version()
+    if timeline is not None and timeline.version == version:
+        return timeline
+
+    from .models import HeatingSchedule, HeatingSettings
+
+    schedules = [
+        schedule
+        async for schedule in HeatingSchedule.objects.filter(is_active=True).order_by('start_time', 'id')
+    ]
+    settings = await HeatingSettings.aget_current_settings()
+    default_temperature = settings.default_temperature if settings else DEFAULT_TARGET_TEMPERATURE
+
+    timeline = ScheduleTimeline(schedules, default_temperature, version)
+    if None in version:
+        return timeline
+    with _lock:
+        _timeline = timeline
+    return timeline
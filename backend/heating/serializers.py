@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import HeatingSettings, HeatingSchedule, HeatingLog
+from sensors.models import SensorLatest
+from .models import HeatingControllerState, HeatingSettings, HeatingSchedule, HeatingLog
 
 
 class HeatingSettingsSerializer(serializers.ModelSerializer):
@@ -89,15 +90,57 @@ class CurrentStatusSerializer(serializers.Serializer):
         # Obtener temperatura objetivo
         target_temp = HeatingSchedule.get_current_target_temperature()
         
-        # Obtener último log para temperatura actual
-        latest_log = HeatingLog.objects.order_by('-timestamp').first()
+        # Estado del controlador (decisión y último comando) y última lectura
+        # (SensorLatest) para la temperatura actual. El log solo hace falta
+        # si el controlador aún no ha guardado estado
+        controller = HeatingControllerState.objects.order_by('-updated_at').first()
+        latest_log = HeatingLog.objects.order_by('-timestamp').first() if controller is None else None
+        latest_reading = SensorLatest.current_temperature_reading()
+        
+        return self._status(settings, active_schedule, target_temp, controller, latest_log, latest_reading)
+    
+    async def ato_representation(self, instance):
+        """Versión de to_representation para vistas async (ORM async)"""
+        from .schedule_timeline import aget_timeline
+        
+        settings = await HeatingSettings.aget_current_settings()
+        timeline = await aget_timeline()
+        controller = await HeatingControllerState.objects.order_by('-updated_at').afirst()
+        latest_log = await HeatingLog.objects.order_by('-timestamp').afirst() if controller is None else None
+        latest_reading = await SensorLatest.acurrent_temperature_reading()
+        
+        return self._status(
+            settings, timeline.schedule_at(), timeline.target_temperature_at(), controller, latest_log,
+            latest_reading
+        )
+    
+    def _status(self, settings, active_schedule, target_temp, controller, latest_log, latest_reading):
+        # HeatingLog solo registra transiciones y algunos latidos: el estado y
+        # la hora del último comando (transición o latido) salen de
+        # HeatingControllerState; el log solo antes de que exista
+        if controller is not None:
+            is_heating = controller.is_heating
+            last_update = controller.last_command_at or controller.updated_at
+            last_temperature = controller.last_temperature
+        elif latest_log is not None:
+            is_heating = latest_log.is_heating
+            last_update = latest_log.timestamp
+            last_temperature = latest_log.current_temperature
+        else:
+            is_heating, last_update, last_temperature = False, None, None
+        
+        # La última lectura es más reciente que la última temperatura procesada
+        if latest_reading is not None:
+            current_temperature = latest_reading.temperature
+        else:
+            current_temperature = last_temperature
         
         return {
-            'current_temperature': latest_log.current_temperature if latest_log else None,
+            'current_temperature': current_temperature,
             'target_temperature': target_temp,
-            'is_heating': latest_log.is_heating if latest_log else False,
+            'is_heating': is_heating,
             'active_schedule': HeatingScheduleSerializer(active_schedule).data if active_schedule else None,
             'default_temperature': settings.default_temperature if settings else 16.0,
             'system_active': settings.is_active if settings else False,
-            'last_update': latest_log.timestamp if latest_log else None
-        }
\ No newline at end of file
+            'last_update': last_update
+        }
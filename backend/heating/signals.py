@@ -1,27 +1,56 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 
 @receiver(post_save, sender='actuators.ActuatorStatus')
 def on_actuator_status_saved(sender, instance, created, **kwargs):
     """
-    Cuando llega un nuevo ActuatorStatus, si el estado anterior era
-    'calefacción encendida', acumula el tiempo transcurrido en
-    HeatingDailyUsage y HeatingMonthlyUsage.
+    Cuando llega un nuevo ActuatorStatus, si el estado anterior del mismo
+    actuador era 'calefacción encendida', acumula el tiempo transcurrido en
+    el uso por hora, día y mes (HeatingHourlyUsage, HeatingDailyUsage,
+    HeatingMonthlyUsage). El estado anterior sale de
+    HeatingUsageState, no del historial.
     """
     if not created:
         return
 
-    from actuators.models import ActuatorStatus
-    from .models import record_heating_period
+    from .models import record_actuator_statuses
 
-    # Registro anterior al nuevo (excluyendo el propio)
-    prev = (
-        ActuatorStatus.objects
-        .filter(created_at__lt=instance.created_at)
-        .order_by('-created_at')
-        .first()
-    )
+    record_actuator_statuses([instance])
 
-    if prev is not None and prev.is_heating:
-        record_heating_period(prev.created_at, instance.created_at)
+
+@receiver(post_save, sender='sensors.SensorReading')
+@receiver(post_save, sender='actuators.ActuatorStatus')
+@receiver(post_save, sender='heating.HeatingLog')
+def on_telemetry_changed(sender, **kwargs):
+    """
+    Publica una versión nueva de la telemetría para que las respuestas
+    cacheadas de las gráficas dejen de ser válidas. La ingesta por lotes y
+    los comandos de reconstrucción, que no disparan signals, la publican
+    ellos mismos. No se escucha post_delete para no perder el borrado rápido
+    en bloque de las tablas grandes.
+    """
+    from .cache_versions import TELEMETRY, bump_version
+
+    bump_version(TELEMETRY)
+
+
+@receiver(post_save, sender='heating.HeatingSchedule')
+@receiver(post_delete, sender='heating.HeatingSchedule')
+def on_schedule_changed(sender, **kwargs):
+    """Invalida la línea temporal compilada de horarios en todos los workers"""
+    from .schedule_timeline import invalidate
+
+    invalidate()
+
+
+@receiver(post_save, sender='heating.HeatingSettings')
+@receiver(post_delete, sender='heating.HeatingSettings')
+def on_settings_changed(sender, **kwargs):
+    """
+    Invalida la configuración cacheada (y con ella la línea temporal, que
+    depende de la temperatura por defecto) en todos los workers
+    """
+    from .models import HeatingSettings
+
+    HeatingSettings.invalidate_cache()
@@ -1,3 +1,449 @@
-from django.test import TestCase
+import json
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import skipUnless
+from types import SimpleNamespace
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
 
-# Create your tests here.
+import paho.mqtt.client as mqtt
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from actuators.models import ActuatorStatus
+
+from . import cache_versions, resampling, usage
+from .models import (
+    HeatingControllerState, HeatingDailyUsage, HeatingLog, HeatingMonthlyUsage, HeatingSettings,
+    HeatingUsageState, MQTTService,
+)
+from .serializers import CurrentStatusSerializer
+
+MADRID = ZoneInfo('Europe/Madrid')
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-default'},
+    'versions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-versions'},
+}
+
+
+def _at(minutes):
+    """Instante a ``minutes`` minutos de una fecha fija (UTC)"""
+    return datetime(2025, 11, 1, tzinfo=dt_timezone.utc) + timedelta(minutes=minutes)
+
+
+def _local(*args):
+    """Datetime aware en hora de Madrid"""
+    return datetime(*args, tzinfo=MADRID)
+
+
+class ResamplingTests(SimpleTestCase):
+    step = timedelta(minutes=10)
+
+    def ends(self, count):
+        return resampling.bucket_ends(_at(10 * count), self.step, count)
+
+    def test_bucket_ends_oldest_first(self):
+        self.assertEqual(self.ends(3), [_at(10), _at(20), _at(30)])
+
+    def test_aligned_end_rounds_up_to_step(self):
+        self.assertEqual(resampling.aligned_end(_at(13), self.step), _at(20))
+        self.assertEqual(resampling.aligned_end(_at(20), self.step), _at(20))
+
+    def test_resample_aggregations(self):
+        samples = [(_at(1), 10.0), (_at(5), 14.0), (_at(9), 12.0), (_at(15), 20.0)]
+        ends = self.ends(2)
+        self.assertEqual(resampling.resample(samples, ends, self.step, agg='last'), [12.0, 20.0])
+        self.assertEqual(resampling.resample(samples, ends, self.step, agg='mean'), [12.0, 20.0])
+        self.assertEqual(resampling.resample(samples, ends, self.step, agg='min'), [10.0, 20.0])
+        self.assertEqual(resampling.resample(samples, ends, self.step, agg='max'), [14.0, 20.0])
+
+    def test_resample_bucket_is_open_at_start_and_closed_at_end(self):
+        samples = [(_at(10), 1.0), (_at(20), 2.0)]
+        self.assertEqual(resampling.resample(samples, self.ends(2), self.step), [1.0, 2.0])
+
+    def test_resample_ignores_none_values(self):
+        samples = [(_at(2), 5.0), (_at(4), None)]
+        self.assertEqual(resampling.resample(samples, self.ends(1), self.step), [5.0])
+
+    def test_resample_fill_tolerance(self):
+        samples = [(_at(5), 18.0)]
+        ends = self.ends(4)
+        self.assertEqual(resampling.resample(samples, ends, self.step), [18.0, None, None, None])
+        self.assertEqual(
+            resampling.resample(samples, ends, self.step, fill_tolerance=timedelta(minutes=30)),
+            [18.0, 18.0, 18.0, None]
+        )
+
+    def test_resample_partials_matches_resample(self):
+        samples = [(_at(1), 10.0), (_at(4), 14.0), (_at(6), 11.0), (_at(13), 20.0), (_at(18), 22.0)]
+        # Parciales de 5 minutos: (fin, count, sum, min, max, last, last_at)
+        partials = [
+            (_at(5), 2, 24.0, 10.0, 14.0, 14.0, _at(4)),
+            (_at(10), 1, 11.0, 11.0, 11.0, 11.0, _at(6)),
+            (_at(15), 1, 20.0, 20.0, 20.0, 20.0, _at(13)),
+            (_at(20), 1, 22.0, 22.0, 22.0, 22.0, _at(18)),
+        ]
+        ends = self.ends(2)
+        for agg in resampling.AGGREGATIONS:
+            self.assertEqual(
+                resampling.resample_partials(partials, ends, self.step, agg=agg),
+                resampling.resample(samples, ends, self.step, agg=agg),
+                agg
+            )
+
+    def test_resample_partials_rejects_unknown_aggregation(self):
+        with self.assertRaises(KeyError):
+            resampling.resample_partials([], self.ends(1), self.step, agg='median')
+
+    def test_partials_to_samples_combines_sensors_in_same_interval(self):
+        partials = [
+            (_at(5), 2, 40.0, 19.0, 21.0, 21.0, _at(4)),
+            (_at(5), 2, 44.0, 21.0, 23.0, 23.0, _at(3)),
+            (_at(10), 0, 0.0, None, None, None, None),
+        ]
+        self.assertEqual(resampling.partials_to_samples(partials), [(_at(5), 21.0)])
+
+    def test_lttb_keeps_peaks_that_mean_smooths(self):
+        samples = [(_at(1), 20.0), (_at(11), 20.0), (_at(13), 30.0), (_at(16), 20.0), (_at(21), 20.0)]
+        ends = self.ends(3)
+        self.assertEqual(resampling.lttb(samples, ends, self.step), [20.0, 30.0, 20.0])
+        self.assertLess(resampling.resample(samples, ends, self.step, agg='mean')[1], 30.0)
+
+    def test_lttb_one_value_per_bucket_with_gaps(self):
+        samples = [(_at(1), 20.0), (_at(25), 21.0)]
+        ends = self.ends(3)
+        self.assertEqual(resampling.lttb(samples, ends, self.step), [20.0, None, 21.0])
+        self.assertEqual(
+            resampling.lttb(samples, ends, self.step, fill_tolerance=timedelta(minutes=20)),
+            [20.0, 20.0, 21.0]
+        )
+
+    def test_step_join(self):
+        changes = [(_at(5), True), (_at(15), False)]
+        instants = [_at(0), _at(5), _at(10), _at(20)]
+        self.assertEqual(resampling.step_join(changes, instants), [None, True, True, False])
+        self.assertEqual(resampling.step_join([], instants, initial=False), [False] * 4)
+
+
+@override_settings(TIME_ZONE='Europe/Madrid')
+class UsageDeltasTests(SimpleTestCase):
+
+    def test_accumulate_period_splits_at_midnight_and_month(self):
+        daily, monthly = defaultdict(float), defaultdict(float)
+        usage.accumulate_period(daily, monthly, _local(2025, 1, 31, 22, 30), _local(2025, 2, 1, 1, 0))
+        self.assertEqual(dict(daily), {date(2025, 1, 31): 1.5, date(2025, 2, 1): 1.0})
+        self.assertEqual(dict(monthly), {(2025, 1): 1.5, (2025, 2): 1.0})
+
+    def test_accumulate_period_ignores_empty_periods(self):
+        daily, monthly = defaultdict(float), defaultdict(float)
+        usage.accumulate_period(daily, monthly, _local(2025, 1, 10, 8), _local(2025, 1, 10, 8))
+        self.assertEqual(dict(daily), {})
+        self.assertEqual(dict(monthly), {})
+
+    def test_usage_deltas_dst_days_last_23_and_25_hours(self):
+        daily, monthly, _ = usage.usage_deltas([
+            (_local(2025, 3, 30), _local(2025, 3, 31)),
+            (_local(2025, 10, 26), _local(2025, 10, 27)),
+        ])
+        self.assertAlmostEqual(daily[date(2025, 3, 30)], 23.0)
+        self.assertAlmostEqual(daily[date(2025, 10, 26)], 25.0)
+        self.assertAlmostEqual(monthly[(2025, 3)], 23.0)
+        self.assertAlmostEqual(monthly[(2025, 10)], 25.0)
+
+    def test_usage_deltas_converts_utc_periods_to_local_days(self):
+        # 23:30 UTC del 14/07 son las 01:30 del 15/07 en Madrid
+        start = datetime(2025, 7, 14, 23, 30, tzinfo=dt_timezone.utc)
+        daily, _, _ = usage.usage_deltas([(start, start + timedelta(hours=1)), (start, start)])
+        self.assertEqual(dict(daily), {date(2025, 7, 15): 1.0})
+
+
+@override_settings(TIME_ZONE='Europe/Madrid')
+class RecordHeatingPeriodsTests(TestCase):
+
+    def test_increments_are_added_to_existing_rows(self):
+        period = (_local(2025, 1, 31, 23), _local(2025, 2, 1, 1))
+        usage.record_heating_periods([period])
+        usage.record_heating_periods([period])
+
+        self.assertEqual(
+            dict(HeatingDailyUsage.objects.values_list('date', 'total_hours')),
+            {date(2025, 1, 31): 2.0, date(2025, 2, 1): 2.0}
+        )
+        self.assertEqual(
+            {(row.year, row.month): row.total_hours for row in HeatingMonthlyUsage.objects.all()},
+            {(2025, 1): 2.0, (2025, 2): 2.0}
+        )
+
+    def test_empty_batch_writes_nothing(self):
+        usage.record_heating_periods([])
+        self.assertFalse(HeatingDailyUsage.objects.exists())
+
+
+@override_settings(TIME_ZONE='Europe/Madrid')
+class AccountStatusesTests(TestCase):
+
+    def status(self, actuator_id, at, is_heating):
+        # Sin guardar: post_save ya los contabilizaría
+        return ActuatorStatus(actuator_id=actuator_id, created_at=at, is_heating=is_heating)
+
+    def daily_hours(self, day):
+        return HeatingDailyUsage.objects.get(date=day).total_hours
+
+    def test_actuators_are_accounted_separately(self):
+        usage.account_statuses([
+            self.status('boiler', _local(2025, 1, 10, 8), True),
+            self.status('boiler_2', _local(2025, 1, 10, 9), False),
+            self.status('boiler', _local(2025, 1, 10, 10), False),
+            self.status('boiler_2', _local(2025, 1, 10, 10), True),
+        ])
+        # boiler_2 sigue encendido: su período aún no cuenta
+        self.assertAlmostEqual(self.daily_hours(date(2025, 1, 10)), 2.0)
+
+        usage.account_statuses([self.status('boiler_2', _local(2025, 1, 10, 11, 30), False)])
+        self.assertAlmostEqual(self.daily_hours(date(2025, 1, 10)), 3.5)
+
+        state = HeatingUsageState.objects.get(actuator_id='boiler_2')
+        self.assertEqual(state.last_status_at, _local(2025, 1, 10, 11, 30))
+        self.assertFalse(state.last_is_heating)
+
+    def test_state_carries_over_between_batches(self):
+        usage.account_statuses([self.status('boiler', _local(2025, 1, 10, 23), True)])
+        self.assertFalse(HeatingDailyUsage.objects.exists())
+
+        usage.account_statuses([self.status('boiler', _local(2025, 1, 11, 1), False)])
+        self.assertAlmostEqual(self.daily_hours(date(2025, 1, 10)), 1.0)
+        self.assertAlmostEqual(self.daily_hours(date(2025, 1, 11)), 1.0)
+
+    def test_late_status_is_skipped_with_warning(self):
+        usage.account_statuses([
+            self.status('boiler', _local(2025, 1, 10, 8), True),
+            self.status('boiler', _local(2025, 1, 10, 10), False),
+        ])
+
+        with self.assertLogs('heating.usage', 'WARNING') as logs:
+            usage.account_statuses([
+                self.status('boiler', _local(2025, 1, 10, 9), True),
+                self.status('boiler', _local(2025, 1, 10, 11), False),
+            ])
+
+        self.assertEqual(len(logs.records), 1)
+        self.assertIn('1 estados', logs.output[0])
+        self.assertAlmostEqual(self.daily_hours(date(2025, 1, 10)), 2.0)
+        state = HeatingUsageState.objects.get(actuator_id='boiler')
+        self.assertEqual(state.last_status_at, _local(2025, 1, 10, 11))
+
+
+class HeatingHoursTests(SimpleTestCase):
+
+    def test_last_status_stays_open(self):
+        times = [_at(0), _at(30), _at(90), _at(120)]
+        self.assertAlmostEqual(usage.heating_hours(times, [True, False, True, True]), 1.0)
+
+    def test_less_than_two_statuses(self):
+        self.assertEqual(usage.heating_hours([], []), 0.0)
+        self.assertEqual(usage.heating_hours([_at(0)], [True]), 0.0)
+
+
+@skipUnless(usage.numpy is not None, 'NumPy no está instalado')
+@override_settings(TIME_ZONE='Europe/Madrid')
+class IntervalUsageTests(SimpleTestCase):
+    periods = [
+        # Cruza la medianoche y el adelanto de hora
+        (_local(2025, 3, 29, 22, 15), _local(2025, 3, 30, 4, 45)),
+        # Cruza el cambio de mes
+        (_local(2025, 3, 31, 23), _local(2025, 4, 1, 0, 30)),
+        # Varios días, con el de 25 h entero
+        (_local(2025, 10, 25, 20), _local(2025, 10, 27, 6)),
+        # Se solapa con el anterior y otro vacío
+        (_local(2025, 10, 27, 5), _local(2025, 10, 27, 7)),
+        (_local(2025, 6, 1, 10), _local(2025, 6, 1, 10)),
+    ]
+
+    def epochs(self, moments):
+        return usage.numpy.array([moment.timestamp() for moment in moments])
+
+    def test_split_intervals(self):
+        seconds = usage._split_intervals(
+            usage.numpy.array([0.0, 10.0, 20.0, 30.0]),
+            usage.numpy.array([5.0, 12.0, 25.0]),
+            usage.numpy.array([25.0, 15.0, 30.0]),
+        )
+        self.assertEqual(seconds.tolist(), [5.0, 13.0, 10.0])
+
+    def test_matches_usage_deltas(self):
+        result = usage.interval_usage(
+            self.epochs(start for start, _ in self.periods),
+            self.epochs(end for _, end in self.periods),
+        )
+        expected = usage.usage_deltas(self.periods)
+
+        for totals, expected_totals in zip(result, expected):
+            self.assertEqual(set(totals), set(expected_totals))
+            for key, hours in expected_totals.items():
+                self.assertAlmostEqual(totals[key], hours, msg=key)
+        daily = result[0]
+        self.assertAlmostEqual(daily[date(2025, 10, 26)], 25.0)
+
+    def test_no_intervals(self):
+        empty = usage.numpy.array([])
+        self.assertEqual([dict(totals) for totals in usage.interval_usage(empty, empty)], [{}, {}, {}])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CurrentStatusSerializerTests(TestCase):
+
+    def setUp(self):
+        HeatingSettings._cached = None
+
+    def test_state_comes_from_the_controller_not_the_last_log(self):
+        # El log de la transición queda atrás; los latidos solo actualizan el estado
+        HeatingLog.objects.create(timestamp=_at(0), is_heating=False, current_temperature=19.0)
+        HeatingControllerState.objects.create(
+            actuator_id='boiler', is_heating=True, last_command_at=_at(30), last_temperature=18.5
+        )
+
+        status = CurrentStatusSerializer().to_representation({})
+        self.assertIs(status['is_heating'], True)
+        self.assertEqual(status['current_temperature'], 18.5)
+        self.assertEqual(status['last_update'], _at(30))
+
+    def test_falls_back_to_the_log_without_controller_state(self):
+        HeatingLog.objects.create(timestamp=_at(0), is_heating=True, current_temperature=19.0)
+
+        status = CurrentStatusSerializer().to_representation({})
+        self.assertIs(status['is_heating'], True)
+        self.assertEqual(status['current_temperature'], 19.0)
+        self.assertEqual(status['last_update'], _at(0))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CacheVersionsTests(TestCase):
+
+    def setUp(self):
+        caches['versions'].clear()
+        HeatingSettings._cached = None
+
+    def test_missing_version_is_published_instead_of_none(self):
+        version = cache_versions.get_version('settings')
+        self.assertIsNotNone(version)
+        self.assertEqual(cache_versions.get_version('settings'), version)
+
+    def test_bump_publishes_on_commit(self):
+        before = cache_versions.get_version('settings')
+        with self.captureOnCommitCallbacks(execute=True):
+            token = cache_versions.bump_version('settings')
+            self.assertEqual(cache_versions.get_version('settings'), before)
+        self.assertEqual(cache_versions.get_version('settings'), token)
+
+    def test_versions_survive_clearing_the_default_cache(self):
+        version = cache_versions.get_version('settings')
+        caches['default'].clear()
+        self.assertEqual(cache_versions.get_version('settings'), version)
+
+    def test_lost_version_reloads_cached_settings(self):
+        HeatingSettings.objects.create(default_temperature=20.0)
+        self.assertEqual(HeatingSettings.get_current_settings().default_temperature, 20.0)
+
+        # update() no publica versión: solo la pérdida de la versión obliga a recargar
+        HeatingSettings.objects.update(default_temperature=22.0)
+        self.assertEqual(HeatingSettings.get_current_settings().default_temperature, 20.0)
+        caches['versions'].clear()
+        self.assertEqual(HeatingSettings.get_current_settings().default_temperature, 22.0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ChartsCacheTests(TestCase):
+    url = '/heating/charts/api/data/?period=24h'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('admin', password='admin')
+
+    def setUp(self):
+        caches['default'].clear()
+        caches['versions'].clear()
+        self.client.force_login(self.user)
+
+    def test_cached_response_and_304_do_not_rebuild(self):
+        etag = self.client.get(self.url)['ETag']
+
+        with patch('heating.charts_views._build_chart_payload') as build:
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        build.assert_not_called()
+
+    def test_new_telemetry_version_rebuilds(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            cache_versions.bump_version(cache_versions.TELEMETRY)
+
+        with patch('heating.charts_views._build_chart_payload', return_value={'sensor_data': {}}) as build:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        build.assert_called_once()
+
+
+class FakeMQTTClient:
+    """Cliente paho mínimo: registra las publicaciones y devuelve ``rc``"""
+
+    def __init__(self, rc):
+        self.rc = rc
+        self.published = []
+
+    def publish(self, topic, message, qos=0):
+        self.published.append((topic, json.loads(message)['action']))
+        return SimpleNamespace(rc=self.rc, mid=len(self.published))
+
+
+class MQTTServiceTests(SimpleTestCase):
+
+    def service(self, qos, rc):
+        # Instancia propia, fuera del singleton del proceso
+        service = object.__new__(MQTTService)
+        service.initialized = False
+        with override_settings(MQTT_QOS=qos, MQTT_QUEUE_SIZE=2):
+            service.__init__()
+        service.client = FakeMQTTClient(rc)
+        return service
+
+    def test_commands_queued_by_paho_are_not_queued_again(self):
+        service = self.service(qos=1, rc=mqtt.MQTT_ERR_NO_CONN)
+        self.assertTrue(service.send_actuator_command('boiler', 20.0, 'turn_on'))
+        self.assertEqual(service._outbox, {})
+
+    def test_only_latest_command_per_topic_is_sent_on_connect(self):
+        service = self.service(qos=0, rc=mqtt.MQTT_ERR_NO_CONN)
+        self.assertFalse(service.send_actuator_command('boiler', 20.0, 'turn_on'))
+        self.assertFalse(service.send_actuator_command('boiler', 22.0, 'turn_off'))
+        self.assertFalse(service.send_actuator_command('boiler_2', 20.0, 'turn_on'))
+
+        service.client.rc = mqtt.MQTT_ERR_SUCCESS
+        service.client.published.clear()
+        service._on_connect(service.client, None, {}, 0)
+
+        self.assertEqual(service.client.published, [
+            ('home/actuator/boiler/command', 'turn_off'),
+            ('home/actuator/boiler_2/command', 'turn_on'),
+        ])
+        self.assertEqual(service._outbox, {})
+
+    def test_direct_publish_discards_pending_command_for_topic(self):
+        service = self.service(qos=0, rc=mqtt.MQTT_ERR_NO_CONN)
+        service.send_actuator_command('boiler', 20.0, 'turn_on')
+
+        service.client.rc = mqtt.MQTT_ERR_SUCCESS
+        self.assertTrue(service.send_actuator_command('boiler', 22.0, 'turn_off'))
+        self.assertEqual(service._outbox, {})
+
+    def test_full_queue_drops_oldest_topic(self):
+        service = self.service(qos=0, rc=mqtt.MQTT_ERR_NO_CONN)
+        for actuator_id in ('boiler', 'boiler_2', 'boiler_3'):
+            service.send_actuator_command(actuator_id, 20.0, 'turn_on')
+
+        self.assertEqual(list(service._outbox), ['home/actuator/boiler_2/command', 'home/actuator/boiler_3/command'])
+        self.assertEqual(service.stats['dropped'], 1)
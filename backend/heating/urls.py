@@ -17,9 +17,11 @@ urlpatterns = [
     # Dashboard web
     path('dashboard/', dashboard_views.dashboard_view, name='dashboard'),
     path('api/status/', dashboard_views.status_api, name='status_api'),
+    path('api/events/', dashboard_views.events_api, name='events_api'),
     # Dashboard de gráficas
     path('charts/', charts_views.charts_dashboard_view, name='charts_dashboard'),
     path('charts/api/data/', charts_views.charts_data_api, name='charts_data_api'),
+    path('charts/api/heatmap/', charts_views.usage_heatmap_api, name='usage_heatmap_api'),
     # Vista de prueba
     path('test/', dashboard_views.test_dashboard_data, name='test_dashboard_data'),
     # Debug APIs
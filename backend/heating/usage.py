@@ -0,0 +1,533 @@
+"""
+Contabilidad del uso de calefacción (HeatingHourlyUsage / HeatingDailyUsage /
+HeatingMonthlyUsage).
+
+Los períodos de calefacción activa se reparten en memoria entre las horas,
+días y meses locales que tocan, y los incrementos resultantes se aplican con un
+único ``INSERT ... ON CONFLICT DO UPDATE SET total_hours = total_hours +
+excluded.total_hours`` por tabla (SQLite >= 3.24 y PostgreSQL). Un lote de
+estados cuesta así tres sentencias, sea cual sea el número de períodos y de
+días afectados.
+
+El estado de cada actuador (último estado contabilizado) vive en
+HeatingUsageState, así que cada ActuatorStatus nuevo se contabiliza sin
+buscar el anterior en el historial, y varios actuadores no se mezclan.
+
+rebuild_usage() recalcula un rango de días desde el historial (comando
+rebuild_heating_usage) sustituyendo lo acumulado en ese rango. Con NumPy
+(opcional) el reparto por días está vectorizado (ver interval_usage()).
+
+``bulk_create(update_conflicts=True)`` no sirve aquí: sustituye el valor
+existente en lugar de sumarle el incremento, y dos procesos contabilizando a
+la vez perderían horas.
+"""
+import datetime
+import logging
+from collections import defaultdict
+from itertools import chain
+
+from django.db import connection, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+logger = logging.getLogger(__name__)
+
+# Filas por sentencia (límite de parámetros de SQLite)
+UPSERT_BATCH_SIZE = 250
+
+
+def _elapsed_hours(start, end):
+    # Restar en UTC: dos datetimes con la misma tzinfo se restan en hora de
+    # pared e ignorarían el cambio de hora
+    utc = datetime.timezone.utc
+    return (end.astimezone(utc) - start.astimezone(utc)).total_seconds() / 3600.0
+
+
+def _accumulate_hours(hourly_totals, start_local, end_local):
+    """Reparte un período entre las horas locales que toca: {(fecha, hora): horas}"""
+    utc = datetime.timezone.utc
+    current = start_local.astimezone(utc)
+    end = end_local.astimezone(utc)
+    while current < end:
+        local = timezone.localtime(current)
+        hour_start = local.replace(minute=0, second=0, microsecond=0).astimezone(utc)
+        boundary = min(hour_start + datetime.timedelta(hours=1), end)
+        hourly_totals[(local.date(), local.hour)] += (boundary - current).total_seconds() / 3600.0
+        current = boundary
+
+
+def accumulate_period(daily_totals, monthly_totals, start_local, end_local, hourly_totals=None):
+    """
+    Acumula un período de calefacción en los diccionarios en memoria,
+    repartiéndolo entre los días que toca (maneja el cruce de medianoche) y,
+    si se pasa ``hourly_totals``, entre las horas locales.
+    Recibe datetimes YA convertidos a hora local — no hace ninguna query.
+    """
+    if end_local <= start_local:
+        return
+
+    if hourly_totals is not None:
+        _accumulate_hours(hourly_totals, start_local, end_local)
+
+    # Avanzar día a día hasta el último día del período (exclusive)
+    current = start_local
+    while current.date() < end_local.date():
+        midnight = current.replace(hour=0, minute=0, second=0, microsecond=0) + datetime.timedelta(days=1)
+        hours = _elapsed_hours(current, midnight)
+        if hours > 0:
+            day = current.date()
+            daily_totals[day] += hours
+            monthly_totals[(day.year, day.month)] += hours
+        current = midnight
+
+    # Fracción del último día (o único día si start y end son el mismo día)
+    hours = _elapsed_hours(current, end_local)
+    if hours > 0:
+        day = current.date()
+        daily_totals[day] += hours
+        monthly_totals[(day.year, day.month)] += hours
+
+
+def usage_deltas(periods):
+    """
+    Incrementos por día, por mes y por hora de una lista de períodos.
+
+    Args:
+        periods: iterable de (inicio, fin) en UTC (datetimes aware).
+
+    Returns:
+        tuple: ({fecha: horas}, {(año, mes): horas}, {(fecha, hora): horas})
+    """
+    daily_totals = defaultdict(float)
+    monthly_totals = defaultdict(float)
+    hourly_totals = defaultdict(float)
+    for start_utc, end_utc in periods:
+        if end_utc <= start_utc:
+            continue
+        accumulate_period(
+            daily_totals, monthly_totals, timezone.localtime(start_utc), timezone.localtime(end_utc),
+            hourly_totals
+        )
+    return daily_totals, monthly_totals, hourly_totals
+
+
+def _upsert_increments(model, key_fields, rows):
+    """
+    Suma ``total_hours`` a las filas de ``model`` identificadas por
+    ``key_fields``, creándolas si no existen. ``rows`` es una lista de
+    (valores_clave, horas).
+    """
+    if not rows:
+        return
+    now = timezone.now()
+
+    if connection.vendor not in ('sqlite', 'postgresql'):
+        # Sin ON CONFLICT: una actualización (o creación) por fila
+        for key, hours in rows:
+            lookup = dict(zip(key_fields, key))
+            if not model.objects.filter(**lookup).update(total_hours=F('total_hours') + hours):
+                model.objects.create(total_hours=hours, **lookup)
+        return
+
+    quote = connection.ops.quote_name
+    key_columns = [model._meta.get_field(name) for name in key_fields]
+    updated_field = model._meta.get_field('last_updated')
+    table = quote(model._meta.db_table)
+    columns = [quote(field.column) for field in key_columns]
+    total = quote(model._meta.get_field('total_hours').column)
+    updated = quote(updated_field.column)
+    placeholders = '(' + ', '.join(['%s'] * (len(key_fields) + 2)) + ')'
+    now = updated_field.get_db_prep_value(now, connection)
+
+    with connection.cursor() as cursor:
+        for offset in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[offset:offset + UPSERT_BATCH_SIZE]
+            params = []
+            for key, hours in batch:
+                params.extend(field.get_db_prep_value(value, connection) for field, value in zip(key_columns, key))
+                params.extend([hours, now])
+            cursor.execute(
+                f'INSERT INTO {table} ({", ".join(columns)}, {total}, {updated}) '
+                f'VALUES {", ".join([placeholders] * len(batch))} '
+                f'ON CONFLICT ({", ".join(columns)}) DO UPDATE SET '
+                f'{total} = {table}.{total} + excluded.{total}, {updated} = excluded.{updated}',
+                params
+            )
+
+
+def apply_usage_deltas(daily_totals, monthly_totals, hourly_totals=None):
+    """Aplica los incrementos de usage_deltas() con un upsert por tabla"""
+    from .models import HeatingDailyUsage, HeatingHourlyUsage, HeatingMonthlyUsage
+
+    _upsert_increments(
+        HeatingDailyUsage, ('date',),
+        [((day,), hours) for day, hours in sorted(daily_totals.items()) if hours > 0]
+    )
+    _upsert_increments(
+        HeatingMonthlyUsage, ('year', 'month'),
+        [(key, hours) for key, hours in sorted(monthly_totals.items()) if hours > 0]
+    )
+    if hourly_totals:
+        _upsert_increments(
+            HeatingHourlyUsage, ('date', 'hour'),
+            [(key, hours) for key, hours in sorted(hourly_totals.items()) if hours > 0]
+        )
+
+
+def record_heating_periods(periods):
+    """
+    Registra una lista de períodos de calefacción activa (inicio, fin) en UTC
+    en HeatingHourlyUsage, HeatingDailyUsage y HeatingMonthlyUsage, en tres
+    sentencias.
+    """
+    apply_usage_deltas(*usage_deltas(periods))
+
+
+def account_statuses(statuses):
+    """
+    Contabiliza un lote de ActuatorStatus recién creados. Por actuador, el
+    estado guardado en HeatingUsageState hace de estado anterior al lote; los
+    períodos encendidos se registran juntos y el estado avanza al último del
+    lote, todo en la misma transacción.
+
+    Los estados más antiguos que el último contabilizado (reenvíos tardíos del
+    spool del bridge) no se pueden colocar sin recorrer el historial: aquí se
+    omiten con un aviso en el log. Como tienen ids posteriores al punto de
+    control, ``rebuild_heating_usage --incremental`` recalcula desde su día
+    sin más intervención.
+    """
+    from .models import HeatingUsageState
+
+    by_actuator = defaultdict(list)
+    for status in statuses:
+        by_actuator[status.actuator_id].append(status)
+    if not by_actuator:
+        return
+
+    periods = []
+    late = []
+    with transaction.atomic():
+        # Orden fijo de bloqueo entre procesos
+        for actuator_id in sorted(by_actuator):
+            state, _ = (
+                HeatingUsageState.objects
+                .select_for_update()
+                .get_or_create(actuator_id=actuator_id)
+            )
+            last_at, last_heating = state.last_status_at, state.last_is_heating
+            ordered = sorted(by_actuator[actuator_id], key=lambda s: s.created_at)
+            for status in ordered:
+                if last_at is not None and status.created_at < last_at:
+                    late.append(status.created_at)
+                    continue
+                if last_at is not None and last_heating:
+                    periods.append((last_at, status.created_at))
+                last_at, last_heating = status.created_at, status.is_heating
+
+            if (last_at, last_heating) != (state.last_status_at, state.last_is_heating):
+                state.last_status_at = last_at
+                state.last_is_heating = last_heating
+                state.save(update_fields=['last_status_at', 'last_is_heating', 'updated_at'])
+
+        record_heating_periods(periods)
+
+    if late:
+        logger.warning(
+            f"{len(late)} estados de actuador anteriores al último contabilizado (el más antiguo "
+            f"{min(late).isoformat()}) no se han sumado al uso; los recalcula "
+            f"rebuild_heating_usage --incremental"
+        )
+
+
+def local_midnight(day):
+    """Inicio (aware) del día local ``day``"""
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def _actuator_histories(start=None, end=None, last_states=None):
+    """
+    Historial de cada actuador para recalcular [start, end) (None = sin
+    límite): ``(actuator_id, filas)``, con filas ``(created_at, is_heating)``
+    en orden. Las filas empiezan por el último estado anterior a ``start`` y
+    terminan con el primer estado desde ``end`` (cierra el último período).
+
+    Se lee con ``.iterator()`` (una consulta por actuador), sin cargar el
+    historial en memoria. Si se pasa ``last_states`` se rellena con el último
+    estado anterior a ``end`` de cada actuador: {actuator_id: (created_at,
+    is_heating)}.
+    """
+    from actuators.models import ActuatorStatus
+
+    def tracked(actuator_id, rows):
+        for row in rows:
+            last_states[actuator_id] = row
+            yield row
+
+    actuator_ids = (
+        ActuatorStatus.objects.order_by('actuator_id').values_list('actuator_id', flat=True).distinct()
+    )
+    for actuator_id in list(actuator_ids):
+        history = ActuatorStatus.objects.filter(actuator_id=actuator_id)
+        rows = history
+        seed = closing = None
+        if start is not None:
+            rows = rows.filter(created_at__gte=start)
+            seed = history.filter(created_at__lt=start).order_by('-created_at').values_list(
+                'created_at', 'is_heating'
+            ).first()
+        if end is not None:
+            rows = rows.filter(created_at__lt=end)
+            closing = history.filter(created_at__gte=end).order_by('created_at').values_list(
+                'created_at', 'is_heating'
+            ).first()
+
+        rows = rows.order_by('created_at').values_list('created_at', 'is_heating').iterator(chunk_size=5_000)
+        if last_states is not None:
+            rows = tracked(actuator_id, chain([seed] if seed is not None else [], rows))
+        elif seed is not None:
+            rows = chain([seed], rows)
+        if closing is not None:
+            rows = chain(rows, [closing])
+        yield actuator_id, rows
+
+
+def range_periods(start=None, end=None, last_states=None):
+    """
+    Períodos de calefacción activa del historial, por actuador, recortados a
+    [start, end). Un período aún abierto (sin estado posterior) no se cuenta,
+    igual que en la contabilidad incremental. Ver _actuator_histories().
+    """
+    for _, rows in _actuator_histories(start, end, last_states):
+        prev_at, prev_heating = None, False
+        for created_at, is_heating in rows:
+            if prev_heating:
+                period_start = max(prev_at, start) if start is not None else prev_at
+                period_end = min(created_at, end) if end is not None else created_at
+                if period_end > period_start:
+                    yield period_start, period_end
+            prev_at, prev_heating = created_at, is_heating
+
+
+def heating_hours(times, flags):
+    """
+    Horas encendida de una serie ordenada de estados: cada estado encendido
+    cuenta hasta el siguiente; el último no cuenta (no se sabe cuándo acaba).
+
+    Args:
+        times: datetimes aware, en orden.
+        flags: is_heating de cada estado.
+    """
+    if numpy is not None:
+        epochs = numpy.fromiter((moment.timestamp() for moment in times), dtype=float)
+        if epochs.size < 2:
+            return 0.0
+        heating = numpy.fromiter(flags, dtype=bool, count=epochs.size)
+        return float(numpy.diff(epochs)[heating[:-1]].sum()) / 3600.0
+
+    times = list(times)
+    flags = list(flags)
+    seconds = sum(
+        (times[i + 1] - times[i]).total_seconds()
+        for i in range(len(times) - 1) if flags[i]
+    )
+    return seconds / 3600.0
+
+
+def _split_intervals(bounds, starts, ends):
+    """
+    Segundos de cada tramo [bounds[i], bounds[i + 1]) cubiertos por los
+    intervalos [starts, ends), vectorizado.
+
+    Cada intervalo se sitúa entre los límites con searchsorted y se suman por
+    separado: los intervalos de un solo tramo, el trozo del primer y del
+    último tramo de los que cruzan un límite, y los tramos completos entre
+    medias (conteo por diferencias acumuladas). Todo con bincount.
+    """
+    size = len(bounds) - 1
+    # Tramo de inicio y de fin de cada intervalo (un fin justo en un límite
+    # pertenece al tramo anterior)
+    first = numpy.searchsorted(bounds, starts, side='right') - 1
+    last = numpy.searchsorted(bounds, ends, side='left') - 1
+
+    seconds = numpy.zeros(size)
+    same = first == last
+    seconds += numpy.bincount(first[same], weights=(ends - starts)[same], minlength=size)
+
+    cross = ~same
+    first, last = first[cross], last[cross]
+    seconds += numpy.bincount(first, weights=bounds[first + 1] - starts[cross], minlength=size)
+    seconds += numpy.bincount(last, weights=ends[cross] - bounds[last], minlength=size)
+    covered = numpy.cumsum(
+        numpy.bincount(first + 1, minlength=size + 1) - numpy.bincount(last, minlength=size + 1)
+    )[:size]
+    seconds += covered * numpy.diff(bounds)
+    return seconds
+
+
+def interval_usage(starts, ends):
+    """
+    Horas por día, mes y hora local de una colección de intervalos encendidos
+    (arrays NumPy de epoch en segundos), vectorizado con _split_intervals().
+
+    Las medianoches se calculan con la zona horaria, así que los días de
+    cambio de hora duran 23 o 25 h. Los límites de hora se toman cada 3600 s
+    desde la medianoche, válido para zonas cuyo desfase cambia en horas
+    completas (como Europe/Madrid); la hora repetida al atrasar el reloj se
+    suma en la misma (fecha, hora), igual que en accumulate_period().
+
+    Returns:
+        tuple: ({fecha: horas}, {(año, mes): horas}, {(fecha, hora): horas}),
+        como usage_deltas()
+    """
+    daily_totals = defaultdict(float)
+    monthly_totals = defaultdict(float)
+    hourly_totals = defaultdict(float)
+    keep = ends > starts
+    starts, ends = starts[keep], ends[keep]
+    if not starts.size:
+        return daily_totals, monthly_totals, hourly_totals
+
+    utc = datetime.timezone.utc
+    first_day = timezone.localdate(datetime.datetime.fromtimestamp(starts.min(), tz=utc))
+    last_day = timezone.localdate(datetime.datetime.fromtimestamp(ends.max(), tz=utc))
+    days = [first_day + datetime.timedelta(days=n) for n in range((last_day - first_day).days + 2)]
+    bounds = numpy.array([local_midnight(day).timestamp() for day in days])
+    days = days[:-1]
+
+    hours = _split_intervals(bounds, starts, ends) / 3600.0
+    month_index = numpy.array([
+        (day.year - first_day.year) * 12 + day.month - first_day.month for day in days
+    ])
+    month_hours = numpy.bincount(month_index, weights=hours)
+
+    for index in numpy.flatnonzero(hours > 0):
+        daily_totals[days[index]] = float(hours[index])
+    for index in numpy.flatnonzero(month_hours > 0):
+        year, month = divmod(first_day.month - 1 + int(index), 12)
+        monthly_totals[(first_day.year + year, month + 1)] = float(month_hours[index])
+
+    hour_bounds = numpy.arange(bounds[0], bounds[-1] + 1, 3600.0)
+    hour_hours = _split_intervals(hour_bounds, starts, ends) / 3600.0
+    for index in numpy.flatnonzero(hour_hours > 0):
+        local = timezone.localtime(datetime.datetime.fromtimestamp(hour_bounds[index], tz=utc))
+        hourly_totals[(local.date(), local.hour)] += float(hour_hours[index])
+    return daily_totals, monthly_totals, hourly_totals
+
+
+def range_usage(start=None, end=None, last_states=None):
+    """
+    Incrementos por día, mes y hora de [start, end) recalculados desde el
+    historial. Con NumPy, cada actuador se carga como arrays (epoch,
+    is_heating) y los intervalos se reparten con interval_usage(); sin NumPy,
+    período a período con usage_deltas(range_periods()).
+    """
+    if numpy is None:
+        return usage_deltas(range_periods(start, end, last_states))
+
+    start_epoch = start.timestamp() if start is not None else None
+    end_epoch = end.timestamp() if end is not None else None
+    all_starts = []
+    all_ends = []
+    for _, rows in _actuator_histories(start, end, last_states):
+        data = numpy.fromiter(
+            chain.from_iterable((created_at.timestamp(), is_heating) for created_at, is_heating in rows),
+            dtype=float
+        ).reshape(-1, 2)
+        if len(data) < 2:
+            continue
+        epochs, heating = data[:, 0], data[:, 1].astype(bool)[:-1]
+        starts, ends = epochs[:-1][heating], epochs[1:][heating]
+        if start_epoch is not None:
+            starts = numpy.maximum(starts, start_epoch)
+        if end_epoch is not None:
+            ends = numpy.minimum(ends, end_epoch)
+        all_starts.append(starts)
+        all_ends.append(ends)
+
+    if not all_starts:
+        return defaultdict(float), defaultdict(float), defaultdict(float)
+    return interval_usage(numpy.concatenate(all_starts), numpy.concatenate(all_ends))
+
+
+def rebuild_usage(since=None, until=None):
+    """
+    Recalcula el uso de los días locales [since, until] (fechas, ambas
+    inclusive; None = sin límite) desde el historial y sustituye lo guardado
+    en ese rango (horas y días). Los meses tocados se recalculan sumando sus
+    días.
+
+    Si el rango llega hasta el presente (``until`` None), HeatingUsageState
+    se reinicia al último estado de cada actuador. Se bloquea antes para que
+    la contabilidad en vivo no se cuele entre la lectura y la escritura.
+
+    Returns:
+        tuple: (días con uso, meses con uso, horas con uso) escritos.
+    """
+    from .models import HeatingDailyUsage, HeatingHourlyUsage, HeatingMonthlyUsage, HeatingUsageState
+    from .cache_versions import TELEMETRY, bump_version
+
+    start = local_midnight(since) if since is not None else None
+    end = local_midnight(until + datetime.timedelta(days=1)) if until is not None else None
+
+    with transaction.atomic():
+        if until is None:
+            list(HeatingUsageState.objects.select_for_update())
+
+        last_states = {}
+        daily_totals, monthly_totals, hourly_totals = range_usage(start, end, last_states)
+
+        for model in (HeatingDailyUsage, HeatingHourlyUsage):
+            rows = model.objects.all()
+            if since is not None:
+                rows = rows.filter(date__gte=since)
+            if until is not None:
+                rows = rows.filter(date__lte=until)
+            rows.delete()
+        hourly_rows = HeatingHourlyUsage.objects.bulk_create([
+            HeatingHourlyUsage(date=day, hour=hour, total_hours=round(hours, 4))
+            for (day, hour), hours in sorted(hourly_totals.items()) if hours > 0
+        ])
+        daily_rows = HeatingDailyUsage.objects.bulk_create([
+            HeatingDailyUsage(date=day, total_hours=round(hours, 4))
+            for day, hours in sorted(daily_totals.items()) if hours > 0
+        ])
+
+        if since is None and until is None:
+            HeatingMonthlyUsage.objects.all().delete()
+            months = {key: hours for key, hours in monthly_totals.items() if hours > 0}
+        else:
+            # Meses tocados por el rango: su total es la suma de sus días
+            months = HeatingMonthlyUsage.objects.all()
+            days = HeatingDailyUsage.objects.all()
+            if since is not None:
+                months = months.filter(year__gte=since.year).exclude(year=since.year, month__lt=since.month)
+                days = days.filter(date__gte=since.replace(day=1))
+            if until is not None:
+                months = months.filter(year__lte=until.year).exclude(year=until.year, month__gt=until.month)
+                next_month = (until.replace(day=1) + datetime.timedelta(days=32)).replace(day=1)
+                days = days.filter(date__lt=next_month)
+            months.delete()
+            months = defaultdict(float)
+            for row in days.values('date__year', 'date__month').annotate(hours=Sum('total_hours')):
+                months[(row['date__year'], row['date__month'])] += row['hours']
+
+        monthly_rows = HeatingMonthlyUsage.objects.bulk_create([
+            HeatingMonthlyUsage(year=year, month=month, total_hours=round(hours, 4))
+            for (year, month), hours in sorted(months.items()) if hours > 0
+        ])
+
+        if until is None:
+            for actuator_id, (created_at, is_heating) in last_states.items():
+                HeatingUsageState.objects.update_or_create(
+                    actuator_id=actuator_id,
+                    defaults={'last_status_at': created_at, 'last_is_heating': is_heating}
+                )
+
+        bump_version(TELEMETRY)
+
+    return len(daily_rows), len(monthly_rows), len(hourly_rows)
@@ -5,6 +5,8 @@ from rest_framework.permissions import IsAuthenticated
 from django.utils import timezone
 from django.db import models
 from django.core.exceptions import ValidationError
+from home_control.export import ExportMixin
+from home_control.pagination import KeysetListMixin
 from .models import HeatingSettings, HeatingSchedule, HeatingLog
 from .serializers import (
     HeatingSettingsSerializer, HeatingScheduleSerializer, 
@@ -165,14 +167,20 @@ class HeatingScheduleViewSet(viewsets.ModelViewSet):
         return Response(schedules_by_day)
 
 
-class HeatingLogViewSet(viewsets.ModelViewSet):
+class HeatingLogViewSet(ExportMixin, KeysetListMixin, viewsets.ModelViewSet):
     """
-    ViewSet para logs de calefacción
+    ViewSet para logs de calefacción.
+    El listado se pagina por cursor sobre (timestamp, id); ?stream=1 devuelve
+    todos los logs en streaming y /export/ los exporta (NDJSON, CSV, Parquet
+    o Arrow).
     """
     queryset = HeatingLog.objects.all()
     serializer_class = HeatingLogSerializer
     permission_classes = [IsAuthenticated]
     http_method_names = ['get']  # Solo lectura
+    keyset_field = 'timestamp'
+    export_time_field = 'timestamp'
+    export_device_field = 'actuator_id'
     
     def get_queryset(self):
         """Filtrar logs por fecha si se especifica"""
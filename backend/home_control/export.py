@@ -0,0 +1,238 @@
+"""
+Exportación del historial de telemetría en streaming (NDJSON, CSV, Parquet y
+Arrow).
+
+Las filas se leen con ``values_list().iterator()`` (cursor del lado del
+servidor en PostgreSQL) y se escriben por bloques en un
+``StreamingHttpResponse``: la memoria usada es la de un bloque, sea cual sea
+el rango exportado. Bajo ASGI el stream se sirve como iterador async (ver
+home_control.streaming); si no, Django lo cargaría entero antes de enviarlo.
+Parquet y Arrow son opcionales (requieren pyarrow) y se escriben como un row
+group / record batch por bloque.
+
+Parámetros comunes (ver ExportMixin):
+    output   -- ndjson (por defecto), csv, parquet o arrow
+    start    -- inicio del rango (fecha o fecha-hora ISO 8601), inclusivo
+    end      -- fin del rango, exclusivo (una fecha sola incluye todo el día)
+    columns  -- columnas separadas por comas (por defecto todas)
+    <device> -- uno o varios ids separados por comas (sensor_id, actuator_id)
+"""
+import csv
+from datetime import datetime, time, timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from .streaming import streaming_response
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+OUTPUTS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+}
+COLUMNAR_OUTPUTS = ('parquet', 'arrow')
+
+EXPORT_CHUNK_SIZE = 5000
+
+
+def _parse_bound(value, is_end):
+    """Fecha-hora aware a partir de una fecha o fecha-hora ISO 8601"""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Fecha no válida: {value}')
+        if is_end:
+            day += timedelta(days=1)
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _arrow_type(field):
+    if isinstance(field, models.BooleanField):
+        return pyarrow.bool_()
+    if isinstance(field, models.IntegerField):
+        return pyarrow.int64()
+    if isinstance(field, models.FloatField):
+        return pyarrow.float64()
+    if isinstance(field, models.DateTimeField):
+        return pyarrow.timestamp('us', tz='UTC')
+    return pyarrow.string()
+
+
+class _ByteSink:
+    """Destino de escritura de pyarrow que acumula los bytes hasta vaciarse"""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
+
+
+class _EchoBuffer:
+    """Buffer para csv.writer que devuelve la línea en lugar de guardarla"""
+
+    def write(self, value):
+        return value
+
+
+def _chunks(rows, size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def stream_ndjson(rows, columns):
+    encoder = DjangoJSONEncoder()
+    for chunk in _chunks(rows, EXPORT_CHUNK_SIZE):
+        yield ''.join(encoder.encode(dict(zip(columns, row))) + '\n' for row in chunk)
+
+
+def stream_csv(rows, columns):
+    writer = csv.writer(_EchoBuffer())
+    yield writer.writerow(columns)
+    for chunk in _chunks(rows, EXPORT_CHUNK_SIZE):
+        yield ''.join(
+            writer.writerow([value.isoformat() if isinstance(value, datetime) else value for value in row])
+            for row in chunk
+        )
+
+
+def stream_columnar(rows, columns, fields, output):
+    """Parquet (un row group por bloque) o Arrow IPC (un record batch por bloque)"""
+    schema = pyarrow.schema([pyarrow.field(name, _arrow_type(fields[name])) for name in columns])
+    sink = _ByteSink()
+    target = pyarrow.PythonFile(sink, mode='w')
+    if output == 'parquet':
+        writer = pyarrow.parquet.ParquetWriter(target, schema)
+        write = writer.write_table
+        make = pyarrow.Table.from_arrays
+    else:
+        writer = pyarrow.ipc.new_stream(target, schema)
+        write = writer.write_batch
+        make = pyarrow.RecordBatch.from_arrays
+
+    for chunk in _chunks(rows, EXPORT_CHUNK_SIZE):
+        arrays = [
+            pyarrow.array([row[index] for row in chunk], type=schema.field(index).type)
+            for index in range(len(columns))
+        ]
+        write(make(arrays, schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+class ExportMixin:
+    """
+    Acción ``export/`` para ViewSets de telemetría. La vista define
+    ``export_time_field`` (campo de fecha del rango y del orden) y,
+    opcionalmente, ``export_device_field`` (filtro por dispositivo).
+    """
+    export_time_field = 'created_at'
+    export_device_field = None
+
+    def _export_fields(self):
+        model = self.get_queryset().model
+        return {field.name: field for field in model._meta.concrete_fields if not field.is_relation}
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Exportar historial en streaming (NDJSON, CSV, Parquet o Arrow).
+        GET .../export/?output=csv&start=2025-11-01&end=2025-11-30&columns=created_at,temperature
+        """
+        params = request.query_params
+        output = params.get('output', 'ndjson')
+        if output not in OUTPUTS:
+            return Response({'error': f'Formato no válido: {output}'}, status=status.HTTP_400_BAD_REQUEST)
+        if output in COLUMNAR_OUTPUTS and pyarrow is None:
+            return Response(
+                {'error': f'La salida {output} requiere instalar pyarrow'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        fields = self._export_fields()
+        columns = [name.strip() for name in params.get('columns', '').split(',') if name.strip()]
+        columns = columns or list(fields)
+        unknown = [name for name in columns if name not in fields]
+        if unknown:
+            return Response(
+                {'error': f'Columnas no válidas: {", ".join(unknown)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        time_field = self.export_time_field
+        queryset = self.get_queryset()
+        try:
+            if params.get('start'):
+                queryset = queryset.filter(**{f'{time_field}__gte': _parse_bound(params['start'], False)})
+            if params.get('end'):
+                queryset = queryset.filter(**{f'{time_field}__lt': _parse_bound(params['end'], True)})
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        device_field = self.export_device_field
+        if device_field and params.get(device_field):
+            devices = [device.strip() for device in params[device_field].split(',') if device.strip()]
+            queryset = queryset.filter(**{f'{device_field}__in': devices})
+
+        rows = (
+            queryset
+            .order_by(time_field, 'id')
+            .values_list(*columns)
+            .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+        )
+        if output == 'ndjson':
+            stream = stream_ndjson(rows, columns)
+        elif output == 'csv':
+            stream = stream_csv(rows, columns)
+        else:
+            stream = stream_columnar(rows, columns, fields, output)
+
+        content_type, extension = OUTPUTS[output]
+        model_name = queryset.model._meta.model_name
+        response = streaming_response(request, stream, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{model_name}.{extension}"'
+        response['X-Accel-Buffering'] = 'no'
+        return response
@@ -0,0 +1,219 @@
+"""
+Ingesta por lotes de lecturas de sensores y estados de actuadores.
+
+Valida cada fila con un esquema ligero (sin instanciar serializers de DRF),
+inserta todo con ``bulk_create`` en una sola transacción y ejecuta los hooks
+de control y contabilidad de uso una vez por lote en lugar de una vez por fila.
+
+Es el único camino de escritura para datos de dispositivos: lo usan las vistas
+REST (creación individual y /bulk/) y el modo ``--direct`` de mqtt_bridge.py.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+
+class _Field:
+    """Campo de un esquema de ingesta"""
+
+    def __init__(self, kind, required=False, default=None, max_length=None):
+        self.kind = kind
+        self.required = required
+        self.default = default
+        self.max_length = max_length
+
+    def clean(self, value):
+        if value is None:
+            if self.required:
+                raise ValueError('Este campo es obligatorio.')
+            return self.default() if callable(self.default) else self.default
+
+        if self.kind is str:
+            if not isinstance(value, str) or not value:
+                raise ValueError('Se esperaba un texto no vacío.')
+            if self.max_length and len(value) > self.max_length:
+                raise ValueError(f'Máximo {self.max_length} caracteres.')
+            return value
+
+        if self.kind is bool:
+            if isinstance(value, bool):
+                return value
+            if value in (0, 1, '0', '1'):
+                return bool(int(value))
+            if isinstance(value, str) and value.lower() in ('true', 'false'):
+                return value.lower() == 'true'
+            raise ValueError('Se esperaba un booleano.')
+
+        if self.kind is int:
+            if isinstance(value, bool):
+                raise ValueError('Se esperaba un entero.')
+            if isinstance(value, float) and value.is_integer():
+                return int(value)
+            try:
+                return int(value)
+            except (TypeError, ValueError):
+                raise ValueError('Se esperaba un entero.')
+
+        if self.kind is float:
+            if isinstance(value, bool):
+                raise ValueError('Se esperaba un número.')
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                raise ValueError('Se esperaba un número.')
+
+        if self.kind == 'datetime':
+            parsed = parse_datetime(value) if isinstance(value, str) else None
+            if parsed is None:
+                raise ValueError('Se esperaba una fecha ISO 8601.')
+            if timezone.is_naive(parsed):
+                parsed = timezone.make_aware(parsed)
+            return parsed
+
+        raise ValueError('Tipo no soportado.')
+
+
+SENSOR_READING_SCHEMA = {
+    'sensor_id': _Field(str, required=True, max_length=50),
+    'temperature': _Field(float),
+    'humidity': _Field(float),
+    'timestamp': _Field(int),
+    'wifi_signal': _Field(int),
+    'free_heap': _Field(int),
+    'sensor_error': _Field(bool, default=False),
+    'source': _Field(str, default='mqtt_bridge', max_length=50),
+    # Permite reenviar lecturas antiguas (spool del bridge) con su hora real;
+    # la creación individual por REST no lo pasa (ver SensorReadingViewSet.create)
+    'created_at': _Field('datetime', default=timezone.now),
+}
+
+ACTUATOR_STATUS_SCHEMA = {
+    'actuator_id': _Field(str, required=True, max_length=50),
+    'is_heating': _Field(bool, default=False),
+    'timestamp': _Field(int),
+    'wifi_signal': _Field(int),
+    'free_heap': _Field(int),
+    'temperature': _Field(float),
+    'source': _Field(str, default='mqtt_bridge', max_length=50),
+    'created_at': _Field('datetime', default=timezone.now),
+}
+
+
+def validate_rows(rows, schema):
+    """
+    Valida una lista de diccionarios contra un esquema.
+
+    Returns:
+        tuple: (filas_válidas, errores) donde errores es una lista de
+        ``{'index': i, 'errors': {campo: mensaje}}``.
+    """
+    valid = []
+    errors = []
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors.append({'index': index, 'errors': {'non_field_errors': 'Se esperaba un objeto JSON.'}})
+            continue
+
+        clean = {}
+        row_errors = {}
+        for name, field in schema.items():
+            try:
+                clean[name] = field.clean(row.get(name))
+            except ValueError as e:
+                row_errors[name] = str(e)
+
+        if row_errors:
+            errors.append({'index': index, 'errors': row_errors})
+        else:
+            valid.append(clean)
+    return valid, errors
+
+
+def _check_batch_size(rows):
+    max_batch = getattr(settings, 'INGEST_MAX_BATCH', 5000)
+    if len(rows) > max_batch:
+        raise ValueError(f'El lote supera el máximo de {max_batch} elementos.')
+
+
+def ingest_sensor_readings(rows):
+    """
+    Valida e inserta un lote de lecturas de sensores.
+
+    Los agregados por intervalo (SensorRollup) y la última lectura por
+    sensor (SensorLatest) se actualizan en la misma transacción. Tras el
+    commit, encola en el worker de control solo la lectura más reciente de
+    cada sensor (las lecturas más antiguas que INGEST_CONTROL_MAX_AGE no
+    disparan control: vienen de un reenvío tras una caída).
+
+    Returns:
+        tuple: (objetos_creados, errores)
+    """
+    from sensors.latest import record_latest_readings
+    from sensors.models import SensorReading
+    from sensors.rollups import record_readings
+    from heating.cache_versions import TELEMETRY, bump_version
+    from heating.control_worker import submit_sensor_reading
+
+    _check_batch_size(rows)
+    valid, errors = validate_rows(rows, SENSOR_READING_SCHEMA)
+    if not valid:
+        return [], errors
+
+    with transaction.atomic():
+        created = SensorReading.objects.bulk_create([SensorReading(**row) for row in valid])
+        record_readings(created)
+        record_latest_readings(created)
+        bump_version(TELEMETRY)
+
+        latest_by_sensor = {}
+        for reading in created:
+            if reading.temperature is None:
+                continue
+            current = latest_by_sensor.get(reading.sensor_id)
+            if current is None or reading.created_at >= current.created_at:
+                latest_by_sensor[reading.sensor_id] = reading
+
+        max_age = timedelta(seconds=getattr(settings, 'INGEST_CONTROL_MAX_AGE', 300))
+        oldest_allowed = timezone.now() - max_age
+        for reading in latest_by_sensor.values():
+            if reading.created_at < oldest_allowed:
+                continue
+            sensor_id, temperature = reading.sensor_id, reading.temperature
+            transaction.on_commit(
+                lambda sensor_id=sensor_id, temperature=temperature: submit_sensor_reading(sensor_id, temperature)
+            )
+
+    return created, errors
+
+
+def ingest_actuator_statuses(rows):
+    """
+    Valida e inserta un lote de estados de actuadores y acumula el uso de
+    calefacción del lote completo de una vez.
+
+    Returns:
+        tuple: (objetos_creados, errores)
+    """
+    from actuators.latest import record_latest_statuses
+    from actuators.models import ActuatorStatus
+    from heating.cache_versions import TELEMETRY, bump_version
+    from heating.models import record_actuator_statuses
+
+    _check_batch_size(rows)
+    valid, errors = validate_rows(rows, ACTUATOR_STATUS_SCHEMA)
+    if not valid:
+        return [], errors
+
+    with transaction.atomic():
+        created = ActuatorStatus.objects.bulk_create([ActuatorStatus(**row) for row in valid])
+        record_actuator_statuses(created)
+        record_latest_statuses(created)
+        bump_version(TELEMETRY)
+
+    return created, errors
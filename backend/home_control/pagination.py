@@ -0,0 +1,149 @@
+import base64
+import binascii
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import replace_query_param
+
+from .streaming import streaming_response
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por cursor (keyset) sobre (campo de fecha, id), de lo más
+    reciente a lo más antiguo.
+
+    Cada página es un ``WHERE (fecha, id) < (cursor)`` con ``LIMIT``, que usa
+    los índices por fecha: el coste no depende de la página ni del tamaño
+    del historial, y las filas insertadas mientras se pagina no desplazan
+    las páginas siguientes. El campo de fecha lo define la vista con
+    ``keyset_field`` (por defecto ``created_at``).
+
+    Respuesta: ``{"next": url o null, "results": [...]}``.
+    """
+    page_size = 100
+    max_page_size = 1000
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    default_field = 'created_at'
+    invalid_cursor_message = 'Cursor no válido'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            size = self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode()).decode()
+            moment, pk = raw.rsplit('|', 1)
+            moment = parse_datetime(moment)
+            pk = int(pk)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if moment is None:
+            raise NotFound(self.invalid_cursor_message)
+        return moment, pk
+
+    def encode_cursor(self, moment, pk):
+        return base64.urlsafe_b64encode(f'{moment.isoformat()}|{pk}'.encode()).decode()
+
+    def paginate_queryset(self, queryset, request, view=None):
+        field = getattr(view, 'keyset_field', self.default_field)
+        page_size = self.get_page_size(request)
+        self.request = request
+
+        queryset = queryset.order_by(f'-{field}', '-id')
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            moment, pk = cursor
+            queryset = queryset.filter(Q(**{f'{field}__lt': moment}) | Q(**{field: moment, 'id__lt': pk}))
+
+        # Una fila de más indica si hay página siguiente
+        page = list(queryset[:page_size + 1])
+        self.next_cursor = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            last = page[-1]
+            self.next_cursor = self.encode_cursor(getattr(last, field), last.pk)
+        return page
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class KeysetListMixin:
+    """
+    Listados paginados con KeysetPagination y, con ``?stream=1``, el listado
+    completo como un array JSON que se escribe por bloques desde
+    ``.iterator()``: la memoria no crece con el tamaño del historial. Bajo
+    ASGI los bloques se generan con sync_to_async desde un generador async
+    (ver home_control.streaming), sin cargar la tabla entera.
+    """
+    pagination_class = KeysetPagination
+    keyset_field = 'created_at'
+    stream_query_param = 'stream'
+    stream_chunk_size = 2000
+
+    def list(self, request, *args, **kwargs):
+        return self.list_response(self.filter_queryset(self.get_queryset()))
+
+    def list_response(self, queryset):
+        """Respuesta paginada o en streaming de un queryset ya filtrado"""
+        if self.request.query_params.get(self.stream_query_param) in ('1', 'true', 'yes'):
+            return self.stream_response(queryset)
+
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def stream_response(self, queryset):
+        queryset = queryset.order_by(f'-{self.keyset_field}', '-id')
+        response = streaming_response(self.request, self._stream_rows(queryset), content_type='application/json')
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def _stream_rows(self, queryset):
+        encoder = JSONEncoder()
+        chunk = []
+        first = True
+        yield '['
+        for obj in queryset.iterator(chunk_size=self.stream_chunk_size):
+            chunk.append(obj)
+            if len(chunk) == self.stream_chunk_size:
+                yield self._encode_chunk(encoder, chunk, first)
+                first = False
+                chunk = []
+        if chunk:
+            yield self._encode_chunk(encoder, chunk, first)
+        yield ']'
+
+    def _encode_chunk(self, encoder, chunk, first):
+        rows = self.get_serializer(chunk, many=True).data
+        text = ','.join(encoder.encode(row) for row in rows)
+        return text if first else ',' + text
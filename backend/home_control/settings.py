@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -162,6 +163,30 @@ WHITENOISE_AUTOREFRESH = True
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Caché compartida entre workers de gunicorn (invalidación de cachés locales).
+# Por defecto fuera del repositorio; CACHE_LOCATION para fijar otra ruta.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache')
+CACHE_LOCATION = os.getenv('CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'home_control_cache'))
+# 'versions' guarda solo las versiones compartidas (heating.cache_versions). Con
+# la caché en archivos va en un directorio propio: con unas pocas claves nunca
+# llega a MAX_ENTRIES, así que las respuestas cacheadas de 'default' no pueden
+# provocar que se desalojen.
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION,
+    },
+    'versions': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv(
+            'CACHE_VERSIONS_LOCATION',
+            os.path.join(tempfile.gettempdir(), 'home_control_versions')
+            if CACHE_BACKEND.endswith('FileBasedCache') else CACHE_LOCATION
+        ),
+        'TIMEOUT': None,
+    },
+}
+
 # REST Framework configuration
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
@@ -182,6 +207,51 @@ MQTT_HOST = os.getenv('MQTT_HOST', 'localhost')
 MQTT_PORT = int(os.getenv('MQTT_PORT', 1883))
 MQTT_USERNAME = os.getenv('MQTT_USERNAME', '')
 MQTT_PASSWORD = os.getenv('MQTT_PASSWORD', '')
+MQTT_QOS = int(os.getenv('MQTT_QOS', 1))
+# Tamaño de la cola de comandos pendientes mientras no hay conexión con el broker
+MQTT_QUEUE_SIZE = int(os.getenv('MQTT_QUEUE_SIZE', 100))
+# Backoff de reconexión (segundos)
+MQTT_RECONNECT_MIN_DELAY = int(os.getenv('MQTT_RECONNECT_MIN_DELAY', 1))
+MQTT_RECONNECT_MAX_DELAY = int(os.getenv('MQTT_RECONNECT_MAX_DELAY', 60))
+
+# Control automático de calefacción
+# Procesar las lecturas en un hilo en segundo plano en lugar de en la petición
+HEATING_CONTROL_ASYNC = os.getenv('HEATING_CONTROL_ASYNC', 'True').lower() in ('true', '1', 'yes', 'on')
+# Máximo de sensores con lectura pendiente de procesar
+HEATING_CONTROL_QUEUE_SIZE = int(os.getenv('HEATING_CONTROL_QUEUE_SIZE', 32))
+# Segundos máximos desde que llega una lectura hasta que se decide
+HEATING_CONTROL_DEADLINE = float(os.getenv('HEATING_CONTROL_DEADLINE', 5.0))
+# Solo se publica al cambiar la decisión, más un latido periódico (segundos)
+HEATING_COMMAND_HEARTBEAT = int(os.getenv('HEATING_COMMAND_HEARTBEAT', 300))
+# Registrar en HeatingLog uno de cada N latidos (las transiciones siempre)
+HEATING_LOG_HEARTBEAT_EVERY = int(os.getenv('HEATING_LOG_HEARTBEAT_EVERY', 6))
+# Cada cuántos segundos comprueba un worker si otro ha cambiado el estado del controlador
+HEATING_STATE_VERSION_TTL = float(os.getenv('HEATING_STATE_VERSION_TTL', 5.0))
+
+# Ingesta por lotes (/bulk/)
+INGEST_MAX_BATCH = int(os.getenv('INGEST_MAX_BATCH', 5000))
+# Lecturas más antiguas que esto (segundos) no disparan el control automático
+INGEST_CONTROL_MAX_AGE = int(os.getenv('INGEST_CONTROL_MAX_AGE', 300))
+
+# Gráficas: leer SensorRollup en lugar de las lecturas crudas (la migración
+# sensors 0005 los calcula desde el historial existente; para recalcularlos:
+# python manage.py rebuild_sensor_rollups)
+CHARTS_USE_ROLLUPS = os.getenv('CHARTS_USE_ROLLUPS', 'True').lower() in ('true', '1', 'yes', 'on')
+# Segundos que se guarda en caché cada respuesta de la API de gráficas
+# (se invalida antes con cada ingesta: ver heating.cache_versions)
+CHARTS_CACHE_TIMEOUT = int(os.getenv('CHARTS_CACHE_TIMEOUT', 600))
+
+# Eventos en vivo (SSE) para los dashboards: /heating/api/events/
+# Segundos entre comprobaciones de cambios del publicador de cada proceso
+EVENTS_POLL_INTERVAL = float(os.getenv('EVENTS_POLL_INTERVAL', 1.0))
+# Segundos entre recálculos del estado aunque no haya cambios (horarios)
+EVENTS_STATUS_REFRESH = int(os.getenv('EVENTS_STATUS_REFRESH', 60))
+# Segundos sin eventos tras los que se envía un keepalive
+EVENTS_KEEPALIVE = int(os.getenv('EVENTS_KEEPALIVE', 15))
+# Duración máxima de una conexión (el navegador reconecta solo)
+EVENTS_MAX_DURATION = int(os.getenv('EVENTS_MAX_DURATION', 600))
+# Eventos pendientes por conexión antes de descartar los más antiguos
+EVENTS_QUEUE_SIZE = int(os.getenv('EVENTS_QUEUE_SIZE', 100))
 
 # Logging configuration
 LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
@@ -0,0 +1,42 @@
+"""
+Respuestas en streaming que mantienen la memoria acotada con WSGI y con ASGI.
+
+Bajo ASGI, Django consume un iterador síncrono de ``StreamingHttpResponse``
+con ``sync_to_async(list)``: carga la respuesta entera en memoria antes de
+enviar el primer byte. streaming_response() entrega en ese caso un generador
+async que avanza el iterador síncrono bloque a bloque con sync_to_async (en el
+hilo síncrono compartido, donde viven la conexión y el cursor de la DB).
+"""
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+_DONE = object()
+
+
+async def aiterate(iterator):
+    """Recorre un iterador síncrono (que puede consultar la DB) desde código async"""
+    iterator = iter(iterator)
+    step = sync_to_async(next)
+    try:
+        while True:
+            chunk = await step(iterator, _DONE)
+            if chunk is _DONE:
+                break
+            yield chunk
+    finally:
+        # Cliente desconectado a mitad: cierra el generador (y su cursor)
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await sync_to_async(close)()
+
+
+def streaming_response(request, stream, **kwargs):
+    """
+    StreamingHttpResponse de ``stream`` (iterador síncrono); si la petición
+    llega por ASGI, se sirve como iterador async con aiterate(). ``request``
+    puede ser un HttpRequest o un Request de DRF.
+    """
+    if isinstance(getattr(request, '_request', request), ASGIRequest):
+        stream = aiterate(stream)
+    return StreamingHttpResponse(stream, **kwargs)
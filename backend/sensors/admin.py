@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import SensorReading
+from .models import SensorLatest, SensorReading, SensorRollup
 
 
 @admin.register(SensorReading)
@@ -9,3 +9,19 @@ class SensorReadingAdmin(admin.ModelAdmin):
     search_fields = ['sensor_id']
     readonly_fields = ['created_at']
     ordering = ['-created_at']
+
+
+@admin.register(SensorRollup)
+class SensorRollupAdmin(admin.ModelAdmin):
+    list_display = ['sensor_id', 'resolution', 'bucket_start', 'temperature_count', 'temperature_min', 'temperature_max', 'temperature_last']
+    list_filter = ['resolution', 'sensor_id']
+    search_fields = ['sensor_id']
+    ordering = ['resolution', '-bucket_start']
+
+
+@admin.register(SensorLatest)
+class SensorLatestAdmin(admin.ModelAdmin):
+    list_display = ['sensor_id', 'reading_at', 'temperature_reading_at']
+    search_fields = ['sensor_id']
+    raw_id_fields = ['reading', 'temperature_reading']
+    ordering = ['sensor_id']
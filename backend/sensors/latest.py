@@ -0,0 +1,74 @@
+"""
+Mantenimiento del estado más reciente por sensor (SensorLatest).
+
+Cada lectura nueva actualiza la fila de su sensor con un UPDATE condicional:
+solo se sustituye la referencia si la lectura es más reciente que la guardada
+(las lecturas reenviadas desde el spool del bridge llegan tarde y no deben
+pisar a las nuevas). Un lote se reduce antes en memoria a la lectura más
+reciente de cada sensor, así que cuesta una consulta por sensor del lote.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import BigIntegerField, Case, DateTimeField, F, Q, Value, When
+
+
+def _newest(readings):
+    """
+    Por sensor, la lectura más reciente y la más reciente con temperatura:
+    {sensor_id: {'reading': lectura, 'temperature_reading': lectura o None}}
+    """
+    newest = {}
+    for reading in readings:
+        entry = newest.setdefault(reading.sensor_id, {'reading': None, 'temperature_reading': None})
+        for field in ('reading', 'temperature_reading'):
+            if field == 'temperature_reading' and reading.temperature is None:
+                continue
+            current = entry[field]
+            if current is None or reading.created_at >= current.created_at:
+                entry[field] = reading
+    return newest
+
+
+def _update_expressions(entry):
+    """Expresiones UPDATE que solo avanzan cada referencia si es más reciente"""
+    updates = {}
+    for field, reading in entry.items():
+        if reading is None:
+            continue
+        # También si la referencia se quedó a NULL (lectura borrada)
+        newer = (
+            Q(**{f'{field}__isnull': True})
+            | Q(**{f'{field}_at__isnull': True})
+            | Q(**{f'{field}_at__lte': reading.created_at})
+        )
+        updates.update({
+            field: Case(
+                When(newer, then=Value(reading.pk)),
+                default=F(field),
+                output_field=BigIntegerField()
+            ),
+            f'{field}_at': Case(
+                When(newer, then=Value(reading.created_at, output_field=DateTimeField())),
+                default=F(f'{field}_at')
+            ),
+        })
+    return updates
+
+
+def record_latest_readings(readings):
+    """Actualiza SensorLatest con un lote de lecturas recién creadas"""
+    from .models import SensorLatest
+
+    for sensor_id, entry in _newest(readings).items():
+        lookup = SensorLatest.objects.filter(sensor_id=sensor_id)
+        if lookup.update(**_update_expressions(entry)):
+            continue
+        values = {}
+        for field, reading in entry.items():
+            values[field] = reading
+            values[f'{field}_at'] = reading.created_at if reading is not None else None
+        try:
+            with transaction.atomic():
+                SensorLatest.objects.create(sensor_id=sensor_id, **values)
+        except IntegrityError:
+            # Otro proceso creó la fila entre el UPDATE y el INSERT
+            lookup.update(**_update_expressions(entry))
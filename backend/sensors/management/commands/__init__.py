@@ -0,0 +1 @@
+# Django management commands
\ No newline at end of file
@@ -0,0 +1,74 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from heating.cache_versions import TELEMETRY, bump_version
+from sensors.models import SensorReading, SensorRollup
+from sensors.rollups import accumulate, build_rollups
+
+CHUNK_SIZE = 5_000
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstruye SensorRollup (agregados de 5m, 1h y 1d por sensor) a '
+        'partir del historial completo de SensorReading. Borra los datos '
+        'existentes antes de recalcular.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--no-input',
+            action='store_true',
+            dest='no_input',
+            help='No pide confirmación antes de borrar los datos existentes.',
+        )
+
+    def handle(self, *args, **options):
+        if not options['no_input']:
+            confirm = input(
+                'Esto borrará todos los registros de SensorRollup y los '
+                'recalculará desde cero.\n'
+                '¿Continuar? [s/N] '
+            )
+            if confirm.strip().lower() not in ('s', 'si', 'sí', 'y', 'yes'):
+                self.stdout.write(self.style.WARNING('Operación cancelada.'))
+                return
+
+        total = SensorReading.objects.count()
+        self.stdout.write(f'Agregando {total:,} lecturas...')
+        t0 = time.time()
+
+        totals = None
+        chunk = []
+        processed = 0
+        for reading in (
+            SensorReading.objects
+            .order_by('created_at')
+            .values('sensor_id', 'created_at', 'temperature', 'humidity')
+            .iterator(chunk_size=CHUNK_SIZE)
+        ):
+            chunk.append(reading)
+            if len(chunk) == CHUNK_SIZE:
+                totals = accumulate(chunk, totals)
+                processed += len(chunk)
+                chunk = []
+                if processed % 50_000 == 0:
+                    self.stdout.write(f'  {processed:,}/{total:,} lecturas procesadas...')
+                    self.stdout.flush()
+        totals = accumulate(chunk, totals)
+
+        rollups = build_rollups(totals)
+        self.stdout.write(f'  {len(rollups):,} intervalos calculados en {time.time() - t0:.1f}s')
+
+        # --- Escritura en DB: borrar + bulk_create en una transacción ---
+        self.stdout.write('Guardando en la base de datos...')
+        with transaction.atomic():
+            SensorRollup.objects.all().delete()
+            SensorRollup.objects.bulk_create(rollups, batch_size=CHUNK_SIZE)
+            bump_version(TELEMETRY)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Listo. {SensorRollup.objects.count()} registros de SensorRollup creados.')
+        )
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-16 21:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0002_sensorreading_sensors_sen_created_aea84f_idx_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SensorRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sensor_id', models.CharField(help_text='ID del sensor', max_length=50)),
+                ('resolution', models.CharField(choices=[('5m', '5 minutos'), ('1h', '1 hora'), ('1d', '1 día')], help_text='Resolución del intervalo', max_length=2)),
+                ('bucket_start', models.DateTimeField(help_text='Inicio del intervalo (UTC)')),
+                ('temperature_count', models.IntegerField(default=0, help_text='Lecturas con temperatura')),
+                ('temperature_sum', models.FloatField(default=0.0, help_text='Suma de temperaturas')),
+                ('temperature_min', models.FloatField(blank=True, help_text='Temperatura mínima', null=True)),
+                ('temperature_max', models.FloatField(blank=True, help_text='Temperatura máxima', null=True)),
+                ('temperature_last', models.FloatField(blank=True, help_text='Última temperatura', null=True)),
+                ('temperature_last_at', models.DateTimeField(blank=True, help_text='Momento de la última temperatura', null=True)),
+                ('humidity_count', models.IntegerField(default=0, help_text='Lecturas con humedad')),
+                ('humidity_sum', models.FloatField(default=0.0, help_text='Suma de humedades')),
+                ('humidity_min', models.FloatField(blank=True, help_text='Humedad mínima', null=True)),
+                ('humidity_max', models.FloatField(blank=True, help_text='Humedad máxima', null=True)),
+                ('humidity_last', models.FloatField(blank=True, help_text='Última humedad', null=True)),
+                ('humidity_last_at', models.DateTimeField(blank=True, help_text='Momento de la última humedad', null=True)),
+            ],
+            options={
+                'verbose_name': 'Agregado de Sensor',
+                'verbose_name_plural': 'Agregados de Sensores',
+                'ordering': ['resolution', '-bucket_start'],
+                'indexes': [models.Index(fields=['resolution', 'bucket_start'], name='sensors_sen_resolut_cbb85e_idx')],
+                'unique_together': {('resolution', 'sensor_id', 'bucket_start')},
+            },
+        ),
+    ]
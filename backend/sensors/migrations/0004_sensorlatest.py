@@ -0,0 +1,48 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_latest(apps, schema_editor):
+    """Última lectura (y última con temperatura) de cada sensor existente"""
+    SensorReading = apps.get_model('sensors', 'SensorReading')
+    SensorLatest = apps.get_model('sensors', 'SensorLatest')
+
+    sensor_ids = SensorReading.objects.values_list('sensor_id', flat=True).distinct()
+    for sensor_id in sensor_ids:
+        readings = SensorReading.objects.filter(sensor_id=sensor_id).order_by('-created_at')
+        reading = readings.first()
+        temperature_reading = readings.filter(temperature__isnull=False).first()
+        SensorLatest.objects.create(
+            sensor_id=sensor_id,
+            reading=reading,
+            reading_at=reading.created_at if reading else None,
+            temperature_reading=temperature_reading,
+            temperature_reading_at=temperature_reading.created_at if temperature_reading else None,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0003_sensorrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SensorLatest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sensor_id', models.CharField(help_text='ID del sensor', max_length=50, unique=True)),
+                ('reading_at', models.DateTimeField(blank=True, help_text='Momento de la última lectura', null=True)),
+                ('temperature_reading_at', models.DateTimeField(blank=True, help_text='Momento de la última lectura con temperatura', null=True)),
+                ('reading', models.ForeignKey(blank=True, help_text='Última lectura', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='sensors.sensorreading')),
+                ('temperature_reading', models.ForeignKey(blank=True, help_text='Última lectura con temperatura', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='sensors.sensorreading')),
+            ],
+            options={
+                'verbose_name': 'Última Lectura de Sensor',
+                'verbose_name_plural': 'Últimas Lecturas de Sensores',
+                'ordering': ['sensor_id'],
+            },
+        ),
+        migrations.RunPython(backfill_latest, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations
+
+CHUNK_SIZE = 5_000
+
+
+def backfill_rollups(apps, schema_editor):
+    """
+    Agregados del historial existente, como rebuild_sensor_rollups: sin
+    ellos las gráficas leerían una tabla vacía tras actualizar.
+    """
+    from sensors.rollups import accumulate, build_rollups
+
+    SensorReading = apps.get_model('sensors', 'SensorReading')
+    SensorRollup = apps.get_model('sensors', 'SensorRollup')
+
+    totals = accumulate(
+        SensorReading.objects
+        .order_by('created_at')
+        .values('sensor_id', 'created_at', 'temperature', 'humidity')
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    SensorRollup.objects.all().delete()
+    SensorRollup.objects.bulk_create(build_rollups(totals, SensorRollup), batch_size=CHUNK_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sensors', '0004_sensorlatest'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
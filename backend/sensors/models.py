@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 
 
@@ -45,24 +45,131 @@ class SensorReading(models.Model):
     
     def save(self, *args, **kwargs):
         """
-        Sobrescribir save para procesar automáticamente la lectura de temperatura
+        Sobrescribir save para acumular la lectura en los agregados y
+        encolar la temperatura en el worker de control. La decisión se toma
+        fuera de la petición HTTP.
         """
+        is_new = self._state.adding
+        
         # Guardar primero la lectura
         super().save(*args, **kwargs)
         
+        if is_new:
+            from .latest import record_latest_readings
+            from .rollups import record_readings
+            record_readings([self])
+            record_latest_readings([self])
+        
         # Si tenemos temperatura, procesar control de calefacción
         if self.temperature is not None:
-            try:
-                # Importar aquí para evitar importaciones circulares
-                from heating.models import HeatingController
-                
-                # Procesar la lectura para control automático
-                result = HeatingController.process_sensor_reading(
-                    sensor_id=self.sensor_id,
-                    temperature=self.temperature
-                )
-                
-                print(f"🌡️ Sensor {self.sensor_id}: {self.temperature}°C -> Acción: {result.get('action', 'none')}")
-                
-            except Exception as e:
-                print(f"❌ Error procesando control automático: {e}")
+            # Importar aquí para evitar importaciones circulares
+            from heating.control_worker import submit_sensor_reading
+            
+            sensor_id, temperature = self.sensor_id, self.temperature
+            transaction.on_commit(lambda: submit_sensor_reading(sensor_id, temperature))
+
+
+class SensorRollup(models.Model):
+    """
+    Agregado pre-calculado de las lecturas de un sensor en un intervalo fijo
+    (5 minutos, 1 hora o 1 día, alineados en UTC).
+    Se actualiza incrementalmente con cada lectura ingerida (ver sensors.rollups)
+    y se reconstruye con el comando rebuild_sensor_rollups.
+    """
+    RESOLUTION_CHOICES = [
+        ('5m', '5 minutos'),
+        ('1h', '1 hora'),
+        ('1d', '1 día'),
+    ]
+
+    sensor_id = models.CharField(max_length=50, help_text="ID del sensor")
+    resolution = models.CharField(max_length=2, choices=RESOLUTION_CHOICES, help_text="Resolución del intervalo")
+    bucket_start = models.DateTimeField(help_text="Inicio del intervalo (UTC)")
+
+    temperature_count = models.IntegerField(default=0, help_text="Lecturas con temperatura")
+    temperature_sum = models.FloatField(default=0.0, help_text="Suma de temperaturas")
+    temperature_min = models.FloatField(null=True, blank=True, help_text="Temperatura mínima")
+    temperature_max = models.FloatField(null=True, blank=True, help_text="Temperatura máxima")
+    temperature_last = models.FloatField(null=True, blank=True, help_text="Última temperatura")
+    temperature_last_at = models.DateTimeField(null=True, blank=True, help_text="Momento de la última temperatura")
+
+    humidity_count = models.IntegerField(default=0, help_text="Lecturas con humedad")
+    humidity_sum = models.FloatField(default=0.0, help_text="Suma de humedades")
+    humidity_min = models.FloatField(null=True, blank=True, help_text="Humedad mínima")
+    humidity_max = models.FloatField(null=True, blank=True, help_text="Humedad máxima")
+    humidity_last = models.FloatField(null=True, blank=True, help_text="Última humedad")
+    humidity_last_at = models.DateTimeField(null=True, blank=True, help_text="Momento de la última humedad")
+
+    class Meta:
+        verbose_name = "Agregado de Sensor"
+        verbose_name_plural = "Agregados de Sensores"
+        ordering = ['resolution', '-bucket_start']
+        unique_together = ('resolution', 'sensor_id', 'bucket_start')
+        indexes = [
+            models.Index(fields=['resolution', 'bucket_start']),  # Para consultas de gráficas por fecha
+        ]
+
+    def __str__(self):
+        return f"{self.sensor_id} [{self.resolution}] {self.bucket_start}"
+
+    @property
+    def temperature_mean(self):
+        if not self.temperature_count:
+            return None
+        return self.temperature_sum / self.temperature_count
+
+    @property
+    def humidity_mean(self):
+        if not self.humidity_count:
+            return None
+        return self.humidity_sum / self.humidity_count
+
+
+class SensorLatest(models.Model):
+    """
+    Última lectura de cada sensor (una fila por sensor_id), para consultar
+    el estado actual sin recorrer el historial. Se actualiza con cada
+    lectura ingerida (ver sensors.latest).
+    """
+    sensor_id = models.CharField(max_length=50, unique=True, help_text="ID del sensor")
+    reading = models.ForeignKey(
+        SensorReading, null=True, blank=True, on_delete=models.SET_NULL, related_name='+',
+        help_text="Última lectura"
+    )
+    reading_at = models.DateTimeField(null=True, blank=True, help_text="Momento de la última lectura")
+    temperature_reading = models.ForeignKey(
+        SensorReading, null=True, blank=True, on_delete=models.SET_NULL, related_name='+',
+        help_text="Última lectura con temperatura"
+    )
+    temperature_reading_at = models.DateTimeField(
+        null=True, blank=True, help_text="Momento de la última lectura con temperatura"
+    )
+
+    class Meta:
+        verbose_name = "Última Lectura de Sensor"
+        verbose_name_plural = "Últimas Lecturas de Sensores"
+        ordering = ['sensor_id']
+
+    def __str__(self):
+        return f"{self.sensor_id} - {self.reading_at}"
+
+    @classmethod
+    def _current_temperature_query(cls):
+        return (
+            cls.objects
+            .filter(temperature_reading__isnull=False)
+            .select_related('temperature_reading')
+            .order_by('-temperature_reading_at')
+        )
+
+    @classmethod
+    def current_temperature_reading(cls):
+        """Lectura con temperatura más reciente de todos los sensores, o None"""
+        latest = cls._current_temperature_query().first()
+        return latest.temperature_reading if latest else None
+
+    @classmethod
+    async def acurrent_temperature_reading(cls):
+        """Versión de current_temperature_reading para vistas async"""
+        latest = await cls._current_temperature_query().afirst()
+        return latest.temperature_reading if latest else None
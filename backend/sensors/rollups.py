@@ -0,0 +1,204 @@
+"""
+Mantenimiento y consulta de los agregados por intervalo (SensorRollup).
+
+Cada lectura se acumula en tres intervalos (5m, 1h y 1d) alineados en UTC.
+Un lote de lecturas se agrupa primero en memoria y después se aplica con un
+UPDATE por intervalo afectado (count/sum suman, min/max con LEAST/GREATEST y
+last solo si la lectura es más reciente), creando la fila si no existe.
+"""
+import datetime
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, DateTimeField, F, FloatField, Q, Value, When
+from django.db.models.functions import Coalesce, Greatest, Least
+
+# Resolución -> duración del intervalo, de la más fina a la más gruesa
+RESOLUTIONS = {
+    '5m': datetime.timedelta(minutes=5),
+    '1h': datetime.timedelta(hours=1),
+    '1d': datetime.timedelta(days=1),
+}
+
+METRICS = ('temperature', 'humidity')
+
+
+def bucket_start(moment, resolution):
+    """Inicio (UTC) del intervalo de la resolución dada que contiene el instante"""
+    seconds = int(RESOLUTIONS[resolution].total_seconds())
+    epoch = int(moment.timestamp())
+    return datetime.datetime.fromtimestamp(epoch - epoch % seconds, tz=datetime.timezone.utc)
+
+
+def pick_resolution(step):
+    """Resolución más gruesa cuyo intervalo no supera el paso pedido, o None"""
+    chosen = None
+    for resolution, width in RESOLUTIONS.items():
+        if width <= step:
+            chosen = resolution
+    return chosen
+
+
+def pick_fine_resolution(step, span, max_rows):
+    """
+    Resolución más fina que no supera el paso y cuyo número de intervalos en
+    el rango no supera max_rows (para reducciones como LTTB, que necesitan
+    más detalle que un valor por punto). Si ninguna cumple el límite se usa
+    la más gruesa que cabe en el paso.
+    """
+    for resolution, width in RESOLUTIONS.items():
+        if width <= step and span / width <= max_rows:
+            return resolution
+    return pick_resolution(step)
+
+
+def _new_partial():
+    return {'count': 0, 'sum': 0.0, 'min': None, 'max': None, 'last': None, 'last_at': None}
+
+
+def _add_value(partial, value, moment):
+    partial['count'] += 1
+    partial['sum'] += value
+    partial['min'] = value if partial['min'] is None else min(partial['min'], value)
+    partial['max'] = value if partial['max'] is None else max(partial['max'], value)
+    if partial['last_at'] is None or moment >= partial['last_at']:
+        partial['last'] = value
+        partial['last_at'] = moment
+
+
+def accumulate(readings, totals=None):
+    """
+    Agrupa lecturas en memoria por (resolución, sensor, inicio del intervalo).
+
+    Args:
+        readings: iterable de objetos o diccionarios con sensor_id, created_at,
+            temperature y humidity.
+        totals: diccionario previo al que añadir (para procesar por bloques).
+
+    Returns:
+        dict: {(resolución, sensor_id, bucket_start): {métrica: parcial}}
+    """
+    if totals is None:
+        totals = defaultdict(lambda: {metric: _new_partial() for metric in METRICS})
+
+    for reading in readings:
+        if isinstance(reading, dict):
+            get = reading.get
+        else:
+            get = lambda name, reading=reading: getattr(reading, name)
+
+        moment = get('created_at')
+        values = {metric: get(metric) for metric in METRICS}
+        if all(value is None for value in values.values()):
+            continue
+
+        for resolution in RESOLUTIONS:
+            key = (resolution, get('sensor_id'), bucket_start(moment, resolution))
+            bucket = totals[key]
+            for metric, value in values.items():
+                if value is not None:
+                    _add_value(bucket[metric], value, moment)
+    return totals
+
+
+def _update_expressions(bucket):
+    """Expresiones UPDATE que combinan un parcial con la fila existente"""
+    updates = {}
+    for metric, partial in bucket.items():
+        if not partial['count']:
+            continue
+        newer = Q(**{f'{metric}_last_at__isnull': True}) | Q(**{f'{metric}_last_at__lte': partial['last_at']})
+        minimum = Value(partial['min'], output_field=FloatField())
+        maximum = Value(partial['max'], output_field=FloatField())
+        updates.update({
+            f'{metric}_count': F(f'{metric}_count') + partial['count'],
+            f'{metric}_sum': F(f'{metric}_sum') + partial['sum'],
+            f'{metric}_min': Least(Coalesce(F(f'{metric}_min'), minimum), minimum),
+            f'{metric}_max': Greatest(Coalesce(F(f'{metric}_max'), maximum), maximum),
+            f'{metric}_last': Case(
+                When(newer, then=Value(partial['last'], output_field=FloatField())),
+                default=F(f'{metric}_last')
+            ),
+            f'{metric}_last_at': Case(
+                When(newer, then=Value(partial['last_at'], output_field=DateTimeField())),
+                default=F(f'{metric}_last_at')
+            ),
+        })
+    return updates
+
+
+def _row_values(bucket):
+    """Valores de una fila nueva a partir de un parcial"""
+    values = {}
+    for metric, partial in bucket.items():
+        values.update({
+            f'{metric}_count': partial['count'],
+            f'{metric}_sum': partial['sum'],
+            f'{metric}_min': partial['min'],
+            f'{metric}_max': partial['max'],
+            f'{metric}_last': partial['last'],
+            f'{metric}_last_at': partial['last_at'],
+        })
+    return values
+
+
+def record_readings(readings):
+    """
+    Acumula un lote de lecturas recién creadas en los agregados.
+    Normalmente es una sola consulta por intervalo afectado.
+    """
+    from .models import SensorRollup
+
+    for (resolution, sensor_id, start), bucket in accumulate(readings).items():
+        lookup = SensorRollup.objects.filter(resolution=resolution, sensor_id=sensor_id, bucket_start=start)
+        if lookup.update(**_update_expressions(bucket)):
+            continue
+        try:
+            with transaction.atomic():
+                SensorRollup.objects.create(
+                    resolution=resolution, sensor_id=sensor_id, bucket_start=start, **_row_values(bucket)
+                )
+        except IntegrityError:
+            # Otro proceso creó la fila entre el UPDATE y el INSERT
+            lookup.update(**_update_expressions(bucket))
+
+
+def build_rollups(totals, model=None):
+    """
+    Objetos SensorRollup (sin guardar) a partir de accumulate(). ``model``
+    permite pasar el modelo histórico desde una migración.
+    """
+    if model is None:
+        from .models import SensorRollup as model
+
+    return [
+        model(resolution=resolution, sensor_id=sensor_id, bucket_start=start, **_row_values(bucket))
+        for (resolution, sensor_id, start), bucket in sorted(totals.items())
+    ]
+
+
+def rollup_partials(resolution, start, end, metric):
+    """
+    Parciales de todos los sensores para una métrica en [start, end), listos
+    para resampling.resample_partials(). El instante de cada parcial es el
+    final de su intervalo.
+    """
+    from .models import SensorRollup
+
+    width = RESOLUTIONS[resolution]
+    rows = (
+        SensorRollup.objects
+        .filter(
+            resolution=resolution,
+            bucket_start__gte=start - width,
+            bucket_start__lt=end,
+            **{f'{metric}_count__gt': 0}
+        )
+        .order_by('bucket_start')
+        .values_list(
+            'bucket_start', f'{metric}_count', f'{metric}_sum', f'{metric}_min',
+            f'{metric}_max', f'{metric}_last', f'{metric}_last_at'
+        )
+    )
+    return [(bucket + width, count, total, minimum, maximum, last, last_at)
+            for bucket, count, total, minimum, maximum, last, last_at in rows]
@@ -1,3 +1,199 @@
-from django.test import TestCase
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+from unittest.mock import patch
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from home_control.ingestion import SENSOR_READING_SCHEMA, ingest_sensor_readings, validate_rows
+
+from .models import SensorLatest, SensorReading
+
+
+class ValidateRowsTests(SimpleTestCase):
+
+    def test_coerces_values_and_fills_defaults(self):
+        valid, errors = validate_rows(
+            [{'sensor_id': 'salon', 'temperature': '21.5', 'timestamp': 1000.0, 'sensor_error': '1'}],
+            SENSOR_READING_SCHEMA
+        )
+        self.assertEqual(errors, [])
+        row = valid[0]
+        self.assertEqual(row['temperature'], 21.5)
+        self.assertEqual(row['timestamp'], 1000)
+        self.assertIs(row['sensor_error'], True)
+        self.assertIsNone(row['humidity'])
+        self.assertEqual(row['source'], 'mqtt_bridge')
+        self.assertTrue(timezone.is_aware(row['created_at']))
+
+    def test_reports_errors_by_index(self):
+        valid, errors = validate_rows(
+            [
+                {'sensor_id': 'salon'},
+                {'temperature': 'caliente'},
+                'texto',
+                {'sensor_id': 'cocina', 'wifi_signal': True, 'sensor_error': 'quizá'},
+            ],
+            SENSOR_READING_SCHEMA
+        )
+        self.assertEqual([row['sensor_id'] for row in valid], ['salon'])
+        self.assertEqual(errors, [
+            {'index': 1, 'errors': {
+                'sensor_id': 'Este campo es obligatorio.',
+                'temperature': 'Se esperaba un número.',
+            }},
+            {'index': 2, 'errors': {'non_field_errors': 'Se esperaba un objeto JSON.'}},
+            {'index': 3, 'errors': {
+                'wifi_signal': 'Se esperaba un entero.',
+                'sensor_error': 'Se esperaba un booleano.',
+            }},
+        ])
+
+    def test_parses_created_at(self):
+        valid, _ = validate_rows(
+            [
+                {'sensor_id': 'salon', 'created_at': '2025-01-10T08:00:00Z'},
+                {'sensor_id': 'salon', 'created_at': '2025-01-10T08:00:00'},
+            ],
+            SENSOR_READING_SCHEMA
+        )
+        self.assertEqual(valid[0]['created_at'], datetime(2025, 1, 10, 8, tzinfo=dt_timezone.utc))
+        self.assertTrue(timezone.is_aware(valid[1]['created_at']))
+
+        _, errors = validate_rows([{'sensor_id': 'salon', 'created_at': 'ayer'}], SENSOR_READING_SCHEMA)
+        self.assertEqual(errors[0]['errors'], {'created_at': 'Se esperaba una fecha ISO 8601.'})
+
+
+class IngestSensorReadingsTests(TestCase):
+
+    def test_inserts_valid_rows_and_returns_errors(self):
+        created, errors = ingest_sensor_readings([
+            {'sensor_id': 'salon', 'temperature': 21.0},
+            {'temperature': 20.0},
+        ])
+
+        self.assertEqual(len(created), 1)
+        self.assertEqual([error['index'] for error in errors], [1])
+        self.assertEqual(SensorReading.objects.count(), 1)
+        self.assertEqual(SensorLatest.objects.get(sensor_id='salon').reading_id, created[0].pk)
+
+    def test_batch_without_valid_rows_inserts_nothing(self):
+        created, errors = ingest_sensor_readings([{'temperature': 20.0}])
+        self.assertEqual(created, [])
+        self.assertEqual(len(errors), 1)
+        self.assertFalse(SensorReading.objects.exists())
+
+    @override_settings(INGEST_MAX_BATCH=2)
+    def test_rejects_batches_over_the_limit(self):
+        with self.assertRaises(ValueError):
+            ingest_sensor_readings([{'sensor_id': 'salon'}] * 3)
+        self.assertFalse(SensorReading.objects.exists())
+
+    def test_control_runs_once_per_sensor_with_its_latest_reading(self):
+        now = timezone.now()
+        rows = [
+            {'sensor_id': 'salon', 'temperature': 20.0, 'created_at': (now - timedelta(minutes=2)).isoformat()},
+            {'sensor_id': 'salon', 'temperature': 21.0, 'created_at': now.isoformat()},
+            # Reenvío antiguo del spool: no dispara control
+            {'sensor_id': 'cocina', 'temperature': 18.0, 'created_at': (now - timedelta(hours=1)).isoformat()},
+            # Sin temperatura
+            {'sensor_id': 'garaje', 'humidity': 40.0},
+        ]
+
+        with patch('heating.control_worker.submit_sensor_reading') as submit:
+            with self.captureOnCommitCallbacks(execute=True):
+                ingest_sensor_readings(rows)
+
+        submit.assert_called_once_with('salon', 21.0)
+
+
+class ReadingsPaginationTests(TestCase):
+    url = '/sensors/api/readings/'
+
+    @classmethod
+    def setUpTestData(cls):
+        start = timezone.now() - timedelta(hours=1)
+        # Pares con el mismo created_at: el desempate es por id
+        SensorReading.objects.bulk_create([
+            SensorReading(sensor_id='salon', temperature=20.0 + n, created_at=start + timedelta(minutes=n // 2))
+            for n in range(7)
+        ])
+        cls.expected = list(
+            SensorReading.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_cursor_walks_all_rows_newest_first(self):
+        ids = []
+        url = f'{self.url}?page_size=3'
+        pages = 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 3)
+            ids.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+            pages += 1
+
+        self.assertEqual(pages, 3)
+        self.assertEqual(ids, self.expected)
+
+    def test_rows_added_while_paging_do_not_shift_pages(self):
+        first = self.client.get(f'{self.url}?page_size=3').data
+        SensorReading.objects.bulk_create([SensorReading(sensor_id='salon', temperature=30.0)])
+
+        second = self.client.get(first['next']).data
+        self.assertEqual([row['id'] for row in second['results']], self.expected[3:6])
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get(f'{self.url}?cursor=no-es-un-cursor')
+        self.assertEqual(response.status_code, 404)
+
+    def test_stream_returns_every_row_as_a_json_array(self):
+        response = self.client.get(f'{self.url}?stream=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        rows = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([row['id'] for row in rows], self.expected)
+
+    async def test_asgi_stream_is_async(self):
+        response = await self.async_client.get(f'{self.url}?stream=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        rows = json.loads(b''.join([chunk async for chunk in response.streaming_content]))
+        self.assertEqual([row['id'] for row in rows], self.expected)
+
+
+class ReadingsExportTests(TestCase):
+    url = '/sensors/api/readings/export/'
+
+    @classmethod
+    def setUpTestData(cls):
+        start = timezone.now() - timedelta(hours=1)
+        SensorReading.objects.bulk_create([
+            SensorReading(sensor_id=sensor_id, temperature=20.0 + n, created_at=start + timedelta(minutes=n))
+            for n, sensor_id in enumerate(['salon', 'cocina', 'salon'])
+        ])
+
+    def test_ndjson_filters_by_sensor_and_columns(self):
+        response = APIClient().get(f'{self.url}?sensor_id=salon&columns=sensor_id,temperature')
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            [{'sensor_id': 'salon', 'temperature': 20.0}, {'sensor_id': 'salon', 'temperature': 22.0}]
+        )
+
+    async def test_asgi_export_is_streamed_asynchronously(self):
+        response = await self.async_client.get(f'{self.url}?output=csv&columns=sensor_id,temperature')
+        self.assertEqual(response.status_code, 200)
+        # Un iterador síncrono se cargaría entero con sync_to_async(list)
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(
+            b''.join(chunks).decode().splitlines(),
+            ['sensor_id,temperature', 'salon,20.0', 'cocina,21.0', 'salon,22.0']
+        )
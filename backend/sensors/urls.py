@@ -1,11 +1,13 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import SensorReadingViewSet
+from .views import SensorReadingViewSet, latest_readings_api
 
 router = DefaultRouter()
 router.register(r'readings', SensorReadingViewSet)
 
 app_name = 'sensors'
 urlpatterns = [
+    # Vista async; va antes del router para no caer en /api/readings/<pk>/
+    path('api/readings/latest/', latest_readings_api, name='readings-latest'),
     path('api/', include(router.urls)),
-]
\ No newline at end of file
+]
@@ -1,31 +1,51 @@
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.permissions import AllowAny
-from .models import SensorReading
+from rest_framework.parsers import JSONParser
+from home_control.ingestion import ingest_sensor_readings
+from home_control.export import ExportMixin
+from home_control.pagination import KeysetListMixin
+from home_control.parsers import NDJSONParser
+from .models import SensorLatest, SensorReading
 from .serializers import SensorReadingSerializer
 
 
-class SensorReadingViewSet(viewsets.ModelViewSet):
+class SensorReadingViewSet(ExportMixin, KeysetListMixin, viewsets.ModelViewSet):
     """
     ViewSet para lecturas de sensores.
     Endpoints:
-    - GET /sensors/api/readings/ - Listar todas las lecturas
+    - GET /sensors/api/readings/ - Listar lecturas (paginado por cursor; ?stream=1 para todas)
     - POST /sensors/api/readings/ - Crear nueva lectura (usado por mqtt_bridge)
+    - POST /sensors/api/readings/bulk/ - Crear varios en un lote (array JSON o NDJSON)
+    - GET /sensors/api/readings/export/ - Exportar historial (NDJSON, CSV, Parquet o Arrow)
+    - GET /sensors/api/readings/latest/ - Última lectura por sensor (vista async, ver latest_readings_api)
     - GET /sensors/api/readings/{id}/ - Detalle de una lectura
     """
     queryset = SensorReading.objects.all()
     serializer_class = SensorReadingSerializer
     permission_classes = [AllowAny]  # Permite acceso desde mqtt_bridge
+    export_device_field = 'sensor_id'
     
     def create(self, request, *args, **kwargs):
         """
         Crear nueva lectura de sensor.
-        Acepta JSON crudo desde mqtt_bridge.
+        Acepta JSON crudo desde mqtt_bridge. Se valida con el serializer
+        (``created_at`` lo asigna el servidor, los errores salen en el formato
+        de DRF) y se inserta con el mismo módulo de ingesta que /bulk/. Solo
+        /bulk/ acepta ``created_at`` (reenvíos del spool del bridge).
         """
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        self.perform_create(serializer)
+        
+        # validated_data no incluye created_at (campo de solo lectura)
+        created, errors = ingest_sensor_readings([dict(serializer.validated_data)])
+        if errors:
+            return Response(errors[0]['errors'], status=status.HTTP_400_BAD_REQUEST)
+        
+        serializer = self.get_serializer(created[0])
         headers = self.get_success_headers(serializer.data)
         return Response(
             serializer.data, 
@@ -33,23 +53,32 @@ class SensorReadingViewSet(viewsets.ModelViewSet):
             headers=headers
         )
     
-    @action(detail=False, methods=['get'])
-    def latest(self, request):
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
         """
-        Obtener las últimas lecturas por sensor.
-        GET /sensors/api/readings/latest/
+        Crear varios registros en un solo lote.
+        POST /sensors/api/readings/bulk/
+        Acepta un array JSON o NDJSON (Content-Type: application/x-ndjson).
+        Las filas válidas se insertan; las inválidas se devuelven en 'errors'.
         """
-        latest_readings = {}
-        sensors = SensorReading.objects.values_list('sensor_id', flat=True).distinct()
+        rows = request.data
+        if isinstance(rows, dict):
+            rows = [rows]
+        if not isinstance(rows, list):
+            return Response(
+                {'error': 'Se esperaba un array JSON o NDJSON'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        for sensor_id in sensors:
-            latest = SensorReading.objects.filter(
-                sensor_id=sensor_id
-            ).first()
-            if latest:
-                latest_readings[sensor_id] = SensorReadingSerializer(latest).data
+        try:
+            created, errors = ingest_sensor_readings(rows)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
-        return Response(latest_readings)
+        return Response(
+            {'created': len(created), 'errors': errors},
+            status=status.HTTP_201_CREATED if created or not errors else status.HTTP_400_BAD_REQUEST
+        )
     
     @action(detail=False, methods=['get'])
     def by_sensor(self, request):
@@ -65,5 +94,21 @@ class SensorReadingViewSet(viewsets.ModelViewSet):
             )
         
         readings = SensorReading.objects.filter(sensor_id=sensor_id)
-        serializer = self.get_serializer(readings, many=True)
-        return Response(serializer.data)
+        return self.list_response(readings)
+
+
+@require_GET
+async def latest_readings_api(request):
+    """
+    Obtener las últimas lecturas por sensor.
+    GET /sensors/api/readings/latest/
+    Una sola consulta sobre SensorLatest (una fila por sensor).
+    Vista async (ORM async): bajo ASGI no ocupa un hilo mientras espera a la DB.
+    """
+    latest_readings = {}
+    rows = SensorLatest.objects.filter(reading__isnull=False).select_related('reading')
+    
+    async for latest in rows:
+        latest_readings[latest.sensor_id] = SensorReadingSerializer(latest.reading).data
+    
+    return JsonResponse(latest_readings)
@@ -20,12 +20,24 @@ class HeatingDashboard {
         this.loadSchedules();
         this.loadLogs();
         this.setupWeekdaySelector();
+        this.connectEvents();
+    }
+    
+    // === EVENTOS EN VIVO (SSE) ===
+    connectEvents() {
+        // Sin soporte de SSE: volver al sondeo cada 30 segundos
+        if (!window.EventSource) {
+            this.statusInterval = setInterval(() => {
+                this.loadStatus();
+                this.loadLogs();
+            }, 30000);
+            return;
+        }
         
-        // Actualizar estado cada 30 segundos
-        this.statusInterval = setInterval(() => {
-            this.loadStatus();
-            this.loadLogs();
-        }, 30000);
+        // EventSource reconecta solo si se corta la conexión
+        this.events = new EventSource('/heating/api/events/');
+        this.events.addEventListener('status', (e) => this.renderStatus(JSON.parse(e.data)));
+        this.events.addEventListener('heating', () => this.loadLogs());
     }
     
     // === API HELPERS ===
@@ -100,6 +112,14 @@ class HeatingDashboard {
             const data = await response.json();
             if (!data) return; // Si no hay datos, salir
             
+            this.renderStatus(data);
+        } catch (error) {
+            console.error('Error loading status:', error);
+        }
+    }
+    
+    renderStatus(data) {
+        try {
             // Actualizar temperatura actual con clases CSS dinámicas
             const currentTemp = data.current_temperature;
             const isHeating = data.is_heating;
@@ -127,7 +147,7 @@ class HeatingDashboard {
             }
             
         } catch (error) {
-            console.error('Error loading status:', error);
+            console.error('Error rendering status:', error);
         }
     }
     
@@ -516,11 +536,12 @@ class HeatingDashboard {
     async loadLogs() {
         try {
             console.log('Cargando logs...'); // Debug
-            const data = await this.apiCall('logs/?ordering=-timestamp');
-            console.log('Logs response:', data); // Debug
+            // Paginado por cursor, de más reciente a más antiguo
+            const page = await this.apiCall('logs/?page_size=10');
+            console.log('Logs response:', page); // Debug
             const logsList = document.getElementById('recent-logs');
+            const data = page ? page.results : null;
             
-            // Los logs también devuelven array directo, no formato paginado
             if (!data || !Array.isArray(data) || data.length === 0) {
                 console.log('No hay logs o data inválida'); // Debug
                 logsList.innerHTML = '<p>No hay actividad reciente</p>';
@@ -4,10 +4,40 @@
 import multiprocessing
 import os
 
+from dotenv import load_dotenv
+
+# Las variables GUNICORN_* pueden definirse en el mismo .env que usa Django
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env'))
+
 # Configuración básica
 bind = "0.0.0.0:8000"
-workers = multiprocessing.cpu_count() * 2 + 1
-worker_class = "sync"
+
+# Perfil de workers (GUNICORN_MODE), ver README "Perfiles de servidor":
+#   wsgi -- (por defecto) la configuración anterior sin cambios: cpu*2+1
+#           procesos gthread × GUNICORN_THREADS (8) con home_control.wsgi
+#   asgi -- opcional: pocos procesos uvicorn con home_control.asgi; las
+#           vistas async (status, gráficas, latest, current y SSE) no ocupan
+#           un hilo mientras esperan
+#   sync -- workers sync de un hilo, solo como referencia para benchmarks
+#           (cada conexión SSE bloquea un proceso entero hasta el timeout)
+# Sin GUNICORN_MODE no cambia nada respecto a la configuración anterior
+SERVER_MODE = os.getenv('GUNICORN_MODE', 'wsgi').lower()
+
+if SERVER_MODE == 'asgi':
+    workers = int(os.getenv('GUNICORN_WORKERS', 2))
+    worker_class = "uvicorn_worker.UvicornWorker"
+    wsgi_app = "home_control.asgi:application"
+elif SERVER_MODE == 'sync':
+    workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+    worker_class = "sync"
+    wsgi_app = "home_control.wsgi:application"
+else:
+    workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+    # gthread: las conexiones SSE (/heating/api/events/) ocupan un hilo y no un
+    # worker entero, y el latido del worker sigue activo mientras duran
+    worker_class = "gthread"
+    threads = int(os.getenv('GUNICORN_THREADS', 8))
+    wsgi_app = "home_control.wsgi:application"
 worker_connections = 100
 max_requests = 100
 max_requests_jitter = 100
@@ -2,19 +2,38 @@
 """
 MQTT to Django Bridge
 Escucha mensajes MQTT y los envía a Django via API REST
+
+Los mensajes no se envían desde el callback de paho: se guardan en un buffer
+en memoria y un hilo emisor los envía en lotes a los endpoints /bulk/ de
+Django. Lo que no se puede entregar se guarda en un spool SQLite en disco que
+se reenvía, en orden, cuando Django vuelve a responder.
 """
 
+import argparse
+import asyncio
+import collections
 import json
 import logging
+import sqlite3
+import threading
 import time
 import os
 import requests
-from datetime import datetime
+from datetime import datetime, timezone
 import paho.mqtt.client as mqtt
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple
 import signal
+import sys
 from dotenv import load_dotenv
 
+# Dependencias opcionales del modo asyncio
+try:
+    import aiomqtt
+    import httpx
+except ImportError:
+    aiomqtt = None
+    httpx = None
+
 # Cargar variables de entorno desde .env
 load_dotenv()
 
@@ -25,6 +44,25 @@ MQTT_PORT = int(os.getenv('MQTT_PORT', 1883))
 MQTT_USERNAME = os.getenv('MQTT_USERNAME', '')
 MQTT_PASSWORD = os.getenv('MQTT_PASSWORD', '')
 
+# Micro-batching y spool
+BRIDGE_BATCH_SIZE = int(os.getenv('BRIDGE_BATCH_SIZE', 50))
+BRIDGE_FLUSH_INTERVAL = float(os.getenv('BRIDGE_FLUSH_INTERVAL', 2.0))
+BRIDGE_BUFFER_SIZE = int(os.getenv('BRIDGE_BUFFER_SIZE', 1000))
+BRIDGE_SPOOL_PATH = os.getenv('BRIDGE_SPOOL_PATH', 'mqtt_bridge_spool.sqlite3')
+BRIDGE_REPLAY_BATCH = int(os.getenv('BRIDGE_REPLAY_BATCH', 500))
+BRIDGE_RETRY_MAX_DELAY = float(os.getenv('BRIDGE_RETRY_MAX_DELAY', 60.0))
+
+# Modo del bridge: 'threads' (por defecto), 'asyncio' o 'direct'
+BRIDGE_MODE = os.getenv('BRIDGE_MODE', 'threads')
+BRIDGE_HTTP_POOL_SIZE = int(os.getenv('BRIDGE_HTTP_POOL_SIZE', 4))
+BRIDGE_DEFAULT_CONCURRENCY = int(os.getenv('BRIDGE_DEFAULT_CONCURRENCY', 2))
+# Envíos concurrentes por endpoint. Los estados de actuador van de uno en uno
+# porque la contabilidad de uso depende del orden.
+BRIDGE_TOPIC_CONCURRENCY = {
+    'sensors/api/readings': int(os.getenv('BRIDGE_SENSOR_CONCURRENCY', 4)),
+    'actuators/api/status': 1,
+}
+
 # Configurar logging
 logging.basicConfig(
     level=logging.INFO,
@@ -36,8 +74,57 @@ logging.basicConfig(
 )
 logger = logging.getLogger('MQTTBridge')
 
+
+class MessageSpool:
+    """
+    Cola FIFO persistente (SQLite) de mensajes pendientes de entregar.
+    Sobrevive a reinicios del bridge y de Django.
+    """
+
+    def __init__(self, path: str):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS spool ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+            'endpoint TEXT NOT NULL, '
+            'payload TEXT NOT NULL)'
+        )
+
+    def append(self, endpoint: str, rows: List[Dict[str, Any]]):
+        with self.lock:
+            with self.conn:
+                self.conn.executemany(
+                    'INSERT INTO spool (endpoint, payload) VALUES (?, ?)',
+                    [(endpoint, json.dumps(row)) for row in rows]
+                )
+
+    def peek(self, limit: int) -> List[Tuple[int, str, Dict[str, Any]]]:
+        with self.lock:
+            cursor = self.conn.execute(
+                'SELECT id, endpoint, payload FROM spool ORDER BY id LIMIT ?', (limit,)
+            )
+            return [(row_id, endpoint, json.loads(payload)) for row_id, endpoint, payload in cursor]
+
+    def delete(self, ids: List[int]):
+        with self.lock:
+            with self.conn:
+                self.conn.executemany('DELETE FROM spool WHERE id = ?', [(row_id,) for row_id in ids])
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM spool').fetchone()[0]
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
 class MQTTDjangoBridge:
     def __init__(self):
+        self.setup_common()
+        
         self.client = mqtt.Client()
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
@@ -47,7 +134,6 @@ class MQTTDjangoBridge:
         if MQTT_USERNAME and MQTT_PASSWORD:
             self.client.username_pw_set(MQTT_USERNAME, MQTT_PASSWORD)
         
-        self.running = True
         self.session = requests.Session()
         
         # Headers para Django API
@@ -56,6 +142,18 @@ class MQTTDjangoBridge:
             'X-API-Key': DJANGO_API_KEY,
         })
         
+        # Buffer en memoria de (endpoint, datos); el spool en disco se abre en setup_common
+        self.buffer = collections.deque()
+        self.buffer_cond = threading.Condition()
+        self.spool_retry_at = 0.0
+        self.spool_retry_delay = BRIDGE_FLUSH_INTERVAL
+        self.sender_thread = threading.Thread(target=self.sender_loop, name='bridge-sender', daemon=True)
+
+    def setup_common(self):
+        """Estado compartido por todas las variantes: spool en disco y enrutado de topics"""
+        self.running = True
+        self.spool = MessageSpool(BRIDGE_SPOOL_PATH)
+        
         # Mapeo de topics MQTT a endpoints Django
         self.topic_mapping = {
             # Nuevos topics de sensor_mqtt y actuator_mqtt
@@ -111,26 +209,129 @@ class MQTTDjangoBridge:
         """Limpia el diccionario eliminando campos con valor None"""
         return {k: v for k, v in data.items() if v is not None}
 
+    def prepare_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Limpia los datos y añade la hora de recepción"""
+        clean_data = self.clean_data(data)
+        # Hora de recepción: se conserva aunque el envío se retrase
+        clean_data.setdefault('created_at', datetime.now(timezone.utc).isoformat())
+        return clean_data
+
     def send_to_django(self, endpoint: str, data: Dict[str, Any]) -> bool:
-        """Envía datos a Django via API REST"""
-        try:
-            # Limpiar datos antes de enviar
-            clean_data = self.clean_data(data)
-            
-            url = f"{DJANGO_BASE_URL}/{endpoint}/"
-            response = self.session.post(url, json=clean_data, timeout=10)
-            
-            if response.status_code in [200, 201, 203]:
-                logger.info(f"Datos enviados exitosamente a {endpoint}")
-                return True
+        """
+        Encola datos para enviarlos a Django en el siguiente lote.
+        No bloquea: se llama desde el hilo de red de paho.
+        """
+        clean_data = self.prepare_data(data)
+        
+        with self.buffer_cond:
+            if len(self.buffer) >= BRIDGE_BUFFER_SIZE:
+                overflow = True
             else:
-                logger.error(f"Error enviando a Django: {response.status_code} - {response.text}")
-                return False
+                overflow = False
+                self.buffer.append((endpoint, clean_data))
+                if len(self.buffer) >= BRIDGE_BATCH_SIZE:
+                    self.buffer_cond.notify()
+        
+        if overflow:
+            logger.warning("Buffer lleno, mensaje guardado en el spool")
+            self.spool.append(endpoint, [clean_data])
+        return True
+
+    def post_batch(self, endpoint: str, rows: List[Dict[str, Any]]) -> bool:
+        """
+        Envía un lote al endpoint /bulk/ de Django.
+        Devuelve False solo si merece la pena reintentar (error de conexión o 5xx).
+        """
+        try:
+            url = f"{DJANGO_BASE_URL}/{endpoint}/bulk/"
+            response = self.session.post(url, json=rows, timeout=10)
+            return self.check_batch_response(endpoint, rows, response)
                 
         except requests.exceptions.RequestException as e:
             logger.error(f"Error de conexión con Django: {e}")
             return False
 
+    def check_batch_response(self, endpoint: str, rows: List[Dict[str, Any]], response) -> bool:
+        """Interpreta la respuesta de un endpoint /bulk/ (requests o httpx)"""
+        if response.status_code in [200, 201]:
+            result = response.json()
+            if result.get('errors'):
+                logger.error(f"Filas rechazadas por Django en {endpoint}: {result['errors']}")
+            logger.info(f"Lote de {len(rows)} mensajes enviado a {endpoint}")
+            return True
+        elif response.status_code < 500:
+            # Un 4xx no se arregla reintentando: se descarta el lote
+            logger.error(f"Lote descartado por Django: {response.status_code} - {response.text}")
+            return True
+        else:
+            logger.error(f"Error enviando a Django: {response.status_code} - {response.text}")
+            return False
+
+    def deliver(self, endpoint: str, rows: List[Dict[str, Any]]):
+        """Entrega un lote; si hay spool pendiente o falla, va al spool para mantener el orden"""
+        if self.spool.count() > 0 or not self.post_batch(endpoint, rows):
+            self.spool.append(endpoint, rows)
+            logger.warning(f"{len(rows)} mensajes de {endpoint} guardados en el spool")
+
+    def replay_spool(self):
+        """Reenvía el spool en orden mientras Django responda"""
+        if time.monotonic() < self.spool_retry_at:
+            return
+        
+        while True:
+            pending = self.spool.peek(BRIDGE_REPLAY_BATCH)
+            if not pending:
+                self.spool_retry_delay = BRIDGE_FLUSH_INTERVAL
+                return
+            
+            # Tramo inicial con el mismo endpoint para no alterar el orden
+            endpoint = pending[0][1]
+            chunk = []
+            for row_id, row_endpoint, row in pending:
+                if row_endpoint != endpoint:
+                    break
+                chunk.append((row_id, row))
+            
+            if not self.post_batch(endpoint, [row for _, row in chunk]):
+                # Backoff exponencial hasta que Django vuelva
+                self.spool_retry_at = time.monotonic() + self.spool_retry_delay
+                self.spool_retry_delay = min(self.spool_retry_delay * 2, BRIDGE_RETRY_MAX_DELAY)
+                return
+            
+            self.spool.delete([row_id for row_id, _ in chunk])
+            logger.info(f"Reenviados {len(chunk)} mensajes del spool a {endpoint}")
+
+    def flush_buffer(self):
+        """Envía todo el buffer agrupado por endpoint en lotes de BRIDGE_BATCH_SIZE"""
+        with self.buffer_cond:
+            items = list(self.buffer)
+            self.buffer.clear()
+        
+        batches: Dict[str, List[Dict[str, Any]]] = collections.OrderedDict()
+        for endpoint, data in items:
+            batches.setdefault(endpoint, []).append(data)
+        
+        for endpoint, rows in batches.items():
+            for i in range(0, len(rows), BRIDGE_BATCH_SIZE):
+                self.deliver(endpoint, rows[i:i + BRIDGE_BATCH_SIZE])
+
+    def sender_loop(self):
+        """Hilo emisor: vacía el buffer por tamaño o por tiempo y reenvía el spool"""
+        while self.running:
+            with self.buffer_cond:
+                self.buffer_cond.wait_for(
+                    lambda: len(self.buffer) >= BRIDGE_BATCH_SIZE or not self.running,
+                    timeout=BRIDGE_FLUSH_INTERVAL
+                )
+            try:
+                self.replay_spool()
+                self.flush_buffer()
+            except Exception as e:
+                logger.error(f"Error en el hilo emisor: {e}")
+        
+        # Al parar, lo que quede en memoria se intenta enviar (o va al spool)
+        self.flush_buffer()
+
     def handle_sensor_data(self, topic: str, payload: str):
         """Maneja datos de sensores: home/sensors/SENSOR_ID/data"""
         try:
@@ -184,12 +385,8 @@ class MQTTDjangoBridge:
             }
             
             # Enviar a ActuatorStatus (NO dispara control automático)
-            success = self.send_to_django('actuators/api/status', status_dict)
-            
-            if success:
-                logger.info(f"✅ Estado de actuador {actuator_id} registrado (sin bucle)")
-            else:
-                logger.error(f"❌ Error registrando estado de actuador {actuator_id}")
+            self.send_to_django('actuators/api/status', status_dict)
+            logger.info(f"✅ Estado de actuador {actuator_id} encolado (sin bucle)")
             
         except json.JSONDecodeError:
             logger.error(f"Payload JSON inválido para actuador: {payload}")
@@ -232,6 +429,11 @@ class MQTTDjangoBridge:
         logger.info("Iniciando MQTT to Django Bridge...")
         
         try:
+            pending = self.spool.count()
+            if pending:
+                logger.info(f"{pending} mensajes pendientes en el spool, se reenviarán")
+            self.sender_thread.start()
+            
             self.client.connect(MQTT_HOST, MQTT_PORT, 60)
             self.client.loop_start()
             
@@ -249,11 +451,285 @@ class MQTTDjangoBridge:
         finally:
             self.client.loop_stop()
             self.client.disconnect()
+            self.stop()
+            if self.sender_thread.is_alive():
+                self.sender_thread.join(timeout=15)
+            self.spool.close()
             logger.info("Bridge detenido")
 
     def stop(self):
         """Detener el bridge"""
         self.running = False
+        with self.buffer_cond:
+            self.buffer_cond.notify_all()
+
+class DirectMQTTDjangoBridge(MQTTDjangoBridge):
+    """
+    Variante de ingesta directa (``--direct``).
+
+    En lugar de hacer POST a la API REST, arranca Django en el propio proceso
+    y escribe los lotes con ``home_control.ingestion``, el mismo módulo que
+    usan las vistas REST, así que la validación es idéntica. Pensado para
+    cuando el bridge y Django corren en la misma máquina.
+    """
+
+    def __init__(self):
+        super().__init__()
+        backend_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+        if backend_dir not in sys.path:
+            sys.path.insert(0, backend_dir)
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'home_control.settings')
+        
+        import django
+        django.setup()
+        
+        from home_control import ingestion
+        self.ingestors = {
+            'sensors/api/readings': ingestion.ingest_sensor_readings,
+            'actuators/api/status': ingestion.ingest_actuator_statuses,
+        }
+
+    def post_batch(self, endpoint: str, rows: List[Dict[str, Any]]) -> bool:
+        """
+        Escribe el lote directamente en la base de datos.
+        Como con HTTP, solo devuelve False si merece la pena reintentar: los
+        errores de integridad o de datos son permanentes (como un 4xx) y no
+        deben bloquear el spool.
+        """
+        from django.db import DatabaseError, DataError, IntegrityError, close_old_connections
+        
+        ingest = self.ingestors.get(endpoint)
+        if ingest is None:
+            logger.error(f"Lote descartado, endpoint sin ingesta directa: {endpoint}")
+            return True
+        
+        close_old_connections()
+        try:
+            created, errors = ingest(rows)
+        except ValueError as e:
+            logger.error(f"Lote descartado: {e}")
+            return True
+        except (IntegrityError, DataError) as e:
+            if len(rows) == 1:
+                logger.error(f"Fila descartada por la base de datos en {endpoint}: {e} - {rows[0]}")
+                return True
+            # El lote se revierte entero: se repite fila a fila para guardar las válidas
+            logger.error(f"Lote rechazado por la base de datos en {endpoint}: {e}. Reintentando fila a fila")
+            return all([self.post_batch(endpoint, [row]) for row in rows])
+        except DatabaseError as e:
+            logger.error(f"Error de base de datos: {e}")
+            return False
+        
+        if errors:
+            logger.error(f"Filas rechazadas en {endpoint}: {errors}")
+        logger.info(f"Lote de {len(created)} mensajes guardado en {endpoint}")
+        return True
+
+
+class AsyncMQTTDjangoBridge(MQTTDjangoBridge):
+    """
+    Variante asyncio del bridge (``--asyncio``).
+
+    Usa aiomqtt para el bucle MQTT y httpx con un pool de conexiones acotado
+    para el envío. Cada endpoint tiene su propia cola y su propio límite de
+    envíos concurrentes, de modo que sensores y actuadores se entregan en
+    paralelo. Los handlers de ``topic_mapping`` son los mismos que en el modo
+    con hilos: solo cambia ``send_to_django``.
+    """
+
+    def __init__(self):
+        # Sin el cliente paho, la sesión de requests ni el hilo emisor del modo con hilos
+        self.setup_common()
+        self.queues: Dict[str, asyncio.Queue] = {}
+        self.workers: List[asyncio.Task] = []
+        self.in_flight = set()
+        self.http = None
+
+    def send_to_django(self, endpoint: str, data: Dict[str, Any]) -> bool:
+        """Encola datos en la cola del endpoint (se llama desde el bucle asyncio)"""
+        clean_data = self.prepare_data(data)
+        queue = self.queues.get(endpoint)
+        if queue is None:
+            queue = self.queues[endpoint] = asyncio.Queue(maxsize=BRIDGE_BUFFER_SIZE)
+            self.workers.append(asyncio.create_task(self.endpoint_worker(endpoint, queue)))
+        
+        try:
+            queue.put_nowait(clean_data)
+        except asyncio.QueueFull:
+            logger.warning("Buffer lleno, mensaje guardado en el spool")
+            self.spool_in_background(endpoint, [clean_data])
+        return True
+
+    def spool_in_background(self, endpoint: str, rows: List[Dict[str, Any]]):
+        """
+        Guarda filas en el spool desde un hilo: una escritura lenta en la
+        tarjeta SD no debe bloquear el bucle de eventos. La tarea se espera
+        al parar, junto con los envíos en curso.
+        """
+        task = asyncio.create_task(asyncio.to_thread(self.spool.append, endpoint, rows))
+        self.in_flight.add(task)
+        task.add_done_callback(self.in_flight.discard)
+
+    async def post_batch_async(self, endpoint: str, rows: List[Dict[str, Any]]) -> bool:
+        try:
+            response = await self.http.post(f"/{endpoint}/bulk/", json=rows)
+            return self.check_batch_response(endpoint, rows, response)
+        except httpx.HTTPError as e:
+            logger.error(f"Error de conexión con Django: {e}")
+            return False
+
+    async def deliver_async(self, endpoint: str, rows: List[Dict[str, Any]], limit: asyncio.Semaphore):
+        async with limit:
+            pending = await asyncio.to_thread(self.spool.count)
+            if pending or not await self.post_batch_async(endpoint, rows):
+                await asyncio.to_thread(self.spool.append, endpoint, rows)
+                logger.warning(f"{len(rows)} mensajes de {endpoint} guardados en el spool")
+
+    async def endpoint_worker(self, endpoint: str, queue: asyncio.Queue):
+        """Agrupa los mensajes de un endpoint en lotes y los envía con concurrencia limitada"""
+        limit = asyncio.Semaphore(BRIDGE_TOPIC_CONCURRENCY.get(endpoint, BRIDGE_DEFAULT_CONCURRENCY))
+        while True:
+            rows = [await queue.get()]
+            deadline = time.monotonic() + BRIDGE_FLUSH_INTERVAL
+            try:
+                while len(rows) < BRIDGE_BATCH_SIZE:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        break
+                    try:
+                        rows.append(await asyncio.wait_for(queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                
+                # Esperar hueco antes de lanzar el envío para no acumular tareas
+                await limit.acquire()
+                limit.release()
+            except asyncio.CancelledError:
+                # Parada: el lote a medio formar no se pierde (escritura en
+                # un hilo, protegida de una segunda cancelación)
+                await asyncio.shield(asyncio.to_thread(self.spool.append, endpoint, rows))
+                raise
+            
+            task = asyncio.create_task(self.deliver_async(endpoint, rows, limit))
+            self.in_flight.add(task)
+            task.add_done_callback(self.in_flight.discard)
+
+    async def spool_worker(self):
+        """Reenvía el spool en orden, con backoff mientras Django no responda"""
+        delay = BRIDGE_FLUSH_INTERVAL
+        while self.running:
+            pending = await asyncio.to_thread(self.spool.peek, BRIDGE_REPLAY_BATCH)
+            if not pending:
+                delay = BRIDGE_FLUSH_INTERVAL
+                await asyncio.sleep(delay)
+                continue
+            
+            endpoint = pending[0][1]
+            chunk = []
+            for row_id, row_endpoint, row in pending:
+                if row_endpoint != endpoint:
+                    break
+                chunk.append((row_id, row))
+            
+            if await self.post_batch_async(endpoint, [row for _, row in chunk]):
+                await asyncio.to_thread(self.spool.delete, [row_id for row_id, _ in chunk])
+                logger.info(f"Reenviados {len(chunk)} mensajes del spool a {endpoint}")
+                delay = BRIDGE_FLUSH_INTERVAL
+            else:
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, BRIDGE_RETRY_MAX_DELAY)
+
+    def dispatch(self, topic: str, payload: str):
+        """Mismo enrutado que on_message"""
+        logger.info(f"Mensaje recibido - Topic: {topic}, Payload: {payload}")
+        for topic_pattern, handler in self.topic_mapping.items():
+            if self.topic_matches(topic, topic_pattern):
+                handler(topic, payload)
+                break
+        else:
+            logger.warning(f"No hay handler para el topic: {topic}")
+
+    async def mqtt_loop(self):
+        """Bucle MQTT con reconexión y backoff"""
+        delay = 1.0
+        while self.running:
+            try:
+                async with aiomqtt.Client(
+                    MQTT_HOST, port=MQTT_PORT, keepalive=60,
+                    username=MQTT_USERNAME or None, password=MQTT_PASSWORD or None
+                ) as client:
+                    logger.info("Conectado al broker MQTT")
+                    delay = 1.0
+                    for topic in self.topic_mapping.keys():
+                        await client.subscribe(topic)
+                        logger.info(f"Suscrito a: {topic}")
+                    
+                    async for msg in client.messages:
+                        try:
+                            self.dispatch(str(msg.topic), msg.payload.decode('utf-8'))
+                        except Exception as e:
+                            logger.error(f"Error procesando mensaje: {e}")
+            except aiomqtt.MqttError as e:
+                logger.warning(f"Desconectado del broker MQTT: {e}. Reintentando en {delay:.0f}s")
+            except Exception as e:
+                # Cualquier otro fallo no debe dejar el bridge vivo sin ingerir nada
+                logger.exception(f"Error inesperado en el bucle MQTT: {e}. Reintentando en {delay:.0f}s")
+            else:
+                continue
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, BRIDGE_RETRY_MAX_DELAY)
+
+    async def run_async(self):
+        limits = httpx.Limits(max_connections=BRIDGE_HTTP_POOL_SIZE, max_keepalive_connections=BRIDGE_HTTP_POOL_SIZE)
+        async with httpx.AsyncClient(
+            base_url=DJANGO_BASE_URL, limits=limits, timeout=10,
+            headers={'X-API-Key': DJANGO_API_KEY}
+        ) as http:
+            self.http = http
+            spool_task = asyncio.create_task(self.spool_worker())
+            mqtt_task = asyncio.create_task(self.mqtt_loop())
+            
+            while self.running:
+                await asyncio.sleep(1)
+            
+            mqtt_task.cancel()
+            spool_task.cancel()
+            for task in self.workers:
+                task.cancel()
+            await asyncio.gather(*self.workers, return_exceptions=True)
+            await asyncio.gather(*self.in_flight, return_exceptions=True)
+            
+            # Lo que quede en las colas se intenta enviar (o va al spool)
+            for endpoint, queue in self.queues.items():
+                rows = []
+                while not queue.empty():
+                    rows.append(queue.get_nowait())
+                for i in range(0, len(rows), BRIDGE_BATCH_SIZE):
+                    await self.deliver_async(endpoint, rows[i:i + BRIDGE_BATCH_SIZE], asyncio.Semaphore(1))
+
+    def run(self):
+        """Ejecutar el bridge en modo asyncio"""
+        logger.info("Iniciando MQTT to Django Bridge (asyncio)...")
+        logger.info(f"Django URL: {DJANGO_BASE_URL}")
+        logger.info(f"Topics suscritos: {list(self.topic_mapping.keys())}")
+        
+        try:
+            pending = self.spool.count()
+            if pending:
+                logger.info(f"{pending} mensajes pendientes en el spool, se reenviarán")
+            asyncio.run(self.run_async())
+        except KeyboardInterrupt:
+            logger.info("Deteniendo bridge...")
+        except Exception as e:
+            logger.error(f"Error ejecutando bridge: {e}")
+        finally:
+            self.spool.close()
+            logger.info("Bridge detenido")
+
+    def stop(self):
+        """Detener el bridge"""
+        self.running = False
+
 
 def signal_handler(signum, frame):
     """Manejar señales del sistema"""
@@ -261,8 +737,31 @@ def signal_handler(signum, frame):
     bridge.stop()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='MQTT to Django Bridge')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        '--asyncio',
+        action='store_true',
+        default=BRIDGE_MODE == 'asyncio',
+        help='Usar el runtime asyncio (requiere aiomqtt y httpx)',
+    )
+    mode.add_argument(
+        '--direct',
+        action='store_true',
+        default=BRIDGE_MODE == 'direct',
+        help='Escribir directamente en la base de datos de Django, sin HTTP',
+    )
+    args = parser.parse_args()
+    
     # Configurar manejo de señales
-    bridge = MQTTDjangoBridge()
+    if args.asyncio:
+        if aiomqtt is None or httpx is None:
+            parser.error('El modo asyncio requiere instalar aiomqtt y httpx')
+        bridge = AsyncMQTTDjangoBridge()
+    elif args.direct:
+        bridge = DirectMQTTDjangoBridge()
+    else:
+        bridge = MQTTDjangoBridge()
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
     
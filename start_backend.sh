@@ -173,11 +173,12 @@ trap cleanup SIGTERM SIGINT
 if [ "$SKIP_GUNICORN" != "true" ]; then
     echo "🚀 Iniciando Gunicorn..."
     
-    # Iniciar Gunicorn en background
+    # Iniciar Gunicorn en background (la aplicación WSGI/ASGI la elige
+    # gunicorn.conf.py según GUNICORN_MODE)
+    echo "   Perfil: ${GUNICORN_MODE:-wsgi}"
     gunicorn \
         --config "$PROJECT_DIR/gunicorn.conf.py" \
-        --chdir "$DJANGO_DIR" \
-        home_control.wsgi:application &
+        --chdir "$DJANGO_DIR" &
     GUNICORN_PID=$!
 
     echo "✅ Gunicorn iniciado (PID: $GUNICORN_PID)"